@@ -0,0 +1,344 @@
+# Description: A computer player for the Hasami Shogi Game. It searches with negamax alpha-beta and iterative deepening
+#              on a single game instance (make_move_idx / unmake_move), orders moves with the transposition table,
+#              captures first, killer moves and the history heuristic, and always answers before a hard deadline.
+#              Run 'python AlphaBetaPlayer.py' to play black against the computer.
+
+import time
+
+from HasamiShogiGame import HasamiShogiGame, SQUARE_NAMES
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+WIN_SCORE = 100000
+MAX_PLY = 1000                  # scores within MAX_PLY of WIN_SCORE are wins and losses a number of plies away
+PIECE_VALUE = 100
+CHECK_TIME_EVERY = 64           # nodes between looks at the clock
+
+
+class SearchTimeout(Exception):
+    """
+    This is raised inside the search when the deadline passes, to unwind back to choose_move
+    """
+
+
+def material_evaluation(game):
+    """
+    This is the default evaluation: the difference in captured pieces, from the point of view of the player to move
+    :param game:
+    :return:
+    """
+
+    if game.get_active_player() == "BLACK":
+        return (game.get_num_captured_pieces("RED") - game.get_num_captured_pieces("BLACK")) * PIECE_VALUE
+    return (game.get_num_captured_pieces("BLACK") - game.get_num_captured_pieces("RED")) * PIECE_VALUE
+
+
+def score_to_table(score, ply):
+    """
+    This is a helper function that turns a win or loss score, counted in plies from the root, into one counted from
+    the position being stored, so the transposition table entry holds the same value at whatever ply it is found
+    :param score:
+    :param ply: plies from the root to the position
+    :return:
+    """
+
+    if score > WIN_SCORE - MAX_PLY:
+        return score + ply
+    if score < -WIN_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    This is the reverse of score_to_table, for a transposition table value read back at 'ply' plies from the root
+    :param score:
+    :param ply:
+    :return:
+    """
+
+    if score > WIN_SCORE - MAX_PLY:
+        return score - ply
+    if score < -WIN_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class AlphaBetaPlayer:
+    """
+    This class chooses moves for whichever player is active in a HasamiShogiGame (or BitboardHasamiShogiGame). The
+    game is searched in place and is left exactly as it was given.
+    """
+
+    def __init__(self, time_limit=1.0, max_depth=32, evaluate=material_evaluation, transposition_table=None,
+                 tablebase=None, opening_book=None, stop_event=None):
+        """
+        :param time_limit: seconds allowed per move, the search stops when it runs out
+        :param max_depth: deepest iteration to search to
+        :param evaluate: function taking a game and returning a score for the player to move
+        :param transposition_table: a TranspositionTable to share, a new 16MB one is made if not given
+        :param tablebase: an EndgameTablebase, two against two positions are then scored exactly without searching
+        :param opening_book: an OpeningBook, positions in the book are answered with the book move without searching
+        :param stop_event: a threading or multiprocessing Event, the search stops as if out of time once it is set
+        """
+
+        self._time_limit = time_limit
+        self._max_depth = max_depth
+        self._evaluate = evaluate
+        if transposition_table is None:
+            transposition_table = TranspositionTable(16 * 1024 * 1024)
+        self._transposition_table = transposition_table
+        self._tablebase = tablebase
+        self._opening_book = opening_book
+        self._stop_event = stop_event
+        self._killers = []
+        self._history = [0] * (81 * 81)
+        self._nodes = 0
+        self._deadline = None
+        self._search_info = {}
+
+    def get_search_info(self):
+        """
+        This returns a dictionary describing the last search: best move, score, depth reached, nodes searched,
+        seconds taken, nodes per second, whether the move came from the opening book and 'iterations', the
+        (score, best move) of every finished iteration, depth 1 first
+        :return:
+        """
+
+        return dict(self._search_info)
+
+    def choose_move(self, game, time_limit=None, max_depth=None, root_moves=None, all_root_moves=False):
+        """
+        This searches the position in 'game' and returns the best (moved_from, moved_to) pair of square numbers it
+        found for the active player, or None if there are no legal moves. The search deepens one ply at a time until
+        max_depth is reached or the time limit runs out; the move from the deepest finished iteration is returned.
+        :param game:
+        :param time_limit: seconds for this move, overrides the player's time limit
+        :param max_depth: deepest iteration for this move, overrides the player's max depth
+        :param root_moves: only search these moves, in this order, even if there is just one (used to split the root
+                           moves between the workers of ParallelSearchPlayer)
+        :param all_root_moves: True if root_moves are every legal move, only reordered, so the root score is exact
+                               rather than a lower bound in the transposition table
+        :return:
+        """
+
+        if time_limit is None:
+            time_limit = self._time_limit
+        if max_depth is None:
+            max_depth = self._max_depth
+
+        start = time.perf_counter()
+        if self._opening_book is not None:
+            book_move = self._opening_book.choose_move(game)
+            if book_move is not None:
+                self._search_info = {"best_move": book_move, "score": 0, "depth": 0, "nodes": 0,
+                                     "seconds": time.perf_counter() - start, "nodes_per_second": 0.0, "book": True,
+                                     "iterations": []}
+                return book_move
+
+        self._deadline = start + time_limit
+        self._nodes = 0
+        self._killers = [[None, None] for _ in range(max_depth + 1)]
+        self._history = [0] * (81 * 81)
+        self._transposition_table.new_search()
+
+        search_single_move = root_moves is not None
+        root_bound = LOWER_BOUND if search_single_move and not all_root_moves else EXACT   # a share only bounds it
+        root_moves = game.generate_legal_moves() if root_moves is None else list(root_moves)
+        best_move = root_moves[0] if root_moves else None
+        best_score = 0
+        depth_reached = 0
+        iterations = []                             # (score, best move) of every finished iteration, depth 1 first
+
+        if len(root_moves) > 1 or (search_single_move and root_moves):
+            for depth in range(1, max_depth + 1):
+                try:
+                    score, move = self.search_root(game, root_moves, depth, root_bound)
+                except SearchTimeout:
+                    break
+                best_score, best_move = score, move
+                depth_reached = depth
+                iterations.append((score, move))
+                root_moves.remove(move)             # search the best move first on the next iteration
+                root_moves.insert(0, move)
+                if abs(score) >= WIN_SCORE - max_depth:
+                    break
+
+        elapsed = time.perf_counter() - start
+        self._search_info = {"best_move": best_move, "score": best_score, "depth": depth_reached,
+                             "nodes": self._nodes, "seconds": elapsed,
+                             "nodes_per_second": self._nodes / elapsed if elapsed > 0 else 0.0, "book": False,
+                             "iterations": iterations}
+        return best_move
+
+    def search_root(self, game, root_moves, depth, bound=EXACT):
+        """
+        This is a helper function for choose_move that searches every root move to 'depth' and returns
+        (score, best move)
+        :param game:
+        :param root_moves:
+        :param depth:
+        :param bound: how the score is stored in the transposition table, EXACT when root_moves are all the legal
+                      moves, LOWER_BOUND when they may be only some of them
+        :return:
+        """
+
+        alpha = -WIN_SCORE - 1
+        beta = WIN_SCORE + 1
+        best_move = root_moves[0]
+
+        for move in root_moves:
+            game.make_move_idx(move[0], move[1])
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, 1)
+            finally:
+                game.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+
+        self._transposition_table.store(game.get_zobrist_hash(), depth, alpha, bound, best_move)
+        return alpha, best_move
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        """
+        This is the alpha-beta search. Returns the score of the position for the player to move.
+        :param game:
+        :param depth: plies left to search
+        :param alpha:
+        :param beta:
+        :param ply: plies from the root
+        :return:
+        """
+
+        self._nodes += 1
+        if self._nodes % CHECK_TIME_EVERY == 0 and (time.perf_counter() >= self._deadline or
+                                                    (self._stop_event is not None and self._stop_event.is_set())):
+            raise SearchTimeout()
+
+        if game.get_game_state() != "UNFINISHED":
+            return -WIN_SCORE + ply          # the player who just moved has won
+        if game.get_repetition_count() > 0:
+            return 0
+        if self._tablebase is not None:
+            entry = self._tablebase.probe(game)
+            if entry is not None:
+                result, plies = entry
+                if result == "WIN":
+                    return WIN_SCORE - ply - plies
+                if result == "LOSS":
+                    return -WIN_SCORE + ply + plies
+                return 0
+
+        if depth <= 0:
+            return self._evaluate(game)
+
+        key = game.get_zobrist_hash()
+        original_alpha = alpha
+        entry = self._transposition_table.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_value, entry_bound, tt_move = entry
+            entry_value = score_from_table(entry_value, ply)
+            if entry_depth >= depth:
+                if entry_bound == EXACT:
+                    return entry_value
+                if entry_bound == LOWER_BOUND and entry_value >= beta:
+                    return entry_value
+                if entry_bound == UPPER_BOUND and entry_value <= alpha:
+                    return entry_value
+
+        moves = game.generate_legal_moves()
+        if not moves:
+            return 0
+
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        for move in self.order_moves(game, moves, tt_move, ply):
+            game.make_move_idx(move[0], move[1])
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not game.count_move_captures(move[0], move[1]):
+                    killers = self._killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    self._history[move[0] * 81 + move[1]] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self._transposition_table.store(key, depth, score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def order_moves(self, game, moves, tt_move, ply):
+        """
+        This is a helper function that sorts moves best first: the transposition table move, then captures (most
+        pieces first), then the two killer moves for this ply, then the rest by history score
+        :param game:
+        :param moves:
+        :param tt_move:
+        :param ply:
+        :return:
+        """
+
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        history = self._history
+        count_move_captures = game.count_move_captures
+        scored_moves = []
+
+        for move in moves:
+            if move == tt_move:
+                score = 1 << 30
+            else:
+                captures = count_move_captures(move[0], move[1])
+                if captures:
+                    score = (1 << 24) + captures
+                elif move == killers[0]:
+                    score = 1 << 23
+                elif move == killers[1]:
+                    score = (1 << 23) - 1
+                else:
+                    score = history[move[0] * 81 + move[1]]
+            scored_moves.append((score, move))
+
+        scored_moves.sort(key=lambda scored_move: scored_move[0], reverse=True)
+        return [move for score, move in scored_moves]
+
+
+if __name__ == "__main__":
+    game = HasamiShogiGame()
+    computer = AlphaBetaPlayer(time_limit=2.0)
+
+    while game.get_game_state() == "UNFINISHED":
+        game.print_board()
+        if game.get_active_player() == "BLACK":
+            selected_piece = input("Select Piece:")
+            move_to = input("Move to:")
+            if game.make_move(selected_piece, move_to) is False:
+                print("#### INVALID MOVE! TRY AGAIN ####\n")
+            continue
+
+        computer_move = computer.choose_move(game)
+        if computer_move is None:
+            print("Red has no legal moves")
+            break
+        search_info = computer.get_search_info()
+        print("\nRed moves", SQUARE_NAMES[computer_move[0]], "-->", SQUARE_NAMES[computer_move[1]],
+              "(depth %d, %d nodes/s)\n" % (search_info["depth"], search_info["nodes_per_second"]))
+        game.make_move_idx(computer_move[0], computer_move[1])
+
+    game.print_board()
+    print("Game state= ", game.get_game_state())
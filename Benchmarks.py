@@ -0,0 +1,198 @@
+# Description: Benchmarks for the Hasami Shogi Game. Run 'python Benchmarks.py' to print the results for both the
+#              list of lists board (HasamiShogiGame) and the bitboard board (BitboardHasamiShogiGame).
+
+import copy
+import random
+import sys
+import time
+import tracemalloc
+
+from HasamiShogiGame import HasamiShogiGame, SQUARE_INDEX, SQUARE_NAMES
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from Evaluation import Evaluator
+
+
+def random_game_moves(seed=0, max_moves=200):
+    """
+    This plays a seeded random game and returns the list of (moved_from, moved_to) pairs that were accepted, so every
+    benchmark replays the same legal moves
+    :param seed:
+    :param max_moves:
+    :return:
+    """
+
+    rng = random.Random(seed)
+    game = HasamiShogiGame()
+    moves = []
+    while game.get_game_state() == "UNFINISHED" and len(moves) < max_moves:
+        moved_from = rng.choice([square for square in SQUARE_NAMES
+                                 if game.get_square_occupant(square) == game.get_active_player()])
+        moved_to = rng.choice([square for square in SQUARE_NAMES
+                               if square[0] == moved_from[0] or square[1] == moved_from[1]])
+        if game.make_move(moved_from, moved_to):
+            moves.append((moved_from, moved_to))
+    return moves
+
+
+def make_move_allocations(game_class, moves):
+    """
+    This replays 'moves' on a new game of 'game_class' under tracemalloc and returns the average peak number of bytes
+    allocated inside one make_move call. Allocations that are freed before make_move returns still count, which is
+    what drives garbage collector pressure.
+    :param game_class:
+    :param moves:
+    :return:
+    """
+
+    game = game_class()
+    total_peak = 0
+    tracemalloc.start()
+    for moved_from, moved_to in moves:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        game.make_move(moved_from, moved_to)
+        total_peak += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return total_peak / len(moves)
+
+
+def make_move_timing(game_class, moves, repeat=200):
+    """
+    This replays 'moves' on 'repeat' new games of 'game_class' and returns the average seconds per make_move call
+    :param game_class:
+    :param moves:
+    :param repeat:
+    :return:
+    """
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        game = game_class()
+        for moved_from, moved_to in moves:
+            game.make_move(moved_from, moved_to)
+    return (time.perf_counter() - start) / (repeat * len(moves))
+
+
+def make_move_idx_timing(game_class, moves, repeat=200):
+    """
+    This is make_move_timing for make_move_idx, with the moves converted to square numbers before timing starts
+    :param game_class:
+    :param moves:
+    :param repeat:
+    :return:
+    """
+
+    square_moves = [(SQUARE_INDEX[moved_from], SQUARE_INDEX[moved_to]) for moved_from, moved_to in moves]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        game = game_class()
+        for from_square, to_square in square_moves:
+            game.make_move_idx(from_square, to_square)
+    return (time.perf_counter() - start) / (repeat * len(moves))
+
+
+def evaluate_timing(game_class, moves, repeat=20000):
+    """
+    This replays 'moves' on a game of 'game_class' and returns the average seconds for one Evaluator().evaluate call
+    on the position reached
+    :param game_class:
+    :param moves:
+    :param repeat:
+    :return:
+    """
+
+    game = game_class()
+    for moved_from, moved_to in moves:
+        game.make_move(moved_from, moved_to)
+    evaluate = Evaluator().evaluate
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        evaluate(game)
+    return (time.perf_counter() - start) / repeat
+
+
+class ListOfListsGame:
+    """
+    This holds a game the way HasamiShogiGame did before the byte board, for live_game_memory to measure: an instance
+    dictionary with a 9x9 list of lists of 'R', 'B' and '.' and the four counters. That game kept no move history,
+    so its size was the same however many moves had been made.
+    """
+
+    def __init__(self):
+        self._game_board = [["R"] * 9] + [["."] * 9 for _ in range(7)] + [["B"] * 9]
+        self._game_state = "UNFINISHED"
+        self._active_player = "BLACK"
+        self._black_captured = 0
+        self._red_captured = 0
+
+
+def live_game_memory(game_class, moves=(), games=10000, clear_history=False):
+    """
+    This keeps 'games' games of 'game_class' alive at once, each with 'moves' replayed on it, and returns the average
+    number of bytes each one holds, measured with tracemalloc. With no moves this is the cost of a game that has
+    been created but not played yet. With clear_history each game drops its undo records after the moves, the way
+    a stored game such as a GameServer one does.
+    :param game_class:
+    :param moves:
+    :param games:
+    :param clear_history:
+    :return:
+    """
+
+    square_moves = [(SQUARE_INDEX[moved_from], SQUARE_INDEX[moved_to]) for moved_from, moved_to in moves]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    live_games = []
+    for _ in range(games):
+        game = game_class()
+        for from_square, to_square in square_moves:
+            game.make_move_idx(from_square, to_square)
+        if clear_history:
+            game.clear_history()
+        live_games.append(game)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return (used - sys.getsizeof(live_games)) / games
+
+
+def fork_timing(game_class, moves, repeat=10000):
+    """
+    This replays 'moves' on a game of 'game_class' and returns the average seconds to fork it three ways:
+    (copy.deepcopy, clone, snapshot then restore)
+    :param game_class:
+    :param moves:
+    :param repeat:
+    :return:
+    """
+
+    game = game_class()
+    for moved_from, moved_to in moves:
+        game.make_move(moved_from, moved_to)
+
+    timings = []
+    for fork in (lambda: copy.deepcopy(game), game.clone, lambda: game.restore(game.snapshot())):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fork()
+        timings.append((time.perf_counter() - start) / repeat)
+    return tuple(timings)
+
+
+if __name__ == "__main__":
+    benchmark_moves = random_game_moves()
+    print("Replaying", len(benchmark_moves), "moves")
+    print("bytes per live game, list of lists board before the byte board: %.0f" % live_game_memory(ListOfListsGame))
+    for board_class in (HasamiShogiGame, BitboardHasamiShogiGame):
+        print(board_class.__name__)
+        print("  bytes allocated per make_move: %.1f" % make_move_allocations(board_class, benchmark_moves))
+        print("  microseconds per make_move:    %.2f" % (make_move_timing(board_class, benchmark_moves) * 1e6))
+        print("  microseconds per make_move_idx: %.2f" % (make_move_idx_timing(board_class, benchmark_moves) * 1e6))
+        print("  microseconds per evaluate:      %.2f" % (evaluate_timing(board_class, benchmark_moves[:30]) * 1e6))
+        print("  bytes per live game, new:       %.0f" % live_game_memory(board_class))
+        print("  bytes per live game, 10 moves:  %.0f" % live_game_memory(board_class, benchmark_moves[:10]))
+        print("  bytes per live game, 50 moves:  %.0f" % live_game_memory(board_class, benchmark_moves[:50]))
+        print("  bytes per live game, 50 moves, history cleared: %.0f" %
+              live_game_memory(board_class, benchmark_moves[:50], clear_history=True))
+        print("  microseconds per deepcopy / clone / snapshot and restore: %.2f / %.2f / %.2f" %
+              tuple(seconds * 1e6 for seconds in fork_timing(board_class, benchmark_moves[:60])))
@@ -0,0 +1,408 @@
+# Description: An endgame tablebase for Hasami Shogi positions with two pieces on each side, the smallest endgame that
+#              isn't already over (a side with one piece left has lost). Every position is solved by retrograde
+#              analysis: positions where the player to move can capture are wins in one, and results are walked
+#              backwards through un-moves from there. The board's 8 symmetries (Symmetry.BOARD_SYMMETRIES) map
+#              positions onto each other, so only one position of each symmetry class is solved and stored.
+#              The table is one byte per position in a file that is memory mapped when probed, so a probe is a few
+#              table lookups and one byte read.
+#              Run 'python EndgameTablebase.py generate endgame.hstb' to build the file (17 to 19 seconds measured).
+#
+#              File layout: the 5 byte magic b"HSTB\x01", a header (mover pieces, opponent pieces, representative
+#              mover squares, all 1 or 2 byte little endian) and one byte per position. A position is stored from the
+#              point of view of the player to move: 0 means no forced result, an odd number n means the player to
+#              move wins in n plies, an even number n means they lose in n plies.
+
+import argparse
+import mmap
+import struct
+import time
+from collections import deque
+
+from HasamiShogiGame import SQUARE_RAYS, CORNER_NEIGHBOURS, SQUARE_NAMES
+from BitboardHasamiShogiGame import PATHS
+from Symmetry import SQUARE_MAPS, BOARD_SYMMETRIES
+
+MAGIC = b"HSTB\x01"
+TABLE_HEADER = struct.Struct("<BBH")
+PIECES_PER_SIDE = 2
+PAIR_COUNT = 81 * 80 // 2                   # ways to place two pieces of one color
+MAX_PLIES = 255
+
+
+def pair_rank(first_square, second_square):
+    """
+    This returns the number 0 --> 3239 of a pair of different squares, the same whichever order they are given in
+    :param first_square:
+    :param second_square:
+    :return:
+    """
+
+    if first_square > second_square:
+        first_square, second_square = second_square, first_square
+    return second_square * (second_square - 1) // 2 + first_square
+
+
+def build_pair_classes():
+    """
+    This sorts every pair of squares into symmetry classes. Returns (representatives, pair_classes, pair_squares):
+    representatives is the sorted tuple of the lowest pair rank in each class, pair_classes[rank] is
+    (representative number, symmetries that map the pair onto its representative) and pair_squares[rank] the squares
+    :return:
+    """
+
+    pair_squares = [None] * PAIR_COUNT
+    for second_square in range(81):
+        for first_square in range(second_square):
+            pair_squares[pair_rank(first_square, second_square)] = (first_square, second_square)
+
+    lowest_images = []
+    for first_square, second_square in pair_squares:
+        images = [pair_rank(mapping[first_square], mapping[second_square]) for mapping in SYMMETRIES]
+        lowest_images.append((min(images), images))
+
+    representatives = tuple(sorted({lowest for lowest, images in lowest_images}))
+    representative_numbers = {rank: number for number, rank in enumerate(representatives)}
+    pair_classes = tuple((representative_numbers[lowest],
+                          tuple(symmetry for symmetry, image in enumerate(images) if image == lowest))
+                         for lowest, images in lowest_images)
+    return representatives, pair_classes, tuple(pair_squares)
+
+
+SYMMETRIES = tuple(SQUARE_MAPS[symmetry] for symmetry in BOARD_SYMMETRIES)   # square maps, the identity first
+REPRESENTATIVES, PAIR_CLASSES, PAIR_SQUARES = build_pair_classes()
+TABLE_SIZE = len(REPRESENTATIVES) * PAIR_COUNT
+
+
+def position_index(mover, opponent):
+    """
+    This returns the table index of a position, given the squares of the two pieces of the player to move and the
+    two of the opponent. The mover's pair is mapped onto its class representative, and where several symmetries do
+    that the lowest resulting opponent pair is used, so every image of a position has the same index.
+    :param mover:
+    :param opponent:
+    :return:
+    """
+
+    representative, symmetries = PAIR_CLASSES[pair_rank(mover[0], mover[1])]
+    if len(symmetries) == 1:
+        mapping = SYMMETRIES[symmetries[0]]
+        return representative * PAIR_COUNT + pair_rank(mapping[opponent[0]], mapping[opponent[1]])
+    return representative * PAIR_COUNT + min(pair_rank(SYMMETRIES[symmetry][opponent[0]],
+                                                       SYMMETRIES[symmetry][opponent[1]])
+                                             for symmetry in symmetries)
+
+
+def canonical_index(mover, opponent):
+    """
+    This returns the table index of a position if the squares given are exactly its stored form (the symmetry class
+    representative), otherwise None
+    :param mover:
+    :param opponent:
+    :return:
+    """
+
+    representative, symmetries = PAIR_CLASSES[pair_rank(mover[0], mover[1])]
+    if symmetries[0] != 0:
+        return None
+    opponent_rank = pair_rank(opponent[0], opponent[1])
+    index = position_index(mover, opponent)
+    return index if index == representative * PAIR_COUNT + opponent_rank else None
+
+
+def index_position(index):
+    """
+    This returns the stored form (mover squares, opponent squares) of a table index
+    :param index:
+    :return:
+    """
+
+    representative, opponent_rank = divmod(index, PAIR_COUNT)
+    return PAIR_SQUARES[REPRESENTATIVES[representative]], PAIR_SQUARES[opponent_rank]
+
+
+def capture_flanks(square, mover, opponent):
+    """
+    This is a helper function that returns the mover's pieces that would close a capture if one of the mover's
+    other pieces landed on the empty 'square': the far end of a sandwich, or the second piece of a corner capture
+    :param square:
+    :param mover:
+    :param opponent:
+    :return:
+    """
+
+    flanks = []
+    for ray in SQUARE_RAYS[square]:
+        run = 0
+        for ray_square, ray_row, ray_column in ray:
+            if ray_square in opponent:
+                run += 1
+                continue
+            if run and ray_square in mover:
+                flanks.append(ray_square)
+            break
+
+    corner = CORNER_NEIGHBOURS.get(square)
+    if corner is not None and corner[0] in opponent and corner[1] in mover:
+        flanks.append(corner[1])
+    return flanks
+
+
+def can_capture(mover, opponent, occupied):
+    """
+    This returns True if the player to move has a capturing move, which in a two against two endgame wins at once.
+    A capture lands next to an opponent piece, so only the empty squares next to the opponent's pieces are tried.
+    :param mover:
+    :param opponent:
+    :param occupied: bitboard of every piece
+    :return:
+    """
+
+    for opponent_square in opponent:
+        for ray in SQUARE_RAYS[opponent_square]:
+            if not ray or occupied >> ray[0][0] & 1:
+                continue
+            landing = ray[0][0]
+            flanks = capture_flanks(landing, mover, opponent)
+            if not flanks:
+                continue
+            for piece in mover:
+                path = PATHS.get((piece, landing))
+                if path is not None and not path & occupied and piece not in flanks:
+                    return True
+    return False
+
+
+def count_moves(mover, occupied):
+    """
+    This returns the number of legal moves of the pieces on the 'mover' squares
+    :param mover:
+    :param occupied:
+    :return:
+    """
+
+    moves = 0
+    for piece in mover:
+        for ray in SQUARE_RAYS[piece]:
+            for ray_square, ray_row, ray_column in ray:
+                if occupied >> ray_square & 1:
+                    break
+                moves += 1
+    return moves
+
+
+def predecessors(mover, opponent):
+    """
+    This is a generator over the stored forms of the positions one move before (mover, opponent), found by sliding
+    one of the opponent's pieces back. It un-moves from every symmetric image of the position but only yields
+    predecessors that are in stored form, so each move into the position's class is found exactly once.
+    :param mover:
+    :param opponent:
+    :return:
+    """
+
+    images = {(tuple(sorted((mapping[mover[0]], mapping[mover[1]]))),
+               tuple(sorted((mapping[opponent[0]], mapping[opponent[1]])))) for mapping in SYMMETRIES}
+    for image_mover, image_opponent in images:
+        occupied = (1 << image_mover[0]) | (1 << image_mover[1]) | (1 << image_opponent[0]) | (1 << image_opponent[1])
+        for moved, staying in ((image_opponent[0], image_opponent[1]), (image_opponent[1], image_opponent[0])):
+            for ray in SQUARE_RAYS[moved]:
+                for ray_square, ray_row, ray_column in ray:
+                    if occupied >> ray_square & 1:
+                        break
+                    previous_mover = (staying, ray_square)
+                    index = canonical_index(previous_mover, image_mover)
+                    if index is not None:
+                        yield index, previous_mover, image_mover
+
+
+def generate_tablebase(path):
+    """
+    This solves every two against two position by retrograde analysis and writes the table to 'path'. Returns a
+    dictionary of counts: positions, wins, losses, draws, the longest win in plies and seconds taken.
+    :param path:
+    :return:
+    """
+
+    start = time.perf_counter()
+    values = bytearray(TABLE_SIZE)
+    remaining_moves = bytearray(b"\xff") * TABLE_SIZE       # 255 until the moves of a position are counted
+    solved = deque()
+    positions = 0
+
+    # wins in one: the player to move can capture
+    for representative, representative_rank in enumerate(REPRESENTATIVES):
+        mover = PAIR_SQUARES[representative_rank]
+        symmetric = len(PAIR_CLASSES[representative_rank][1]) > 1
+        mover_occupied = (1 << mover[0]) | (1 << mover[1])
+        for opponent_rank, opponent in enumerate(PAIR_SQUARES):
+            occupied = mover_occupied | (1 << opponent[0]) | (1 << opponent[1])
+            if bin(occupied).count("1") != 4:
+                continue
+            index = representative * PAIR_COUNT + opponent_rank
+            if symmetric and position_index(mover, opponent) != index:
+                continue
+            positions += 1
+            if can_capture(mover, opponent, occupied):
+                values[index] = 1
+                solved.append(index)
+
+    # walk back: a move into a lost position wins, a position whose every move reaches a won position is lost
+    while solved:
+        index = solved.popleft()
+        plies = values[index]
+        if plies == MAX_PLIES:
+            raise OverflowError("a result is longer than %d plies" % MAX_PLIES)
+        mover, opponent = index_position(index)
+        for previous_index, previous_mover, previous_opponent in predecessors(mover, opponent):
+            if values[previous_index]:
+                continue
+            if plies % 2 == 0:
+                values[previous_index] = plies + 1
+                solved.append(previous_index)
+                continue
+            if remaining_moves[previous_index] == 255:
+                remaining_moves[previous_index] = count_moves(previous_mover, (1 << previous_mover[0]) |
+                                                              (1 << previous_mover[1]) | (1 << previous_opponent[0]) |
+                                                              (1 << previous_opponent[1]))
+            remaining_moves[previous_index] -= 1
+            if remaining_moves[previous_index] == 0:
+                values[previous_index] = plies + 1
+                solved.append(previous_index)
+
+    with open(path, "wb") as table_file:
+        table_file.write(MAGIC)
+        table_file.write(TABLE_HEADER.pack(PIECES_PER_SIDE, PIECES_PER_SIDE, len(REPRESENTATIVES)))
+        table_file.write(values)
+
+    wins = sum(values.count(plies) for plies in range(1, MAX_PLIES + 1, 2))
+    losses = sum(values.count(plies) for plies in range(2, MAX_PLIES + 1, 2))
+    return {"positions": positions, "wins": wins, "losses": losses, "draws": positions - wins - losses,
+            "longest": max(values),
+            "seconds": time.perf_counter() - start}
+
+
+class EndgameTablebase:
+    """
+    This class probes a tablebase file made by generate_tablebase. The file is memory mapped, so opening it is
+    instant and only the pages that are probed are read. It can be used as a context manager.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: tablebase file
+        """
+
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = len(MAGIC) + TABLE_HEADER.size
+        if self._map[:len(MAGIC)] != MAGIC or len(self._map) != header_end + TABLE_SIZE or \
+                TABLE_HEADER.unpack_from(self._map, len(MAGIC)) != (PIECES_PER_SIDE, PIECES_PER_SIDE,
+                                                                    len(REPRESENTATIVES)):
+            self.close()
+            raise ValueError(str(path) + " is not a two against two tablebase file")
+        self._offset = header_end
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        This releases the memory map and closes the file
+        :return:
+        """
+
+        self._map.close()
+        self._file.close()
+
+    def probe_position(self, mover, opponent):
+        """
+        This returns ('WIN', plies), ('LOSS', plies) or ('DRAW', 0) for the player to move, given the squares of
+        their two pieces and of the opponent's two pieces. 'DRAW' means neither side can force a capture.
+        :param mover:
+        :param opponent:
+        :return:
+        """
+
+        plies = self._map[self._offset + position_index(mover, opponent)]
+        if plies == 0:
+            return "DRAW", 0
+        return ("WIN" if plies % 2 else "LOSS"), plies
+
+    def probe(self, game):
+        """
+        This returns probe_position for the position in 'game' (HasamiShogiGame or BitboardHasamiShogiGame), or None
+        if the game is over or isn't two pieces against two
+        :param game:
+        :return:
+        """
+
+        if (game.get_game_state() != "UNFINISHED" or game.get_num_captured_pieces("RED") != 7 or
+                game.get_num_captured_pieces("BLACK") != 7):
+            return None
+
+        board = game.get_board()
+        black = board.index("B")
+        black = (black, board.index("B", black + 1))
+        red = board.index("R")
+        red = (red, board.index("R", red + 1))
+        if game.get_active_player() == "BLACK":
+            return self.probe_position(black, red)
+        return self.probe_position(red, black)
+
+    def best_move(self, game):
+        """
+        This returns the best (moved_from, moved_to) move in a two against two position: the quickest win, otherwise
+        a move that keeps the draw, otherwise the slowest loss. Returns None if 'game' isn't in the table or there are
+        no legal moves.
+        :param game:
+        :return:
+        """
+
+        if self.probe(game) is None:
+            return None
+
+        best_move = None
+        best_rank = None
+        for move in game.generate_legal_moves():
+            game.make_move_idx(move[0], move[1])
+            try:
+                if game.get_game_state() != "UNFINISHED":
+                    return move
+                result, plies = self.probe(game)            # from the opponent's point of view
+            finally:
+                game.unmake_move()
+            if result == "LOSS":
+                rank = (2, -plies)
+            elif result == "DRAW":
+                rank = (1, 0)
+            else:
+                rank = (0, plies)
+            if best_rank is None or rank > best_rank:
+                best_rank = rank
+                best_move = move
+        return best_move
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or probe the two against two Hasami Shogi tablebase")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate_parser = subparsers.add_parser("generate", help="solve every position and write the table")
+    generate_parser.add_argument("path")
+    probe_parser = subparsers.add_parser("probe", help="look up one position")
+    probe_parser.add_argument("path")
+    probe_parser.add_argument("mover", nargs=2, help="squares of the two pieces of the player to move, e.g. a1 c5")
+    probe_parser.add_argument("opponent", nargs=2, help="squares of the opponent's two pieces")
+    arguments = parser.parse_args()
+
+    if arguments.command == "generate":
+        table_stats = generate_tablebase(arguments.path)
+        print("%(positions)d positions: %(wins)d wins, %(losses)d losses, %(draws)d draws, longest %(longest)d plies, "
+              "%(seconds).1f seconds" % table_stats)
+    else:
+        square_numbers = {name: square for square, name in enumerate(SQUARE_NAMES)}
+        with EndgameTablebase(arguments.path) as tablebase:
+            print(tablebase.probe_position([square_numbers[name] for name in arguments.mover],
+                                           [square_numbers[name] for name in arguments.opponent]))
@@ -0,0 +1,171 @@
+# Description: A static evaluation for Hasami Shogi positions, for AlphaBetaPlayer or any other search. It scores
+#              material, mobility, pieces on the edge (corners left out) and in the corners, corner pieces open to a
+#              corner capture and pieces under sandwich threat, each with a configurable weight. Everything except
+#              material is read out of the base 3 row and column codes that both game classes keep up to date on every
+#              move (see HasamiShogiGame.get_line_codes), through lookup tables built once for every possible line.
+#              The features themselves are not kept move by move: they are summed from the line codes each time a
+#              position is scored, in about 40 table lookups instead of a walk over the board.
+
+from HasamiShogiGame import CORNER_NEIGHBOURS, POWERS_OF_3
+
+DEFAULT_WEIGHTS = {
+    "material": 100,            # per captured opponent piece
+    "mobility": 1,              # per legal move
+    "edge": -2,                 # per piece on the outside rows and columns, not counting the corners
+    "corner": -4,               # per piece in a corner
+    "corner_exposure": -20,     # per corner piece with an opponent already on one of its two neighbouring squares
+    "threatened": -15,          # per piece in a run flanked by an opponent on one side and an empty square on the other
+}
+FEATURES = tuple(DEFAULT_WEIGHTS)
+CORNERS = {corner: tuple(square for square, (neighbour_corner, partner) in CORNER_NEIGHBOURS.items()
+                         if neighbour_corner == corner) for corner in (0, 8, 72, 80)}    # corner --> its neighbours
+
+
+def build_line_features():
+    """
+    This builds LINE_FEATURES, indexed by a line code (a row or column as a base 3 number, '.' = 0, 'B' = 1,
+    'R' = 2, the square nearest 'a1' as the lowest digit), giving a tuple for that line of
+    (black moves, red moves, black threatened, red threatened, black pieces, red pieces). Moves are the empty squares
+    each piece can slide to along the line, so the moves of all 9 rows and 9 columns add up to the legal moves.
+    :return:
+    """
+
+    line_features = []
+    for code in range(3 ** 9):
+        line = [(code // POWERS_OF_3[position]) % 3 for position in range(9)]
+        moves = [0, 0, 0]
+        threatened = [0, 0, 0]
+        pieces = [0, line.count(1), line.count(2)]
+
+        for position, piece in enumerate(line):
+            if not piece:
+                continue
+            for step in (-1, 1):
+                next_position = position + step
+                while 0 <= next_position < 9 and not line[next_position]:
+                    moves[piece] += 1
+                    next_position += step
+
+        position = 0
+        while position < 9:
+            piece = line[position]
+            run_end = position
+            while run_end < 9 and line[run_end] == piece:
+                run_end += 1
+            if piece and 0 < position and run_end < 9:
+                before = line[position - 1]
+                after = line[run_end]
+                if (before == 3 - piece and after == 0) or (before == 0 and after == 3 - piece):
+                    threatened[piece] += run_end - position
+            position = run_end
+
+        line_features.append((moves[1], moves[2], threatened[1], threatened[2], pieces[1], pieces[2]))
+    return tuple(line_features)
+
+
+LINE_FEATURES = build_line_features()
+
+
+class Evaluator:
+    """
+    This class scores positions with a weighted sum of features, black minus red for each feature, turned around to
+    the point of view of the player to move. An Evaluator can be passed straight to AlphaBetaPlayer as 'evaluate'.
+    """
+
+    def __init__(self, weights=None):
+        """
+        :param weights: dictionary of feature --> weight, features left out keep their DEFAULT_WEIGHTS value
+        """
+
+        self._weights = dict(DEFAULT_WEIGHTS)
+        if weights:
+            unknown = set(weights) - set(FEATURES)
+            if unknown:
+                raise ValueError("unknown evaluation features: " + ", ".join(sorted(unknown)))
+            self._weights.update(weights)
+
+    def __call__(self, game):
+        return self.evaluate(game)
+
+    def get_weights(self):
+        """
+        This returns a copy of the weights in use
+        :return:
+        """
+
+        return dict(self._weights)
+
+    def get_features(self, game):
+        """
+        This returns a dictionary of feature --> black's count minus red's count for the position in 'game'. The
+        counts are read from the game's line codes now, with LINE_FEATURES, not updated as moves are made. 'edge'
+        only counts the edge squares that aren't corners, so a corner piece counts towards 'corner' alone.
+        :param game:
+        :return:
+        """
+
+        row_codes, column_codes = game.get_line_codes()
+        line_features = LINE_FEATURES
+        black_moves = red_moves = black_threatened = red_threatened = 0
+        for code in row_codes:
+            features = line_features[code]
+            black_moves += features[0]
+            red_moves += features[1]
+            black_threatened += features[2]
+            red_threatened += features[3]
+        for code in column_codes:
+            features = line_features[code]
+            black_moves += features[0]
+            red_moves += features[1]
+            black_threatened += features[2]
+            red_threatened += features[3]
+
+        black_edge = red_edge = 0
+        for code in (row_codes[0], row_codes[8], column_codes[0], column_codes[8]):
+            features = line_features[code]
+            black_edge += features[4]
+            red_edge += features[5]
+
+        black_corners = red_corners = black_exposed = red_exposed = 0
+        for corner, neighbours in CORNERS.items():
+            piece = (row_codes[corner // 9] // POWERS_OF_3[corner % 9]) % 3
+            if not piece:
+                continue
+            exposed = any((row_codes[neighbour // 9] // POWERS_OF_3[neighbour % 9]) % 3 == 3 - piece
+                          for neighbour in neighbours)
+            if piece == 1:
+                black_corners += 1
+                black_exposed += exposed
+            else:
+                red_corners += 1
+                red_exposed += exposed
+
+        return {"material": game.get_num_captured_pieces("RED") - game.get_num_captured_pieces("BLACK"),
+                "mobility": black_moves - red_moves,
+                "edge": black_edge - 2 * black_corners - (red_edge - 2 * red_corners),  # a corner is on two edge lines
+                "corner": black_corners - red_corners,
+                "corner_exposure": black_exposed - red_exposed,
+                "threatened": black_threatened - red_threatened}
+
+    def evaluate(self, game):
+        """
+        This returns the weighted score of the position in 'game' from the point of view of the player to move
+        :param game:
+        :return:
+        """
+
+        weights = self._weights
+        features = self.get_features(game)
+        score = sum(weights[feature] * value for feature, value in features.items())
+        return score if game.get_active_player() == "BLACK" else -score
+
+    def evaluate_many(self, games):
+        """
+        This scores a batch of positions, for example the leaves of a search, and returns a list of scores in the
+        same order, each from the point of view of that game's player to move
+        :param games: iterable of games
+        :return:
+        """
+
+        evaluate = self.evaluate
+        return [evaluate(game) for game in games]
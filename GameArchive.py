@@ -0,0 +1,215 @@
+# Description: Fast analytics over large game record files (see GameRecord.py). The file is memory mapped and moves
+#              are decoded straight out of the mapping without copying. Every game is replayed on one reusable game
+#              object, which is reset in place between games instead of being rebuilt.
+#              Run 'python GameArchive.py games.hsgr' to print game length and capture statistics.
+
+import mmap
+import sys
+from array import array
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from GameRecord import MAGIC, RECORD_HEADER, RESULTS, GameRecordError
+
+PIECE_CODES = {"R": -1, "B": 1, ".": 0}
+
+
+class GameArchive:
+    """
+    This class memory maps a game record file. Opening it reads only the small record headers to find where each
+    game starts; moves are decoded on demand from the mapping. It can be used as a context manager.
+    """
+
+    def __init__(self, path, game_class=BitboardHasamiShogiGame):
+        """
+        :param path: game record file
+        :param game_class: HasamiShogiGame or BitboardHasamiShogiGame, one instance is reused for every game
+        """
+
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:                                      # an empty file can't be mapped
+            self._file.close()
+            raise GameRecordError(str(path) + " is not a game record file") from None
+        self._view = memoryview(self._map)
+        if self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise GameRecordError(str(path) + " is not a game record file")
+        try:
+            self._offsets = self.index_games()
+        except GameRecordError:
+            self.close()
+            raise
+        self._game = game_class()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """
+        This returns the number of games in the archive
+        :return:
+        """
+
+        return len(self._offsets)
+
+    def index_games(self):
+        """
+        This is a helper function that walks the record headers and returns an array of the offset of every game. The
+        result codes are checked here, so the header readers can look them up without checking.
+        :return:
+        """
+
+        offsets = array("Q")
+        view = self._view
+        offset = len(MAGIC)
+        end = len(view)
+
+        while offset < end:
+            if offset + RECORD_HEADER.size > end:
+                raise GameRecordError("truncated record header")
+            if view[offset] >= len(RESULTS):
+                raise GameRecordError("bad result code %d in record header" % view[offset])
+            offsets.append(offset)
+            move_count = view[offset + 3] | (view[offset + 4] << 8)
+            offset += RECORD_HEADER.size + 2 * move_count
+            if offset > end:
+                raise GameRecordError("truncated record moves")
+
+        return offsets
+
+    def close(self):
+        """
+        This releases the memory map and closes the file
+        :return:
+        """
+
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def get_game_header(self, game_number):
+        """
+        This returns (result, red_captured, black_captured, move_count) of one game, read from its header only
+        :param game_number:
+        :return:
+        """
+
+        result_code, red_captured, black_captured, move_count = RECORD_HEADER.unpack_from(
+            self._view, self._offsets[game_number])
+        return RESULTS[result_code], red_captured, black_captured, move_count
+
+    def iter_positions(self, start=0, stop=None):
+        """
+        This is a generator that replays games start --> stop (all games by default) and yields
+        (game_number, ply, game) after every move, where ply is the number of moves made so far. The same game object
+        is yielded every time and is changed by the next step, so copy anything that needs to be kept.
+        :param start:
+        :param stop:
+        :return:
+        """
+
+        if stop is None:
+            stop = len(self._offsets)
+        view = self._view
+        game = self._game
+        header_size = RECORD_HEADER.size
+
+        for game_number in range(start, stop):
+            offset = self._offsets[game_number]
+            move_count = view[offset + 3] | (view[offset + 4] << 8)
+            game.reset()
+            position = offset + header_size
+            for ply in range(1, move_count + 1):
+                if not game.make_move_idx(view[position], view[position + 1]):
+                    raise GameRecordError("illegal move %d in game %d" % (ply - 1, game_number))
+                position += 2
+                yield game_number, ply, game
+
+    def game_length_distribution(self):
+        """
+        This returns a dictionary of game length (moves) --> number of games, from the headers only
+        :return:
+        """
+
+        view = self._view
+        lengths = {}
+        for offset in self._offsets:
+            move_count = view[offset + 3] | (view[offset + 4] << 8)
+            lengths[move_count] = lengths.get(move_count, 0) + 1
+        return lengths
+
+    def result_counts(self):
+        """
+        This returns a dictionary of result --> number of games, from the headers only
+        :return:
+        """
+
+        view = self._view
+        results = {}
+        for offset in self._offsets:
+            result = RESULTS[view[offset]]
+            results[result] = results.get(result, 0) + 1
+        return results
+
+    def capture_frequency_by_square(self):
+        """
+        This replays every game and returns a list of 81 counts, how many pieces were captured on each square
+        :return:
+        """
+
+        capture_counts = [0] * 81
+        for game_number, ply, game in self.iter_positions():
+            for square in game.get_last_move_captures():
+                capture_counts[square] += 1
+        return capture_counts
+
+    def to_numpy(self, start=0, stop=None):
+        """
+        This replays games start --> stop and returns two NumPy arrays for machine learning: positions, an (N, 81)
+        int8 array with 1 for black, -1 for red and 0 for empty, one row per position after each move, and
+        red_to_move, an (N,) bool array. NumPy is only needed for this method.
+        :param start:
+        :param stop:
+        :return:
+        """
+
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("GameArchive.to_numpy needs NumPy, install it with 'pip install numpy'")
+
+        if stop is None:
+            stop = len(self._offsets)
+        view = self._view
+        position_count = sum(view[offset + 3] | (view[offset + 4] << 8) for offset in self._offsets[start:stop])
+        positions = numpy.zeros((position_count, 81), dtype=numpy.int8)
+        red_to_move = numpy.zeros(position_count, dtype=bool)
+        piece_codes = numpy.zeros(256, dtype=numpy.int8)
+        for piece, code in PIECE_CODES.items():
+            piece_codes[ord(piece)] = code
+
+        row = 0
+        for game_number, ply, game in self.iter_positions(start, stop):
+            board = numpy.frombuffer(game.get_board().encode("ascii"), dtype=numpy.uint8)
+            positions[row] = piece_codes[board]
+            red_to_move[row] = game.get_active_player() == "RED"
+            row += 1
+
+        return positions, red_to_move
+
+
+if __name__ == "__main__":
+    with GameArchive(sys.argv[1]) as archive:
+        print(len(archive), "games")
+        print("Results:", archive.result_counts())
+        length_counts = archive.game_length_distribution()
+        print("Game lengths:", dict(sorted(length_counts.items())))
+        square_captures = archive.capture_frequency_by_square()
+        print("Captures by square:")
+        for board_row in range(9):
+            row_counts = square_captures[board_row * 9:board_row * 9 + 9]
+            print("abcdefghi"[board_row], " ".join("%4d" % count for count in row_counts))
@@ -0,0 +1,167 @@
+# Description: A compact binary format for Hasami Shogi game records, with a streaming writer and a generator based
+#              reader. A file starts with the 5 byte magic b"HSGR\x01", followed by one record per game:
+#
+#                  result       1 byte   0 = 'UNFINISHED', 1 = 'RED_WON', 2 = 'BLACK_WON'
+#                  red_captured 1 byte
+#                  black_capt.  1 byte
+#                  move count   2 bytes  little endian
+#                  moves        2 bytes per move, the square moved from then the square moved to (0 --> 80)
+
+import struct
+
+from HasamiShogiGame import HasamiShogiGame
+
+MAGIC = b"HSGR\x01"
+RECORD_HEADER = struct.Struct("<BBBH")
+RESULTS = ("UNFINISHED", "RED_WON", "BLACK_WON")
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+
+class GameRecordError(ValueError):
+    """
+    This is raised when a game record file is not in the expected format, or a stored move can't be replayed
+    """
+
+
+def pack_moves(moves):
+    """
+    This packs a list of (moved_from, moved_to) square numbers into 2 bytes per move. Raises ValueError if a square
+    number is outside 0 --> 80.
+    :param moves:
+    :return:
+    """
+
+    for move in moves:
+        if not (0 <= move[0] < 81 and 0 <= move[1] < 81):
+            raise ValueError("move %r has a square outside 0 --> 80" % (tuple(move),))
+
+    packed_moves = bytearray(2 * len(moves))
+    packed_moves[0::2] = bytes(move[0] for move in moves)
+    packed_moves[1::2] = bytes(move[1] for move in moves)
+    return bytes(packed_moves)
+
+
+def unpack_moves(packed_moves):
+    """
+    This turns 2 bytes per move back into a list of (moved_from, moved_to) square numbers
+    :param packed_moves:
+    :return:
+    """
+
+    return list(zip(packed_moves[0::2], packed_moves[1::2]))
+
+
+class GameRecordWriter:
+    """
+    This class appends game records to a binary file as they arrive, so games never have to be held in memory.
+    It can be used as a context manager.
+    """
+
+    def __init__(self, path):
+        """
+        This opens 'path' for writing and writes the file magic
+        :param path:
+        """
+
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._games = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_game(self, moves, result, red_captured, black_captured):
+        """
+        This writes one game record
+        :param moves: list of (moved_from, moved_to) square numbers
+        :param result: 'UNFINISHED', 'RED_WON' or 'BLACK_WON'
+        :param red_captured: number of red pieces captured
+        :param black_captured: number of black pieces captured
+        :return:
+        """
+
+        if len(moves) > 0xFFFF:
+            raise GameRecordError("a game record holds at most 65535 moves")
+
+        packed_moves = pack_moves(moves)
+        self._file.write(RECORD_HEADER.pack(RESULT_CODES[result], red_captured, black_captured, len(moves)))
+        self._file.write(packed_moves)
+        self._games += 1
+
+    def write_record(self, record):
+        """
+        This writes a game record dictionary, as made by SelfPlayRunner
+        :param record:
+        :return:
+        """
+
+        self.write_game(record["moves"], record["result"], record["red_captured"], record["black_captured"])
+
+    def get_games_written(self):
+        """
+        This returns how many games have been written
+        :return:
+        """
+
+        return self._games
+
+    def close(self):
+        """
+        This closes the file
+        :return:
+        """
+
+        self._file.close()
+
+
+def read_game_records(path):
+    """
+    This is a generator that reads one game at a time from a game record file and yields
+    (result, red_captured, black_captured, moves), where moves is a list of (moved_from, moved_to) square numbers.
+    Only one game is in memory at a time.
+    :param path:
+    :return:
+    """
+
+    with open(path, "rb") as record_file:
+        if record_file.read(len(MAGIC)) != MAGIC:
+            raise GameRecordError(str(path) + " is not a game record file")
+
+        while True:
+            header = record_file.read(RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) != RECORD_HEADER.size:
+                raise GameRecordError("truncated record header")
+            result_code, red_captured, black_captured, move_count = RECORD_HEADER.unpack(header)
+            if result_code >= len(RESULTS):
+                raise GameRecordError("bad result code %d in record header" % result_code)
+            packed_moves = record_file.read(2 * move_count)
+            if len(packed_moves) != 2 * move_count:
+                raise GameRecordError("truncated record moves")
+            yield RESULTS[result_code], red_captured, black_captured, unpack_moves(packed_moves)
+
+
+def replay_game_records(path, game_class=HasamiShogiGame):
+    """
+    This is a generator that replays every game in a game record file through make_move_idx (make_move on square
+    numbers) and yields (result, red_captured, black_captured, game) with the game at its final position. A
+    GameRecordError is raised if a stored move is illegal or the final position doesn't match the stored result.
+    :param path:
+    :param game_class:
+    :return:
+    """
+
+    for result, red_captured, black_captured, moves in read_game_records(path):
+        game = game_class()
+        for move_number, (from_square, to_square) in enumerate(moves):
+            if not game.make_move_idx(from_square, to_square):
+                raise GameRecordError("illegal move %d in game record" % move_number)
+
+        if (game.get_game_state() != result or game.get_num_captured_pieces("RED") != red_captured or
+                game.get_num_captured_pieces("BLACK") != black_captured):
+            raise GameRecordError("game record result doesn't match its moves")
+        yield result, red_captured, black_captured, game
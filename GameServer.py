@@ -0,0 +1,363 @@
+# Description: An asyncio server that hosts many Hasami Shogi games at once over TCP. Clients send one command per
+#              line and get one reply line back, so the same text can be carried in WebSocket text frames by a
+#              gateway. Live games are kept in a GameRegistry, games nobody has touched for a while are evicted, and
+#              each connection is throttled by waiting for its replies to be sent before reading the next command.
+#              Moves are checked and made with make_move, which takes microseconds, so no session ever waits on
+#              another one.
+#              Run 'python GameServer.py --port 8765' to serve, or 'python GameServer.py --demo' to play a short game
+#              against a local server.
+#
+#              Commands                        Replies
+#                  NEW                             OK <game id>
+#                  MOVE <game id> <from> <to>      OK <game state> <active player>   or   ERR illegal move
+#                  BOARD <game id>                 OK <81 character board> <game state> <active player>
+#                  MOVES <game id>                 OK <legal moves as from-to, space separated>
+#                  CLOSE <game id>                 OK
+#                  PING                            OK PONG
+#                  QUIT                            OK BYE, then the connection is closed
+#              Any error is 'ERR <reason>', for example 'ERR unknown game'.
+
+import argparse
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from HasamiShogiGame import SQUARE_NAMES
+
+MAX_LINE_BYTES = 256            # longer lines are refused, a real command is under 30 bytes
+MAX_PENDING_BYTES = 64 * 1024   # replies buffered for a slow reader before the server stops reading its commands
+
+
+class GameRegistry:
+    """
+    This class holds the live games by game id, least recently used first, so idle games are found at the front
+    without looking at every game
+    """
+
+    def __init__(self, max_games=100000, idle_seconds=600.0, game_class=BitboardHasamiShogiGame):
+        """
+        :param max_games: NEW is refused once this many games are live
+        :param idle_seconds: a game not used for this long is evicted by evict_idle
+        :param game_class: HasamiShogiGame or BitboardHasamiShogiGame, the bitboard game is the smaller one
+        """
+
+        self._games = OrderedDict()            # game id --> [game, time last used]
+        self._max_games = max_games
+        self._idle_seconds = idle_seconds
+        self._game_class = game_class
+        self._game_ids = itertools.count(1)
+        self._evicted = 0
+
+    def __len__(self):
+        return len(self._games)
+
+    def create_game(self):
+        """
+        This starts a new game and returns its id, or None if the registry is full
+        :return:
+        """
+
+        if len(self._games) >= self._max_games:
+            self.evict_idle()
+            if len(self._games) >= self._max_games:
+                return None
+        game_id = next(self._game_ids)
+        self._games[game_id] = [self._game_class(), time.monotonic()]
+        return game_id
+
+    def get_game(self, game_id):
+        """
+        This returns the game with id 'game_id' and marks it as just used, or None if there is no such game
+        :param game_id:
+        :return:
+        """
+
+        entry = self._games.get(game_id)
+        if entry is None:
+            return None
+        entry[1] = time.monotonic()
+        self._games.move_to_end(game_id)
+        return entry[0]
+
+    def remove_game(self, game_id):
+        """
+        This removes a game, returns False if there was no such game
+        :param game_id:
+        :return:
+        """
+
+        return self._games.pop(game_id, None) is not None
+
+    def evict_idle(self):
+        """
+        This removes every game that hasn't been used for idle_seconds and returns how many were removed
+        :return:
+        """
+
+        oldest_allowed = time.monotonic() - self._idle_seconds
+        games = self._games
+        evicted = 0
+        while games:
+            game_id, (game, last_used) = next(iter(games.items()))
+            if last_used > oldest_allowed:
+                break
+            del games[game_id]
+            evicted += 1
+        self._evicted += evicted
+        return evicted
+
+    def get_stats(self):
+        """
+        This returns a dictionary of live games and games evicted so far
+        :return:
+        """
+
+        return {"live_games": len(self._games), "evicted_games": self._evicted}
+
+
+class GameServer:
+    """
+    This class serves the line protocol described at the top of this file for every connection, all on one event
+    loop and one GameRegistry
+    """
+
+    def __init__(self, registry=None, eviction_interval=30.0):
+        """
+        :param registry: GameRegistry to use, a default one if not given
+        :param eviction_interval: seconds between sweeps for idle games
+        """
+
+        self._registry = registry if registry is not None else GameRegistry()
+        self._eviction_interval = eviction_interval
+        self._server = None
+        self._eviction_task = None
+        self._connections = 0
+
+    def get_registry(self):
+        """
+        This returns the GameRegistry of live games
+        :return:
+        """
+
+        return self._registry
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """
+        This starts listening and returns the (host, port) actually bound, port 0 picks a free port
+        :param host:
+        :param port:
+        :return:
+        """
+
+        self._server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE_BYTES)
+        self._eviction_task = asyncio.ensure_future(self.evict_idle_games())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """
+        This serves until cancelled
+        :return:
+        """
+
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        """
+        This stops listening and stops the eviction sweeps
+        :return:
+        """
+
+        self._eviction_task.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def evict_idle_games(self):
+        """
+        This sweeps the registry for idle games every eviction_interval seconds. Idle games are at the front of the
+        registry, so a sweep only looks at the games it evicts.
+        :return:
+        """
+
+        while True:
+            await asyncio.sleep(self._eviction_interval)
+            self._registry.evict_idle()
+
+    async def handle_connection(self, reader, writer):
+        """
+        This reads commands from one connection and answers each one in order. After each reply it waits until the
+        connection has room again (drain), so a client that sends commands faster than it reads replies is slowed
+        down instead of filling the server's memory.
+        :param reader:
+        :param writer:
+        :return:
+        """
+
+        writer.transport.set_write_buffer_limits(high=MAX_PENDING_BYTES)
+        self._connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:                  # longer than MAX_LINE_BYTES
+                    writer.write(b"ERR line too long\n")
+                    break
+                if not line:
+                    break
+                reply = self.handle_command(line.decode("ascii", "replace").split())
+                writer.write(reply.encode("ascii") + b"\n")
+                await writer.drain()
+                if reply == "OK BYE":
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    def handle_command(self, words):
+        """
+        This carries out one command, already split into words, and returns the reply line without the newline
+        :param words:
+        :return:
+        """
+
+        if not words:
+            return "ERR empty command"
+        command = words[0].upper()
+
+        if command == "PING":
+            return "OK PONG"
+        if command == "QUIT":
+            return "OK BYE"
+        if command == "NEW":
+            game_id = self._registry.create_game()
+            return "ERR server full" if game_id is None else "OK %d" % game_id
+        if command not in ("MOVE", "BOARD", "MOVES", "CLOSE"):
+            return "ERR unknown command"
+
+        if len(words) != (4 if command == "MOVE" else 2):
+            return "ERR wrong number of arguments"
+        try:
+            game_id = int(words[1])
+        except ValueError:
+            return "ERR unknown game"
+        if command == "CLOSE":
+            return "OK" if self._registry.remove_game(game_id) else "ERR unknown game"
+        game = self._registry.get_game(game_id)
+        if game is None:
+            return "ERR unknown game"
+
+        if command == "MOVE":
+            if not game.make_move(words[2].lower(), words[3].lower()):
+                return "ERR illegal move"
+            game.clear_history()        # moves are never taken back here, so live games don't grow move by move
+            return "OK %s %s" % (game.get_game_state(), game.get_active_player())
+        if command == "BOARD":
+            return "OK %s %s %s" % (game.get_board(), game.get_game_state(), game.get_active_player())
+        return "OK " + " ".join(SQUARE_NAMES[from_square] + "-" + SQUARE_NAMES[to_square]
+                                for from_square, to_square in game.generate_legal_moves())
+
+
+class GameClient:
+    """
+    This class is a small client for the line protocol, for testing a server from the same machine
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        """
+        This opens a connection and returns a GameClient for it
+        :param host:
+        :param port:
+        :return:
+        """
+
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, command):
+        """
+        This sends one command line and returns the reply line without the newline
+        :param command:
+        :return:
+        """
+
+        self._writer.write(command.encode("ascii") + b"\n")
+        await self._writer.drain()
+        return (await self._reader.readline()).decode("ascii").rstrip("\n")
+
+    async def close(self):
+        """
+        This closes the connection
+        :return:
+        """
+
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def run_demo(games=100):
+    """
+    This starts a server on a free local port, plays 'games' games at once from separate connections by always
+    making the first legal move, and prints the results and the time taken
+    :param games:
+    :return:
+    """
+
+    server = GameServer()
+    host, port = await server.start(port=0)
+
+    async def play_one_game():
+        client = await GameClient.connect(host, port)
+        game_id = (await client.request("NEW")).split()[1]
+        state = "UNFINISHED"
+        for move_number in range(200):
+            legal_moves = (await client.request("MOVES " + game_id)).split()[1:]
+            if not legal_moves:
+                break
+            from_square, to_square = legal_moves[move_number % len(legal_moves)].split("-")
+            state = (await client.request("MOVE %s %s %s" % (game_id, from_square, to_square))).split()[1]
+            if state != "UNFINISHED":
+                break
+        await client.request("CLOSE " + game_id)
+        await client.request("QUIT")
+        await client.close()
+        return state
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play_one_game() for game_number in range(games)))
+    seconds = time.perf_counter() - start
+    await server.stop()
+
+    result_counts = {}
+    for result in results:
+        result_counts[result] = result_counts.get(result, 0) + 1
+    print("%d concurrent games in %.2f seconds, results %s" % (games, seconds, result_counts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Hasami Shogi games over a line based TCP protocol")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-games", type=int, default=100000)
+    parser.add_argument("--idle-seconds", type=float, default=600.0)
+    parser.add_argument("--demo", action="store_true", help="play games against a local server and exit")
+    arguments = parser.parse_args()
+
+    async def serve():
+        server = GameServer(GameRegistry(arguments.max_games, arguments.idle_seconds))
+        bound_host, bound_port = await server.start(arguments.host, arguments.port)
+        print("Serving Hasami Shogi on %s:%d" % (bound_host, bound_port))
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run_demo() if arguments.demo else serve())
+    except KeyboardInterrupt:
+        pass
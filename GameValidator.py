@@ -0,0 +1,174 @@
+# Description: Checks whole Hasami Shogi games for illegal moves in bulk, for ingesting game logs. Each game is played
+#              on one reused game with make_move_idx, so a legal move costs one bitboard move and nothing is parsed
+#              twice; only when a move is turned down is the position looked at again to tell why. Every game gives
+#              a result dictionary with the index and reason of its first illegal move, and many games can be
+#              spread over a process pool.
+#              Run 'python GameValidator.py games.hsgr' to check the games in game record files.
+
+import argparse
+import multiprocessing
+import os
+import time
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from GameRecord import read_game_records
+from HasamiShogiGame import SQUARE_INDEX, SQUARE_TUPLES
+
+WORKER_GAMES = {}                   # game class --> the game reused by validate_game_task in this process
+
+
+def parse_square(square):
+    """
+    This is a helper function that returns the square number 0 --> 80 of a square given as a number or in algebraic
+    notation ('b3'), or None if it isn't a square on the board. True and False are ints to Python but not squares.
+    :param square:
+    :return:
+    """
+
+    if isinstance(square, str):
+        return SQUARE_INDEX.get(square.lower())
+    if isinstance(square, int) and not isinstance(square, bool) and 0 <= square < 81:
+        return square
+    return None
+
+
+def illegal_move_reason(game, from_square, to_square):
+    """
+    This returns why make_move_idx turned down from_square --> to_square in 'game', in the words
+    check_valid_move_at uses where it has them
+    :param game:
+    :param from_square:
+    :param to_square:
+    :return:
+    """
+
+    if game.get_game_state() != "UNFINISHED":
+        return "game over"
+    if from_square == to_square:
+        return "same square"
+    board = game.get_board()
+    if board[from_square] != game.get_active_player()[0]:
+        return "not the active player's piece" if board[from_square] != "." else "no piece to move"
+
+    from_row, from_column = SQUARE_TUPLES[from_square]
+    to_row, to_column = SQUARE_TUPLES[to_square]
+    if from_row == to_row:
+        step = 1 if to_column > from_column else -1
+        if any(board[square] != "." for square in range(from_square + step, to_square + step, step)):
+            return "occupied space, row"
+    elif from_column == to_column:
+        step = 9 if to_row > from_row else -9
+        if any(board[square] != "." for square in range(from_square + step, to_square + step, step)):
+            return "occupied space, column"
+    else:
+        return "not valid direction"
+    return "illegal move"
+
+
+def validate_game(moves, game=None, game_class=BitboardHasamiShogiGame):
+    """
+    This plays 'moves' from the starting position and returns a dictionary with
+    valid: True if every move was legal
+    moves_played: the number of legal moves before the first illegal one (all of them if valid)
+    illegal_move_index: the index in 'moves' of the first illegal move, or None
+    reason: why that move is illegal, or None
+    game_state, red_captured, black_captured: the game after the legal moves
+    :param moves: iterable of (moved_from, moved_to) pairs, each square a number 0 --> 80 or algebraic notation
+    :param game: a game to reuse (it is reset first), a new game_class game if not given
+    :param game_class: HasamiShogiGame or BitboardHasamiShogiGame
+    :return:
+    """
+
+    if game is None:
+        game = game_class()
+    else:
+        game.reset()
+
+    make_move_idx = game.make_move_idx
+    moves_played = 0
+    reason = None
+    for move in moves:
+        try:
+            moved_from, moved_to = move
+        except (TypeError, ValueError):
+            reason = "not a (moved_from, moved_to) pair"
+            break
+        from_square = parse_square(moved_from)
+        to_square = parse_square(moved_to)
+        if from_square is None or to_square is None:
+            reason = "invalid square"
+            break
+        if not make_move_idx(from_square, to_square):
+            reason = illegal_move_reason(game, from_square, to_square)
+            break
+        moves_played += 1
+
+    return {"valid": reason is None, "moves_played": moves_played,
+            "illegal_move_index": None if reason is None else moves_played, "reason": reason,
+            "game_state": game.get_game_state(), "red_captured": game.get_num_captured_pieces("RED"),
+            "black_captured": game.get_num_captured_pieces("BLACK")}
+
+
+def validate_game_task(task):
+    """
+    This checks one game inside a worker process and returns its result with the game number added. It is a plain
+    module level function so the pool can pickle it, and reuses one game per process.
+    :param task: tuple (game_number, moves, game_class)
+    :return:
+    """
+
+    game_number, moves, game_class = task
+    game = WORKER_GAMES.get(game_class)
+    if game is None:
+        game = WORKER_GAMES[game_class] = game_class()
+    result = validate_game(moves, game)
+    result["game_number"] = game_number
+    return result
+
+
+def validate_games(games, workers=1, chunksize=64, game_class=BitboardHasamiShogiGame):
+    """
+    This checks every game in 'games' and yields the validate_game results, with a 'game_number' (the position in
+    'games') added, in the same order as the games. Games are read from the iterable as they are needed, so any
+    number of games can be streamed through.
+    :param games: iterable of move lists, see validate_game
+    :param workers: number of worker processes, 1 checks the games in this process, None uses every core
+    :param chunksize: games per task sent to a worker, larger chunks cost less pickling
+    :param game_class: HasamiShogiGame or BitboardHasamiShogiGame
+    :return:
+    """
+
+    workers = workers or os.cpu_count() or 1
+    tasks = ((game_number, moves, game_class) for game_number, moves in enumerate(games))
+    if workers == 1:
+        for task in tasks:
+            yield validate_game_task(task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(validate_game_task, tasks, chunksize)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the games in Hasami Shogi game record files")
+    parser.add_argument("records", nargs="+")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, 0 for one per core")
+    arguments = parser.parse_args()
+
+    def record_moves():
+        for record_path in arguments.records:
+            for result, red_captured, black_captured, record in read_game_records(record_path):
+                yield record
+
+    start = time.perf_counter()
+    checked = 0
+    invalid = 0
+    for game_result in validate_games(record_moves(), arguments.workers):
+        checked += 1
+        if not game_result["valid"]:
+            invalid += 1
+            print("game %d: move %d, %s" % (game_result["game_number"], game_result["illegal_move_index"],
+                                            game_result["reason"]))
+    seconds = time.perf_counter() - start
+    print("%d games checked, %d invalid, in %.2f seconds, %.0f games/s" % (checked, invalid, seconds,
+                                                                           checked / seconds if seconds else 0.0))
@@ -3,27 +3,454 @@
 # Description: This is a program that runs a Hasami Shogi Game, based on variant 1, where there are only one type of
 #              piece and a two person game.
 
+import random
+from array import array
+
+ZOBRIST_SEED = 20211120
+
+
+def build_square_rays():
+    """
+    This builds the rook rays for every square on the board, used to generate legal moves. Squares are numbered 0 -->
+    80, square = row * 9 + column, so 'a1' is 0, 'a9' is 8 and 'i9' is 80. For each square there is a tuple of four
+    rays (left, right, up, down), and each ray is a tuple of (square, row, column) in the order a piece slides over
+    them.
+    :return:
+    """
+
+    square_rays = []
+    for square in range(81):
+        row, column = divmod(square, 9)
+        rays = (tuple((row * 9 + col, row, col) for col in range(column - 1, -1, -1)),
+                tuple((row * 9 + col, row, col) for col in range(column + 1, 9)),
+                tuple((r * 9 + column, r, column) for r in range(row - 1, -1, -1)),
+                tuple((r * 9 + column, r, column) for r in range(row + 1, 9)))
+        square_rays.append(rays)
+    return tuple(square_rays)
+
+
+SQUARE_RAYS = build_square_rays()
+SQUARE_NAMES = tuple(row + str(column) for row in "abcdefghi" for column in range(1, 10))    # square --> 'a1'
+SQUARE_INDEX = {name: square for square, name in enumerate(SQUARE_NAMES)}                    # 'a1' --> square
+SQUARE_TUPLES = tuple(divmod(square, 9) for square in range(81))                            # square --> (row, column)
+BOARD_NOTATION = {name: SQUARE_TUPLES[square] for square, name in enumerate(SQUARE_NAMES)}  # 'a1' --> (row, column)
+CORNER_NEIGHBOURS = {1: (0, 9), 9: (0, 1), 7: (8, 17), 17: (8, 7),            # square next to a corner -->
+                     63: (72, 73), 73: (72, 63), 71: (80, 79), 79: (80, 71)}   # (corner, other square next to it)
+
+
+def notation_to_square(board_location):
+    """
+    This converts algebraic notation, for example 'b3', into a square number 0 --> 80 with one table lookup. Returns
+    None for anything that isn't a square on the board.
+    :param board_location:
+    :return:
+    """
+
+    return SQUARE_INDEX.get(board_location)
+
+
+def square_to_notation(square):
+    """
+    This converts a square number 0 --> 80 back into algebraic notation, for example 11 --> 'b3'
+    :param square:
+    :return:
+    """
+
+    return SQUARE_NAMES[square]
+
+
+def build_capture_runs():
+    """
+    This builds the capture lookup tables. Every row and column of the board is also kept as a base 3 number, one
+    digit per square ('.' = 0, 'B' = 1, 'R' = 2). The digits on one side of a square, nearest square first, make a
+    half line key 0 --> 3^8 - 1, and CAPTURE_RUNS[piece][key] is how many opponent pieces a 'piece' landing on that
+    square captures on that side: a run of opponent pieces closed off by one of its own pieces, otherwise 0.
+    :return:
+    """
+
+    capture_runs = {}
+    for piece, own_digit, opponent_digit in (("B", 1, 2), ("R", 2, 1)):
+        runs = []
+        for key in range(3 ** 8):
+            run = 0
+            while key % 3 == opponent_digit:
+                run += 1
+                key //= 3
+            runs.append(run if run and key % 3 == own_digit else 0)
+        capture_runs[piece] = tuple(runs)
+    return capture_runs
+
+
+def build_reversed_line_codes(line_codes):
+    """
+    This builds the table of every line code read backwards: entry n is the code of the line whose code is n, with
+    the order of its 9 digits turned round, so a half line key can be read towards the start of the line. The codes
+    in the table are the int objects of 'line_codes'.
+    :param line_codes: LINE_CODES
+    :return:
+    """
+
+    reversed_codes = []
+    for code in line_codes:
+        reversed_code = 0
+        for _ in range(9):
+            reversed_code = reversed_code * 3 + code % 3
+            code //= 3
+        reversed_codes.append(line_codes[reversed_code])
+    return tuple(reversed_codes)
+
+
+def build_zobrist_keys(seed=ZOBRIST_SEED):
+    """
+    This builds the random 64 bit Zobrist keys used to hash positions: one key per square for a red piece, one per
+    square for a black piece, and one key that is mixed in when it is red's turn. The keys come from a seeded random
+    number generator so a position hashes the same in every process and in saved files.
+    :param seed:
+    :return:
+    """
+
+    rng = random.Random(seed)
+    piece_keys = {"R": tuple(rng.getrandbits(64) for _ in range(81)),
+                  "B": tuple(rng.getrandbits(64) for _ in range(81))}
+    red_to_move_key = rng.getrandbits(64)
+    return piece_keys, red_to_move_key
+
+
+def initial_zobrist_hash(piece_keys):
+    """
+    This returns the Zobrist hash of the starting position, red on row 'a', black on row 'i' and black to move
+    :param piece_keys:
+    :return:
+    """
+
+    zobrist_hash = 0
+    for column in range(9):
+        zobrist_hash ^= piece_keys["R"][column] ^ piece_keys["B"][72 + column]
+    return zobrist_hash
+
+
+ZOBRIST_KEYS, ZOBRIST_RED_TO_MOVE = build_zobrist_keys()
+INITIAL_ZOBRIST_HASH = initial_zobrist_hash(ZOBRIST_KEYS)
+CAPTURE_RUNS = build_capture_runs()
+PIECE_DIGITS = {".": 0, "B": 1, "R": 2}
+EMPTY_SQUARE = 0
+BLACK_PIECE = 1
+RED_PIECE = 2
+PIECE_CHARACTERS = ".BR"                                # board byte --> 'R', 'B' or '.'
+BOARD_TO_TEXT = bytes.maketrans(b"\x00\x01\x02", b".BR")
+TEXT_TO_BOARD = bytes.maketrans(b".BR", b"\x00\x01\x02")
+PIECE_ZOBRIST_KEYS = (None, ZOBRIST_KEYS["B"], ZOBRIST_KEYS["R"])          # indexed by board byte
+PIECE_CAPTURE_RUNS = (None, CAPTURE_RUNS["B"], CAPTURE_RUNS["R"])          # indexed by board byte
+INITIAL_BOARD = bytes([RED_PIECE] * 9 + [EMPTY_SQUARE] * 63 + [BLACK_PIECE] * 9)  # shared by every unplayed game
+POWERS_OF_3 = tuple(3 ** power for power in range(10))
+FULL_LINE_CODE = sum(POWERS_OF_3[:9])                   # every digit 1
+INITIAL_ROW_CODES = (2 * FULL_LINE_CODE,) + (0,) * 7 + (FULL_LINE_CODE,)
+INITIAL_COLUMN_CODES = (2 + POWERS_OF_3[8],) * 9       # red on row 'a' (digit 0), black on row 'i' (digit 8)
+# Every line code 0 --> 3^9 - 1. Games store these shared int objects in their line code lists rather than ints of
+# their own, so the 18 codes of a game cost one pointer each; the table is built once per process (about 700 kB).
+LINE_CODES = tuple(range(POWERS_OF_3[9]))
+REVERSED_LINE_CODES = build_reversed_line_codes(LINE_CODES)
+INITIAL_PIECE_SQUARES = (None, tuple(range(72, 81)), tuple(range(9)))     # indexed by board byte
+INITIAL_ROW_COUNTS = (9,) + (0,) * 7 + (9,)
+INITIAL_COLUMN_COUNTS = (2,) * 9
+GAME_STATES = ("UNFINISHED", "RED_WON", "BLACK_WON")
+GAME_STATE_CODES = {game_state: code for code, game_state in enumerate(GAME_STATES)}
+
+
+PROFILED_CLASSES = {}
+
+
+def profiled_class(game_class):
+    """
+    This returns a subclass of 'game_class' whose make_move and make_move_idx are the timed profiled_make_move and
+    profiled_make_move_idx. enable_profiling switches a game over to it, so games that aren't profiled keep running
+    the untimed methods. The subclass adds no slots, so a game can switch back and forth. It is named
+    'Profiled' + the class name in the module of 'game_class'; pickle finds classes by that name, so a module binds
+    it at module level (as this one does with ProfiledHasamiShogiGame) for its profiled games to reach process pools.
+    :param game_class:
+    :return:
+    """
+
+    subclass = PROFILED_CLASSES.get(game_class)
+    if subclass is None:
+        name = "Profiled" + game_class.__name__
+        subclass = type(name, (game_class,),
+                        {"__slots__": (), "__module__": game_class.__module__, "__qualname__": name,
+                         "make_move": game_class.profiled_make_move,
+                         "make_move_idx": game_class.profiled_make_move_idx, "_unprofiled_class": game_class})
+        PROFILED_CLASSES[game_class] = subclass
+    return subclass
+
+
 class HasamiShogiGame:
     """
     This class creates a new Hasami Shogi Game to be played by two players.
     """
 
+    __slots__ = ("_board", "_game_state", "_active_player", "_black_captured", "_red_captured", "_undo_stack",
+                 "_move_captures", "_zobrist_hash", "_hash_history", "_row_codes", "_column_codes", "_piece_squares",
+                 "_row_counts", "_column_counts", "_hash_counts", "_profiler")
+
     def __init__(self):
         """
         This initializes the game, creates the game board with all pieces in their starting locations, initializes the
         game_state to be 'UNFINISHED', active_player to be 'BLACK', which is the first player to go,
-        black_captured = 0 and red_captured = 0
+        black_captured = 0 and red_captured = 0. undo_stack holds, for unmake_move, the squares each move captured
+        followed by one packed record of the move (moved from | moved to << 7 | GAME_STATE_CODES of the state before
+        << 14 | number of captures << 16), and hash_history holds the Zobrist hash of every position reached, and
+        hash_counts how many times each of them was reached (built from hash_history the first time
+        get_repetition_count needs it), for spotting repeated positions. Both are arrays of machine integers, so a
+        move adds about 12 bytes of history rather than a tuple and an int object. The line codes hold every row and
+        column as a base 3 number, for the capture lookups (REVERSED_LINE_CODES reads them backwards), as the shared
+        LINE_CODES ints. piece_squares holds the squares of the black and red pieces (indexed by BLACK_PIECE and
+        RED_PIECE) in bytearrays, and row_counts and column_counts the number of pieces on each row and column, so
+        nothing has to scan the board to find the pieces. The board is 81 bytes, square = row * 9 + column, holding
+        EMPTY_SQUARE, BLACK_PIECE or RED_PIECE. A new game shares the read only INITIAL_BOARD, initial line codes,
+        piece squares and counts, and copies them on its first move.
         """
 
-        self._game_board = [["R", "R", "R", "R", "R", "R", "R", "R", "R"], [".", ".", ".", ".", ".", ".", ".", ".", "."],
-                            [".", ".", ".", ".", ".", ".", ".", ".", "."], [".", ".", ".", ".", ".", ".", ".", ".", "."],
-                            [".", ".", ".", ".", ".", ".", ".", ".", "."], [".", ".", ".", ".", ".", ".", ".", ".", "."],
-                            [".", ".", ".", ".", ".", ".", ".", ".", "."], [".", ".", ".", ".", ".", ".", ".", ".", "."],
-                            ["B", "B", "B", "B", "B", "B", "B", "B", "B"]]
+        self._board = INITIAL_BOARD
         self._game_state = "UNFINISHED"
         self._active_player = "BLACK"
         self._black_captured = 0
         self._red_captured = 0
+        self._undo_stack = array("I")
+        self._move_captures = []
+        self._zobrist_hash = INITIAL_ZOBRIST_HASH
+        self._hash_history = array("Q", (INITIAL_ZOBRIST_HASH,))
+        self._hash_counts = None
+        self._row_codes = INITIAL_ROW_CODES
+        self._column_codes = INITIAL_COLUMN_CODES
+        self._piece_squares = INITIAL_PIECE_SQUARES
+        self._row_counts = INITIAL_ROW_COUNTS
+        self._column_counts = INITIAL_COLUMN_COUNTS
+        self._profiler = None                   # a MoveProfiler while profiling is on, see enable_profiling
+
+    def reset(self):
+        """
+        This puts the game back to the starting position in place, so one game object can replay many games without
+        being rebuilt. The board goes back to sharing INITIAL_BOARD, so nothing is copied until the next move.
+        :return:
+        """
+
+        self._board = INITIAL_BOARD
+        self._game_state = "UNFINISHED"
+        self._active_player = "BLACK"
+        self._black_captured = 0
+        self._red_captured = 0
+        del self._undo_stack[:]
+        self._move_captures = []
+        self._zobrist_hash = INITIAL_ZOBRIST_HASH
+        del self._hash_history[:]
+        self._hash_history.append(INITIAL_ZOBRIST_HASH)
+        self._hash_counts = None
+        self._row_codes = INITIAL_ROW_CODES
+        self._column_codes = INITIAL_COLUMN_CODES
+        self._piece_squares = INITIAL_PIECE_SQUARES
+        self._row_counts = INITIAL_ROW_COUNTS
+        self._column_counts = INITIAL_COLUMN_COUNTS
+
+    def copy_initial_position(self):
+        """
+        This is a helper function for the copy on write board: it gives the game its own writable copies of the
+        shared starting board, line codes, piece squares and counts. update_game_board_at calls it on the first move
+        after __init__ or reset.
+        :return:
+        """
+
+        self._board = bytearray(INITIAL_BOARD)
+        self._row_codes = [LINE_CODES[code] for code in INITIAL_ROW_CODES]
+        self._column_codes = [LINE_CODES[code] for code in INITIAL_COLUMN_CODES]
+        self._piece_squares = [None, bytearray(INITIAL_PIECE_SQUARES[BLACK_PIECE]),
+                               bytearray(INITIAL_PIECE_SQUARES[RED_PIECE])]
+        self._row_counts = bytearray(INITIAL_ROW_COUNTS)
+        self._column_counts = bytearray(INITIAL_COLUMN_COUNTS)
+
+    def set_position(self, board, active_player="BLACK"):
+        """
+        This sets up any position from an 81 character board string (the format returned by get_board) and the player
+        to move. The captured counts are worked out from the pieces left (each player starts with 9), the game state
+        from the captured counts, and the move history is cleared so unmake_move can't go back past this position.
+        :param board:
+        :param active_player: 'RED' or 'BLACK'
+        :return:
+        """
+
+        if len(board) != 81 or set(board) - set("RB.") or board.count("R") > 9 or board.count("B") > 9:
+            raise ValueError("board must be 81 characters of 'R', 'B' and '.', with at most 9 of each color")
+        if active_player not in ("RED", "BLACK"):
+            raise ValueError("active_player must be 'RED' or 'BLACK'")
+
+        self._board = bytearray(board.encode("ascii").translate(TEXT_TO_BOARD))
+        self._row_codes = [0] * 9
+        self._column_codes = [0] * 9
+        self._piece_squares = [None, bytearray(), bytearray()]
+        self._row_counts = bytearray(9)
+        self._column_counts = bytearray(9)
+        for square, piece in enumerate(self._board):
+            if piece != EMPTY_SQUARE:
+                self.update_line_codes(square // 9, square % 9, piece)
+                self._piece_squares[piece].append(square)
+                self._row_counts[square // 9] += 1
+                self._column_counts[square % 9] += 1
+
+        self._active_player = active_player
+        self._red_captured = 9 - board.count("R")
+        self._black_captured = 9 - board.count("B")
+        self._game_state = "UNFINISHED"
+        self.update_game_state()
+        del self._undo_stack[:]
+        self._move_captures = []
+        self._zobrist_hash = self.compute_zobrist_hash()
+        del self._hash_history[:]
+        self._hash_history.append(self._zobrist_hash)
+        self._hash_counts = None
+
+    def clone(self):
+        """
+        This returns an independent copy of the game, for branching analysis: the board is copied as one flat buffer
+        and the counters, game state, active player, hash and move history come along, so the copy can make and
+        unmake moves without touching this game. A game still on the shared starting board keeps sharing it.
+        :return:
+        """
+
+        game = object.__new__(type(self))       # every slot is filled in below, so __init__ isn't needed
+        board = self._board
+        game._board = board if board is INITIAL_BOARD else bytearray(board)
+        game._game_state = self._game_state
+        game._active_player = self._active_player
+        game._black_captured = self._black_captured
+        game._red_captured = self._red_captured
+        game._undo_stack = self._undo_stack[:]
+        game._move_captures = self._move_captures.copy()
+        game._zobrist_hash = self._zobrist_hash
+        game._hash_history = self._hash_history[:]
+        game._hash_counts = None                # rebuilt from hash_history when it is needed
+        if board is INITIAL_BOARD:
+            game._row_codes = self._row_codes
+            game._column_codes = self._column_codes
+            game._piece_squares = self._piece_squares
+            game._row_counts = self._row_counts
+            game._column_counts = self._column_counts
+        else:
+            game._row_codes = self._row_codes.copy()
+            game._column_codes = self._column_codes.copy()
+            game._piece_squares = [None, self._piece_squares[BLACK_PIECE].copy(),
+                                   self._piece_squares[RED_PIECE].copy()]
+            game._row_counts = self._row_counts.copy()
+            game._column_counts = self._column_counts.copy()
+        game._profiler = self._profiler
+        return game
+
+    def snapshot(self):
+        """
+        This returns an immutable record of the current position and move history, which restore() puts back. Take a
+        snapshot at a branch point, explore one branch, restore, and explore the next.
+        :return:
+        """
+
+        board = self._board
+        if board is INITIAL_BOARD:
+            return (board, self._game_state, self._active_player, self._black_captured, self._red_captured,
+                    self._zobrist_hash, self._undo_stack.tobytes(), self._hash_history.tobytes(), None)
+        return (bytes(board), self._game_state, self._active_player, self._black_captured, self._red_captured,
+                self._zobrist_hash, self._undo_stack.tobytes(), self._hash_history.tobytes(),
+                (tuple(self._row_codes), tuple(self._column_codes), bytes(self._piece_squares[BLACK_PIECE]),
+                 bytes(self._piece_squares[RED_PIECE]), bytes(self._row_counts), bytes(self._column_counts)))
+
+    def restore(self, snapshot):
+        """
+        This puts the game back to the position and move history saved by snapshot(). The same snapshot can be
+        restored any number of times, into this game or one of its clones.
+        :param snapshot:
+        :return:
+        """
+
+        (board, self._game_state, self._active_player, self._black_captured, self._red_captured, self._zobrist_hash,
+         undo_stack, hash_history, line_codes) = snapshot
+        self._undo_stack = array("I", undo_stack)
+        self._hash_history = array("Q", hash_history)
+        self._hash_counts = None
+        self._move_captures = []
+        if line_codes is None:
+            self._board = INITIAL_BOARD
+            self._row_codes = INITIAL_ROW_CODES
+            self._column_codes = INITIAL_COLUMN_CODES
+            self._piece_squares = INITIAL_PIECE_SQUARES
+            self._row_counts = INITIAL_ROW_COUNTS
+            self._column_counts = INITIAL_COLUMN_COUNTS
+        else:
+            self._board = bytearray(board)
+            self._row_codes = list(line_codes[0])
+            self._column_codes = list(line_codes[1])
+            self._piece_squares = [None, bytearray(line_codes[2]), bytearray(line_codes[3])]
+            self._row_counts = bytearray(line_codes[4])
+            self._column_counts = bytearray(line_codes[5])
+
+    def clear_history(self):
+        """
+        This drops the undo records and the hashes of earlier positions, for games that are only stored and never
+        taken back, so a stored game doesn't grow move by move. Afterwards unmake_move can't go back past
+        this position and get_repetition_count counts from here, the same as after set_position.
+        :return:
+        """
+
+        del self._undo_stack[:]
+        self._move_captures = []
+        del self._hash_history[:]
+        self._hash_history.append(self._zobrist_hash)
+        self._hash_counts = None
+
+    def get_board(self):
+        """
+        This returns the board as an 81 character string of 'R', 'B' and '.', one row after another from 'a1' to
+        'i9', so square number n is character n
+        :return:
+        """
+
+        return self._board.translate(BOARD_TO_TEXT).decode("ascii")
+
+    def get_line_codes(self):
+        """
+        This returns (row_codes, column_codes), every row and column as a base 3 number ('.' = 0, 'B' = 1, 'R' = 2,
+        the square nearest 'a1' as the lowest digit). They are kept up to date by update_game_board and the capture
+        routines, so reading them is free; the sequences returned are the game's own and must not be changed.
+        :return:
+        """
+
+        return self._row_codes, self._column_codes
+
+    def get_piece_squares(self, player):
+        """
+        This returns a list of the square numbers of the pieces 'RED' or 'BLACK' has left, lowest first. The squares
+        are kept up to date move by move, so no board scan is needed.
+        :param player:
+        :return:
+        """
+
+        return sorted(self._piece_squares[BLACK_PIECE if player == "BLACK" else RED_PIECE])
+
+    def get_occupancy_counts(self):
+        """
+        This returns (row_counts, column_counts), the number of pieces of either color on each row ('a' first) and
+        each column ('1' first). Like the line codes they are the game's own sequences and must not be changed.
+        :return:
+        """
+
+        return self._row_counts, self._column_counts
+
+    def get_last_move_captures(self):
+        """
+        This returns a tuple of the square numbers captured by the last move made, lowest first, empty if it captured
+        nothing or no move has been made
+        :return:
+        """
+
+        undo_stack = self._undo_stack
+        if not undo_stack:
+            return ()
+        captured_count = undo_stack[-1] >> 16
+        return tuple(sorted(undo_stack[len(undo_stack) - 1 - captured_count:-1]))     # stored in the order removed
 
     def get_game_state(self):
         """
@@ -41,6 +468,61 @@ class HasamiShogiGame:
 
         return self._active_player
 
+    def get_zobrist_hash(self):
+        """
+        This returns the 64 bit Zobrist hash of the current position (pieces and whose turn it is). It is kept up to
+        date by update_game_board, the capture functions and player_turn, so reading it is free.
+        :return:
+        """
+
+        return self._zobrist_hash
+
+    def compute_zobrist_hash(self):
+        """
+        This computes the Zobrist hash of the current position from scratch, by scanning the whole board. It should
+        always equal get_zobrist_hash, and is mainly for testing.
+        :return:
+        """
+
+        zobrist_hash = 0
+        for square, piece in enumerate(self._board):
+            if piece != EMPTY_SQUARE:
+                zobrist_hash ^= PIECE_ZOBRIST_KEYS[piece][square]
+        if self._active_player == "RED":
+            zobrist_hash ^= ZOBRIST_RED_TO_MOVE
+        return zobrist_hash
+
+    def get_repetition_count(self):
+        """
+        This returns how many times the current position has been reached before in this game, with the same player to
+        move. 0 means the position is new. The counts are kept move by move once this has been called, so it is one
+        dictionary lookup however long the game is.
+        :return:
+        """
+
+        hash_counts = self._hash_counts
+        if hash_counts is None:
+            hash_counts = self._hash_counts = {}
+            for zobrist_hash in self._hash_history:
+                hash_counts[zobrist_hash] = hash_counts.get(zobrist_hash, 0) + 1
+        return hash_counts[self._zobrist_hash] - 1
+
+    def forget_position(self, zobrist_hash):
+        """
+        This is a helper function for unmake_move: it takes one off the count of 'zobrist_hash' in hash_counts, and
+        drops the entry once the count reaches 0, so the counts only ever hold the positions in hash_history
+        :param zobrist_hash: the hash just popped off hash_history
+        :return:
+        """
+
+        hash_counts = self._hash_counts
+        if hash_counts is not None:
+            count = hash_counts[zobrist_hash]
+            if count == 1:
+                del hash_counts[zobrist_hash]
+            else:
+                hash_counts[zobrist_hash] = count - 1
+
     def get_num_captured_pieces(self, player):
         """
         Takes one parameter, 'RED' or 'BLACK' and returns the number of pieces of that color that have been captured.
@@ -71,10 +553,14 @@ class HasamiShogiGame:
         """
         This is a helper function that takes the algebraic input from the user and converts it into a usable tuple that
         can be used to index into the game board.[The tuple is (row, column)] Various methods use this including,
-        make_move, get_square_occupant
+        make_move, get_square_occupant. Valid squares come straight from the precomputed BOARD_NOTATION table.
         :param board_location:
         :return:
         """
+        square_tuple = BOARD_NOTATION.get(board_location)
+        if square_tuple is not None:
+            return square_tuple
+
         board_location_row = board_location[0]
         board_location_column = board_location[1]
         rows = "abcdefghi"
@@ -99,11 +585,11 @@ class HasamiShogiGame:
         """
 
         square = self.convert_board_notation(square_location)   # sends the input parameter to the helper function and returns the usable tuple (row, column)
-        square_occupant = self._game_board[square[0]][square[1]]
+        square_occupant = self._board[square[0] * 9 + square[1]]
 
-        if square_occupant == "R":
+        if square_occupant == RED_PIECE:
             return "RED"
-        elif square_occupant == "B":
+        elif square_occupant == BLACK_PIECE:
             return "BLACK"
         else:
             return "NONE"
@@ -124,86 +610,325 @@ class HasamiShogiGame:
             #print("False, game state")
             return False
 
-        if self._active_player != self.get_square_occupant(moved_from):
-            #print("False, active player")
-            return False
-
         #checks for valid input
         valid_input = self.check_valid_input(moved_from, moved_to)
         if valid_input is False:
             return False
+
+        return self.make_move_idx(SQUARE_INDEX[moved_from], SQUARE_INDEX[moved_to])
+
+    def make_move_idx(self, from_square, to_square):
+        """
+        This is the same as make_move, but takes square numbers 0 --> 80 (square = row * 9 + column) instead of
+        algebraic notation, so no notation is parsed. For example make_move_idx(11, 17) is make_move('b3', 'b9').
+        Returns False if the move can't be made, otherwise makes it and returns True.
+        :param from_square: square number of the piece to move
+        :param to_square: square number to move the piece to
+        :return:
+        """
+
+        if self._game_state != "UNFINISHED":
+            return False
+
+        if not 0 <= from_square < 81 or not 0 <= to_square < 81:
+            return False
+
+        moved_from_tuple = SQUARE_TUPLES[from_square]
+        moved_to_tuple = SQUARE_TUPLES[to_square]
+        piece = BLACK_PIECE if self._active_player == "BLACK" else RED_PIECE
+
+        if self._board[from_square] != piece:
+            #print("False, active player")
+            return False
+
         #checks for valid move
-        valid_move = self.check_valid_move(moved_from, moved_to)
-        if valid_move is False:
+        valid_move = self.check_valid_move_at(moved_from_tuple, moved_to_tuple)
+        if valid_move is False or valid_move[0] is False:
             return False
-        
-        self.update_game_board(moved_from, moved_to)
-        self.check_for_captures(moved_to)
-        self.corner_capture_check(moved_to)
+
+        previous_game_state = self._game_state
+        self._move_captures = []            # remove_piece records the captured squares of this move here
+        self.update_game_board_at(moved_from_tuple, moved_to_tuple)
+        self.check_for_captures_at(moved_to_tuple)
+        self.corner_capture_check_at(moved_to_tuple)
         self.update_game_state()
         self.player_turn()
+        move_captures = self._move_captures
+        if move_captures:
+            self._undo_stack.extend(move_captures)          # the captured squares, then the packed move record
+        self._undo_stack.append(from_square | to_square << 7 | GAME_STATE_CODES[previous_game_state] << 14 |
+                                len(move_captures) << 16)
+        self._hash_history.append(self._zobrist_hash)
+        if self._hash_counts is not None:
+            self._hash_counts[self._zobrist_hash] = self._hash_counts.get(self._zobrist_hash, 0) + 1
+        return True
 
-    def check_valid_input(self, moved_from, moved_to):
+    def enable_profiling(self, profiler=None):
         """
-        This function checks to make sure that the inputs from moved_from and moved_to are valid moves for the game board
+        This turns on per-phase timing of make_move and make_move_idx and returns the MoveProfiler the timings go to
+        (a new one unless one is passed in, so several games can share one). It works by switching this game to the
+        profiled_class of its class, whose make_move and make_move_idx are timed copies, so games that aren't
+        profiled run the normal code untouched.
+        :param profiler:
+        :return:
+        """
+
+        if profiler is None:
+            from MoveProfiler import MoveProfiler
+            profiler = MoveProfiler()
+        self._profiler = profiler
+        if self.get_unprofiled_class() is type(self):
+            self.__class__ = profiled_class(type(self))
+        return profiler
+
+    def disable_profiling(self):
+        """
+        This turns per-phase timing off again and returns the profiler that was in use, or None
+        :return:
+        """
+
+        profiler = self._profiler
+        self._profiler = None
+        self.__class__ = self.get_unprofiled_class()
+        return profiler
+
+    def get_unprofiled_class(self):
+        """
+        This returns the class of this game without profiling, whether profiling is on or not
+        :return:
+        """
+
+        return getattr(type(self), "_unprofiled_class", type(self))
+
+    def get_profiler(self):
+        """
+        This returns the MoveProfiler in use, or None when profiling is off
+        :return:
+        """
+
+        return self._profiler
+
+    def profiled_make_move(self, moved_from, moved_to):
+        """
+        This is make_move with the input validation timed, used in place of make_move while profiling is on. A move
+        on a finished game passes input validation and is turned down under check_valid_move, the same as in
+        profiled_make_move_idx.
+        :param moved_from:
+        :param moved_to:
+        :return:
         """
 
-        #check valid input lengths
-        if len(moved_from) != 2:
-            return False             
-        if len(moved_to) != 2:
+        profiler = self._profiler
+        clock = profiler.get_clock()
+        start = clock()
+        valid_input = self.check_valid_input(moved_from, moved_to) is not False
+        profiler.record("input_validation", clock() - start)
+        if not valid_input:
+            profiler.record_rejected("input_validation")
             return False
-        
 
-        valid_letters = "abcdefghi"
-        valid_numbers = "123456789"
-
-        from_row = moved_from[0]
-        from_col = moved_from[1]
-        to_row = moved_to[0]
-        to_col = moved_to[1]
-
-        #checking for valid letter/row from moved_from (selected_piece)
-        #initialize loop
-        test_answer = False
-        for letter in valid_letters:
-            if letter == from_row:
-                test_answer = True
-        #updating after loop
-        if test_answer == False:
+        return self.profiled_make_move_idx(SQUARE_INDEX[moved_from], SQUARE_INDEX[moved_to])
+
+    def profiled_make_move_idx(self, from_square, to_square):
+        """
+        This is make_move_idx with each phase timed (see MoveProfiler.PHASES), used in place of make_move_idx while
+        profiling is on. It makes exactly the same moves.
+        :param from_square:
+        :param to_square:
+        :return:
+        """
+
+        profiler = self._profiler
+        record = profiler.record
+        clock = profiler.get_clock()
+        start = phase_start = clock()
+
+        if self._game_state != "UNFINISHED" or not 0 <= from_square < 81 or not 0 <= to_square < 81:
+            profiler.record_rejected("check_valid_move")
             return False
-        
-        #checking for valid number/column from moved_from (selected_piece)
-        test_answer = False
-        for num in valid_numbers:
-            if num == from_col:
-                test_answer = True
-        #updating after loop
-        if test_answer == False:
+
+        moved_from_tuple = SQUARE_TUPLES[from_square]
+        moved_to_tuple = SQUARE_TUPLES[to_square]
+        piece = BLACK_PIECE if self._active_player == "BLACK" else RED_PIECE
+        valid_move = (self._board[from_square] == piece and
+                      self.check_valid_move_at(moved_from_tuple, moved_to_tuple))
+        now = clock()
+        record("check_valid_move", now - phase_start)
+        if valid_move is False or valid_move[0] is False:
+            profiler.record_rejected("check_valid_move")
             return False
-        
-        #checking for valid letter/row from moved_to (move_to)
-        #initialize loop
-        test_answer = False
-        for letter in valid_letters:
-            if letter == to_row:
-                test_answer = True
-        #updating after loop
-        if test_answer == False:
-            return False       
-
-        #checking for valid number/column from moved_to (move_to)
-        test_answer = False
-        for num in valid_numbers:
-            if num == to_col:
-                test_answer = True
-        #updating after loop
-        if test_answer == False:
+
+        previous_game_state = self._game_state
+        self._move_captures = []
+        phase_start = now
+        self.update_game_board_at(moved_from_tuple, moved_to_tuple)
+        now = clock()
+        record("update_game_board", now - phase_start)
+        phase_start = now
+        self.check_for_captures_at(moved_to_tuple)
+        now = clock()
+        record("check_for_captures", now - phase_start)
+        phase_start = now
+        self.corner_capture_check_at(moved_to_tuple)
+        now = clock()
+        record("corner_capture_check", now - phase_start)
+        phase_start = now
+        self.update_game_state()
+        now = clock()
+        record("update_game_state", now - phase_start)
+        phase_start = now
+        self.player_turn()
+        move_captures = self._move_captures
+        if move_captures:
+            self._undo_stack.extend(move_captures)          # the captured squares, then the packed move record
+        self._undo_stack.append(from_square | to_square << 7 | GAME_STATE_CODES[previous_game_state] << 14 |
+                                len(move_captures) << 16)
+        self._hash_history.append(self._zobrist_hash)
+        if self._hash_counts is not None:
+            self._hash_counts[self._zobrist_hash] = self._hash_counts.get(self._zobrist_hash, 0) + 1
+        now = clock()
+        record("record_move", now - phase_start)
+        record("total", now - start)
+        return True
+
+    def unmake_move(self):
+        """
+        This takes back the last move made by make_move or make_move_idx, using the undo record saved for it: the
+        squares moved from and to, the squares of any captured pieces and the game state before the move. The piece
+        is moved back, captured pieces are put back and the captured counts, game state and active player are
+        restored. Returns False if there is no move to take back, otherwise True.
+        :return:
+        """
+
+        undo_stack = self._undo_stack
+        if not undo_stack:
             return False
-        
-        #if no test returns False, then return True
+
+        move_record = undo_stack.pop()
+        from_square = move_record & 0x7F
+        to_square = move_record >> 7 & 0x7F
+        previous_game_state = GAME_STATES[move_record >> 14 & 0x3]
+        captured_count = move_record >> 16
+        captured_squares = ()
+        if captured_count:
+            captured_squares = undo_stack[-captured_count:]
+            del undo_stack[-captured_count:]
+        self.player_turn()
+        moved_from_tuple = SQUARE_TUPLES[from_square]
+        moved_to_tuple = SQUARE_TUPLES[to_square]
+        self.update_game_board_at(moved_to_tuple, moved_from_tuple)
+
+        if self._active_player == "BLACK":
+            captured_piece = RED_PIECE
+            self._red_captured -= len(captured_squares)
+        else:
+            captured_piece = BLACK_PIECE
+            self._black_captured -= len(captured_squares)
+        for square in captured_squares:
+            captured_tuple = SQUARE_TUPLES[square]
+            self._board[square] = captured_piece
+            self._zobrist_hash ^= PIECE_ZOBRIST_KEYS[captured_piece][square]
+            self.update_line_codes(captured_tuple[0], captured_tuple[1], captured_piece)
+            self._piece_squares[captured_piece].append(square)
+            self._row_counts[captured_tuple[0]] += 1
+            self._column_counts[captured_tuple[1]] += 1
+
+        self._game_state = previous_game_state
+        self.forget_position(self._hash_history.pop())
+        return True
+
+    def generate_legal_moves(self):
+        """
+        This returns a list of every legal move for the active player, as (moved_from, moved_to) pairs of square
+        numbers 0 --> 80 (square = row * 9 + column). Only the squares in piece_squares are looked at, and each piece
+        walks its precomputed rook rays until it is blocked.
+        If the game is over there are no legal moves.
+        :return:
+        """
+
+        if self._game_state != "UNFINISHED":
+            return []
+
+        piece = BLACK_PIECE if self._active_player == "BLACK" else RED_PIECE
+        board = self._board
+        legal_moves = []
+
+        for moved_from in sorted(self._piece_squares[piece]):
+            for ray in SQUARE_RAYS[moved_from]:
+                for square, ray_row, ray_column in ray:
+                    if board[square]:
+                        break
+                    legal_moves.append((moved_from, square))
+
+        return legal_moves
+
+    def count_legal_moves(self):
+        """
+        This returns the number of legal moves for the active player, without building the list of moves
+        :return:
+        """
+
+        if self._game_state != "UNFINISHED":
+            return 0
+
+        piece = BLACK_PIECE if self._active_player == "BLACK" else RED_PIECE
+        board = self._board
+        legal_move_count = 0
+
+        for moved_from in self._piece_squares[piece]:
+            for ray in SQUARE_RAYS[moved_from]:
+                for square, ray_row, ray_column in ray:
+                    if board[square]:
+                        break
+                    legal_move_count += 1
+
+        return legal_move_count
+
+    def count_move_captures(self, from_square, to_square):
+        """
+        This returns how many pieces the legal move from_square --> to_square would capture, sandwiches and corner
+        captures together, without making the move. Used to try capturing moves first when searching.
+        :param from_square:
+        :param to_square:
+        :return:
+        """
+
+        board = self._board
+        piece = board[from_square]
+        opponent = RED_PIECE if piece == BLACK_PIECE else BLACK_PIECE
+        captures = 0
+
+        for ray in SQUARE_RAYS[to_square]:
+            run = 0
+            for square, ray_row, ray_column in ray:
+                occupant = board[square]
+                if occupant == opponent:
+                    run += 1
+                    continue
+                if occupant == piece and square != from_square:
+                    captures += run
+                break
+
+        corner = CORNER_NEIGHBOURS.get(to_square)
+        if corner is not None:
+            if board[corner[0]] == opponent and board[corner[1]] == piece and corner[1] != from_square:
+                captures += 1
+
+        return captures
+
+    def check_valid_input(self, moved_from, moved_to):
+        """
+        This function checks to make sure that the inputs from moved_from and moved_to are valid moves for the game board
+        """
+
+        # both squares must be in the precomputed notation table, 'a1' --> 'i9'
+        if moved_from not in SQUARE_INDEX:
+            return False
+        if moved_to not in SQUARE_INDEX:
+            return False
+
         return True
- 
+
     def check_valid_move(self, moved_from, moved_to):
         """
         This is a helper function to the 'make_move' function, it checks to see if the proposed move is a valid one by
@@ -214,9 +939,20 @@ class HasamiShogiGame:
 
         if moved_from == moved_to:
             return False
-        
-        moved_from_tuple = self.convert_board_notation(moved_from)
-        moved_to_tuple = self.convert_board_notation(moved_to)
+
+        return self.check_valid_move_at(self.convert_board_notation(moved_from), self.convert_board_notation(moved_to))
+
+    def check_valid_move_at(self, moved_from_tuple, moved_to_tuple):
+        """
+        This is check_valid_move for (row, column) tuples, used by make_move_idx so no notation is parsed
+        :param moved_from_tuple:
+        :param moved_to_tuple:
+        :return:
+        """
+
+        if moved_from_tuple == moved_to_tuple:
+            return False
+
         valid_move = [True]
 
         # checks for non-horizontal or vertical moves
@@ -231,31 +967,32 @@ class HasamiShogiGame:
 
         # checks to see if it's a horizontal move, using rows
         if moved_from_tuple[0] == moved_to_tuple[0]:    
-            row = self._game_board[moved_from_tuple[0]]
+            board = self._board
+            row_start = moved_from_tuple[0] * 9
             if moved_from_tuple[1] > moved_to_tuple[1]:
-                row = row[moved_to_tuple[1]:moved_from_tuple[1]]
+                row_range = range(row_start + moved_to_tuple[1], row_start + moved_from_tuple[1])
             else:
-                row = row[moved_from_tuple[1] + 1:moved_to_tuple[1] + 1]
+                row_range = range(row_start + moved_from_tuple[1] + 1, row_start + moved_to_tuple[1] + 1)
 
-            for board_space in row:
-                if board_space == ".":
+            for board_square in row_range:
+                if board[board_square] == EMPTY_SQUARE:
                     pass
                 else:
                     valid_move[0] = False
                     valid_move.append("occupied space, row")
                     return valid_move
-                return valid_move
+            return valid_move
 
         # for a vertical  move
         if moved_from_tuple[1] == moved_to_tuple[1]:    
-            game_board_columns = self.game_board_columns()
-            column = game_board_columns[moved_from_tuple[1]]
+            board = self._board
+            column = moved_from_tuple[1]
             if moved_from_tuple[0] > moved_to_tuple[0]:
-                column = column[moved_to_tuple[0]:moved_from_tuple[0]]
+                column_range = range(moved_to_tuple[0] * 9 + column, moved_from_tuple[0] * 9 + column, 9)
             else:
-                column = column[moved_from_tuple[0] + 1:moved_to_tuple[0] + 1]
-            for board_space in column:
-                if board_space == ".":
+                column_range = range(moved_from_tuple[0] * 9 + column + 9, moved_to_tuple[0] * 9 + column + 9, 9)
+            for board_square in column_range:      # steps down the column 9 squares at a time
+                if board[board_square] == EMPTY_SQUARE:
                     pass
                 else:
                     valid_move[0] = False
@@ -271,216 +1008,77 @@ class HasamiShogiGame:
         :return:
         """
 
-        moved_to_tuple = self.convert_board_notation(moved_to)
-        square = self.get_square_occupant(moved_to)
+        self.check_for_captures_at(self.convert_board_notation(moved_to))
 
-    #BLACK Captures
-        if square == "RED":               # checking to the left for captures
-            captured_squares = 0
-            for space in range(1, 9):
-                if moved_to_tuple[1] - space < 0:
-                    break
-                if self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - space] == "B":
-                    captured_squares += 1
-                elif self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - space] == "R":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - 1] = "."
-                        self._black_captured += 1
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - captured] = "."
-                        self._black_captured += 1
-                    break
-                else:
-                    break
-
-        if square == "RED":                      # checking to the right for captures
-            captured_squares = 0
-            for space in range(1, 9):
-                if moved_to_tuple[1] == 8:
-                    break
-                if moved_to_tuple[1] + space == 9:
-                    break
-                if self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + space] == "B":
-                    captured_squares += 1
-                elif self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + space] == "R":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + 1] = "."
-                        self._black_captured += 1
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + captured] = "."
-                        self._black_captured += 1
-                    break
-                else:
-                    break
-
-        if square == "RED":               # checking above for captures
-            captured_squares = 0
-            game_board_columns = self.game_board_columns()       # converts the board into columns with helper function
-            for space in range(1, 9):
-                if moved_to_tuple[0] == 0:
-                    break
-                if space != 1:
-                    if moved_to_tuple[1] - space < 0:
-                        break
-                if moved_to_tuple[0] <= 1:
-                    break
-                if game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - space] == "B":
-                    captured_squares += 1
-                elif game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - space] == "R":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - 1] = "."
-                        self._black_captured += 1
-                        game_board = self.game_board_rows(game_board_columns)
-                        self._game_board = game_board
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - captured] = "."
-                        self._black_captured += 1
-                    game_board = self.game_board_rows(game_board_columns)
-                    self._game_board = game_board
-                    break
-                else:
-                    break
-
-        if square == "RED":               # checking below for captures
-            captured_squares = 0
-            game_board_columns = self.game_board_columns()       # converts the board into columns with helper function
-            for space in range(0, 9):
-                if moved_to_tuple[0] >= 7:
-                    break
-                if moved_to_tuple[0] + space == 9:
-                    break
-                if game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + space] == "B":
-                    captured_squares += 1
-                elif game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + space] == "R":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + 1] = "."
-                        self._black_captured += 1
-                        game_board = self.game_board_rows(game_board_columns)
-                        self._game_board = game_board
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + captured] = "."
-                        self._black_captured += 1
-                    game_board = self.game_board_rows(game_board_columns)
-                    self._game_board = game_board
-                    break
-                else:
-                    break
-
-    #RED Captures
-        if square == "BLACK":  # checking to the left for captures
-            captured_squares = 0
-            for space in range(1, 9):
-                if moved_to_tuple[1] - space < 0:
-                    break
-                if self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - space] == "R":
-                    captured_squares += 1
-                elif self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - space] == "B":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - 1] = "."
-                        self._red_captured += 1
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] - captured] = "."
-                        self._red_captured += 1
-                    break
-                else:
-                    break
-
-        if square == "BLACK":  # checking to the right for captures
-            captured_squares = 0
-            for space in range(1, 9):
-                if moved_to_tuple[1] == 8:
-                    break
-                if moved_to_tuple[1] + space == 9:
-                    break
-                if self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + space] == "R":
-                    captured_squares += 1
-                elif self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + space] == "B":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + 1] = "."
-                        self._red_captured += 1
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        self._game_board[moved_to_tuple[0]][moved_to_tuple[1] + captured] = "."
-                        self._red_captured += 1
-                    break
-                else:
-                    break
-
-        if square == "BLACK":  # checking above for captures
-            captured_squares = 0
-            game_board_columns = self.game_board_columns()  # converts the board into columns with helper function
-            for space in range(1, 9):
-                if moved_to_tuple[0] == 0:
-                    break
-                if space != 1:
-                    if moved_to_tuple[1] - space < 0:
-                        break
-                if moved_to_tuple[0] <= 1:
-                    break
-                if game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - space] == "R":
-                    captured_squares += 1
-                elif game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - space] == "B":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - 1] = "."
-                        self._red_captured += 1
-                        game_board = self.game_board_rows(game_board_columns)
-                        self._game_board = game_board
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] - captured] = "."
-                        self._red_captured += 1
-                    game_board = self.game_board_rows(game_board_columns)
-                    self._game_board = game_board
-                    break
-                else:
-                    break
-
-        if square == "BLACK":  # checking below for captures
-            captured_squares = 0
-            game_board_columns = self.game_board_columns()  # converts the board into columns with helper function
-            for space in range(1, 8):
-                if moved_to_tuple[0] >= 7:
-                    break
-                if moved_to_tuple[0] + space == 9:
-                    break
-                if game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + space] == "R":
-                    captured_squares += 1
-                elif game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + space] == "B":
-                    if captured_squares == 0:
-                        break
-                    if captured_squares == 1:
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + 1] = "."
-                        self._red_captured += 1
-                        game_board = self.game_board_rows(game_board_columns)
-                        self._game_board = game_board
-                        break
-                    for captured in range(1, captured_squares + 1):
-                        game_board_columns[moved_to_tuple[1]][moved_to_tuple[0] + captured] = "."
-                        self._red_captured += 1
-                    game_board = self.game_board_rows(game_board_columns)
-                    self._game_board = game_board
-                    break
-                else:
-                    break
+    def check_for_captures_at(self, moved_to_tuple):
+        """
+        This is check_for_captures for a (row, column) tuple, used by make_move_idx so no notation is parsed. The
+        half line keys on each side of the square come straight out of the row and column codes, so the number of
+        pieces captured in each direction is one CAPTURE_RUNS lookup, however many pieces are on the line.
+        :param moved_to_tuple:
+        :return:
+        """
+
+        row, column = moved_to_tuple
+        square = self._board[row * 9 + column]
+        if square == EMPTY_SQUARE:
+            return
+
+        capture_runs = PIECE_CAPTURE_RUNS[square]
+        row_code = self._row_codes[row]
+        column_code = self._column_codes[column]
+        left = capture_runs[REVERSED_LINE_CODES[row_code] // POWERS_OF_3[9 - column]]          # checking to the left
+        right = capture_runs[row_code // POWERS_OF_3[column + 1]]                              # checking to the right
+        above = capture_runs[REVERSED_LINE_CODES[column_code] // POWERS_OF_3[9 - row]]         # checking above
+        below = capture_runs[column_code // POWERS_OF_3[row + 1]]                              # checking below
+
+        for captured in range(1, left + 1):
+            self.remove_piece(row, column - captured)
+        for captured in range(1, right + 1):
+            self.remove_piece(row, column + captured)
+        for captured in range(1, above + 1):
+            self.remove_piece(row - captured, column)
+        for captured in range(1, below + 1):
+            self.remove_piece(row + captured, column)
+
+    def remove_piece(self, row, column):
+        """
+        This is a helper function to check_for_captures and corner_capture_check, it removes a captured piece from the
+        game board, piece squares and occupancy counts, adds it to the captured count of its color and records the
+        square so the move can be undone
+        :param row:
+        :param column:
+        :return:
+        """
+
+        square = row * 9 + column
+        piece = self._board[square]
+        if piece == RED_PIECE:
+            self._red_captured += 1
+        else:
+            self._black_captured += 1
+        self._board[square] = EMPTY_SQUARE
+        self._move_captures.append(square)
+        self._zobrist_hash ^= PIECE_ZOBRIST_KEYS[piece][square]
+        self.update_line_codes(row, column, -piece)
+        self._piece_squares[piece].remove(square)
+        self._row_counts[row] -= 1
+        self._column_counts[column] -= 1
+
+    def update_line_codes(self, row, column, digit_change):
+        """
+        This is a helper function that adds digit_change to the base 3 digit of (row, column) in the line codes of
+        its row and column, after the piece on that square has changed
+        :param row:
+        :param column:
+        :param digit_change: new digit minus old digit
+        :return:
+        """
+
+        row_codes = self._row_codes
+        column_codes = self._column_codes
+        row_codes[row] = LINE_CODES[row_codes[row] + digit_change * POWERS_OF_3[column]]
+        column_codes[column] = LINE_CODES[column_codes[column] + digit_change * POWERS_OF_3[row]]
 
     def player_turn(self):
         """
@@ -489,6 +1087,7 @@ class HasamiShogiGame:
         """
 
         whose_turn = self._active_player
+        self._zobrist_hash ^= ZOBRIST_RED_TO_MOVE
 
         if whose_turn == "RED":
             self._active_player = "BLACK"
@@ -505,113 +1104,74 @@ class HasamiShogiGame:
         :return:
         """
 
-        moved_from_tuple = self.convert_board_notation(moved_from)
-        moved_to_tuple = self.convert_board_notation(moved_to)
-        game_board = self._game_board
-        game_board[moved_to_tuple[0]][moved_to_tuple[1]] = game_board[moved_from_tuple[0]][moved_from_tuple[1]]
-        game_board[moved_from_tuple[0]][moved_from_tuple[1]] = "."
+        self.update_game_board_at(self.convert_board_notation(moved_from), self.convert_board_notation(moved_to))
+
+    def update_game_board_at(self, moved_from_tuple, moved_to_tuple):
+        """
+        This is update_game_board for (row, column) tuples, used by make_move_idx so no notation is parsed
+        :param moved_from_tuple:
+        :param moved_to_tuple:
+        :return:
+        """
 
-        self._game_board = game_board
+        if self._board is INITIAL_BOARD:       # first move since the start, stop sharing the starting position
+            self.copy_initial_position()
+        board = self._board
+        from_square = moved_from_tuple[0] * 9 + moved_from_tuple[1]
+        to_square = moved_to_tuple[0] * 9 + moved_to_tuple[1]
+        piece = board[from_square]
+        board[to_square] = piece
+        board[from_square] = EMPTY_SQUARE
+        piece_keys = PIECE_ZOBRIST_KEYS[piece]
+        self._zobrist_hash ^= piece_keys[from_square] ^ piece_keys[to_square]
+        self.update_line_codes(moved_from_tuple[0], moved_from_tuple[1], -piece)
+        self.update_line_codes(moved_to_tuple[0], moved_to_tuple[1], piece)
+        piece_squares = self._piece_squares[piece]
+        piece_squares[piece_squares.index(from_square)] = to_square
+        if moved_from_tuple[0] != moved_to_tuple[0]:
+            self._row_counts[moved_from_tuple[0]] -= 1
+            self._row_counts[moved_to_tuple[0]] += 1
+        else:
+            self._column_counts[moved_from_tuple[1]] -= 1
+            self._column_counts[moved_to_tuple[1]] += 1
 
     def corner_capture_check(self, moved_to):
         """
-        This is a helper function to the 'remove_piece' function, to check for the special situation for corner captures
+        This is a helper function to the 'make_move' function, to check for the special situation for corner captures
         :param moved_to:
         :return:
         """
-        moved_to_tuple = self.convert_board_notation(moved_to)
-        square = self.get_square_occupant(moved_to)
-
-        if square == "RED":
-            if moved_to_tuple == (1, 0):           # checking upper left corner
-                if self._game_board[0][0] == "B":
-                    if self._game_board[0][1] == "R":
-                        self._game_board[0][0] = "."
-                        self._black_captured += 1
-            if moved_to_tuple == (0, 1):           # checking upper left corner
-                if self._game_board[0][0] == "B":
-                    if self._game_board[1][0] == "R":
-                        self._game_board[0][0] = "."
-                        self._black_captured += 1
-            if moved_to_tuple == (0, 7):           # checking upper right corner
-                if self._game_board[0][8] == "B":
-                    if self._game_board[1][8] == "R":
-                        self._game_board[0][8] = "."
-                        self._black_captured += 1
-            if moved_to_tuple == (1, 8):           # checking upper right corner
-                if self._game_board[0][8] == "B":
-                    if self._game_board[0][7] == "R":
-                        self._game_board[0][8] = "."
-                        self._black_captured += 1
-            if moved_to_tuple == (7, 8):           # checking lower right corner
-                if self._game_board[8][8] == "B":
-                    if self._game_board[8][7] == "R":
-                        self._game_board[8][8] = "."
-                        self._black_captured += 1
-            if moved_to_tuple == (8, 7):           # checking lower right corner
-                if self._game_board[8][8] == "B":
-                    if self._game_board[7][8] == "R":
-                        self._game_board[8][8] = "."
-                        self._black_captured += 1
-            if moved_to_tuple == (8, 1):           # checking lower left corner
-                if self._game_board[8][0] == "B":
-                    if self._game_board[7][0] == "R":
-                        self._game_board[8][0] = "."
-                        self._black_captured += 1
-            if moved_to_tuple == (7, 0):           # checking lower left corner
-                if self._game_board[8][0] == "B":
-                    if self._game_board[8][1] == "R":
-                        self._game_board[8][0] = "."
-                        self._black_captured += 1
-
-        if square == "BLACK":
-            if moved_to_tuple == (1, 0):           # checking upper left corner
-                if self._game_board[0][0] == "R":
-                    if self._game_board[0][1] == "B":
-                        self._game_board[0][0] = "."
-                        self._red_captured += 1
-            if moved_to_tuple == (0, 1):           # checking upper left corner
-                if self._game_board[0][0] == "R":
-                    if self._game_board[1][0] == "B":
-                        self._game_board[0][0] = "."
-                        self._red_captured += 1
-            if moved_to_tuple == (0, 7):           # checking upper right corner
-                if self._game_board[0][8] == "R":
-                    if self._game_board[1][8] == "B":
-                        self._game_board[0][8] = "."
-                        self._red_captured += 1
-            if moved_to_tuple == (1, 8):           # checking upper right corner
-                if self._game_board[0][8] == "R":
-                    if self._game_board[0][7] == "B":
-                        self._game_board[0][8] = "."
-                        self._red_captured += 1
-            if moved_to_tuple == (7, 8):           # checking lower right corner
-                if self._game_board[8][8] == "R":
-                    if self._game_board[8][7] == "B":
-                        self._game_board[8][8] = "."
-                        self._red_captured += 1
-            if moved_to_tuple == (8, 7):           # checking lower right corner
-                if self._game_board[8][8] == "R":
-                    if self._game_board[7][8] == "B":
-                        self._game_board[8][8] = "."
-                        self._red_captured += 1
-            if moved_to_tuple == (8, 1):           # checking lower left corner
-                if self._game_board[8][0] == "R":
-                    if self._game_board[7][0] == "B":
-                        self._game_board[8][0] = "."
-                        self._red_captured += 1
-            if moved_to_tuple == (7, 0):           # checking lower left corner
-                if self._game_board[8][0] == "R":
-                    if self._game_board[8][1] == "B":
-                        self._game_board[8][0] = "."
-                        self._red_captured += 1
+
+        self.corner_capture_check_at(self.convert_board_notation(moved_to))
+
+    def corner_capture_check_at(self, moved_to_tuple):
+        """
+        This is corner_capture_check for a (row, column) tuple, used by make_move_idx so no notation is parsed. The
+        CORNER_NEIGHBOURS table gives the corner next to the square moved to, and the other square next to that
+        corner, which must hold a piece of the same color for the capture.
+        :param moved_to_tuple:
+        :return:
+        """
+
+        corner = CORNER_NEIGHBOURS.get(moved_to_tuple[0] * 9 + moved_to_tuple[1])
+        if corner is None:
+            return
+
+        board = self._board
+        square = board[moved_to_tuple[0] * 9 + moved_to_tuple[1]]
+        if square == EMPTY_SQUARE:
+            return
+
+        corner_piece = board[corner[0]]
+        if corner_piece != EMPTY_SQUARE and corner_piece != square and board[corner[1]] == square:
+            self.remove_piece(*SQUARE_TUPLES[corner[0]])
 
     def game_board_columns(self):
         """
         This re-formats the game board into lists of columns instead of rows, for valid moves and piece capture checks,
         for vertical moves. Just like 'game_board' this is a list of lists, where each list is a column. The list of
-        lists is labeled 'game_board_columns' This is a helper function for make_move, check_valid_move and
-        remove_pieces
+        lists is labeled 'game_board_columns'. Move checks and captures no longer use it, they step through the
+        '_board' bytes in place, so no copies of the board are made on a move
         :return:
         """
 
@@ -621,7 +1181,7 @@ class HasamiShogiGame:
         for board_column in board_range:
             column = []
             for column_space in board_range:
-                board_space = self._game_board[column_space][board_column]
+                board_space = PIECE_CHARACTERS[self._board[column_space * 9 + board_column]]
                 column.append(board_space)
             game_board_columns.append(column)
 
@@ -629,9 +1189,8 @@ class HasamiShogiGame:
 
     def game_board_rows(self, game_board_columns):
         """
-        This is a helper function for check_for_capture function. This takes the game board that has been turned into
-        columns from the game_board_columns function, and turns it back into rows, how it is original set up in the
-        class
+        This takes the game board that has been turned into columns from the game_board_columns function, and turns
+        it back into rows, how it is original set up in the class
         :return:
         """
 
@@ -652,7 +1211,8 @@ class HasamiShogiGame:
         This is mainly for testing purposes, returns and prints the current board
         :return:
         """
-        board = self._game_board
+        board_text = self.get_board()
+        board = [board_text[row * 9:row * 9 + 9] for row in range(9)]
         separator = " "
 
         print("  1 2 3 4 5 6 7 8 9 ")
@@ -689,6 +1249,9 @@ class HasamiShogiGame:
             print("#### INVALID MOVE! TRY AGAIN ####\n")
 
 
+ProfiledHasamiShogiGame = profiled_class(HasamiShogiGame)
+
+
 if __name__ == "__main__":
     print(
         """
@@ -0,0 +1,455 @@
+# Description: A Monte Carlo tree search (UCT) player for the Hasami Shogi Game. The tree is walked with make_move_idx
+#              and unmake_move on the game itself, and each new leaf is scored by a batch of playouts. Playouts don't
+#              use the game class at all: they run on a bytearray board and two piece lists that are copied into
+#              buffers kept for the whole search, and moves, captures and the game end are worked out inline from
+#              precomputed ray tables, with no notation, no move lists, no undo records and no hashing. A random
+#              game rarely ends within a few hundred moves, so a playout that runs out of moves is scored by the
+#              captured pieces. The tree below the move played is kept for the next move.
+#              Run 'python MonteCarloPlayer.py --playouts 5000' to print the playouts per second.
+
+import argparse
+import math
+import random
+import time
+
+from HasamiShogiGame import HasamiShogiGame, SQUARE_RAYS, SQUARE_NAMES, CORNER_NEIGHBOURS, TEXT_TO_BOARD, \
+    BLACK_PIECE, RED_PIECE
+
+POLICIES = ("random", "capture")
+RAY_SQUARES = tuple(tuple(tuple(square for square, ray_row, ray_column in ray) for ray in rays)
+                    for rays in SQUARE_RAYS)                                # square --> four rays of square numbers
+CORNER_CAPTURES = tuple(CORNER_NEIGHBOURS.get(square) for square in range(81))
+PIECES_TO_WIN = 8                   # captures that end the game, see HasamiShogiGame.update_game_state
+
+
+def count_captures(board, from_square, to_square, piece):
+    """
+    This returns how many pieces 'piece' moving from_square --> to_square would capture on the playout board
+    :param board:
+    :param from_square:
+    :param to_square:
+    :param piece:
+    :return:
+    """
+
+    opponent = 3 - piece
+    captures = 0
+    for ray in RAY_SQUARES[to_square]:
+        run = 0
+        for square in ray:
+            occupant = board[square]
+            if occupant == opponent:
+                run += 1
+                continue
+            if run and occupant == piece and square != from_square:
+                captures += run
+            break
+    corner = CORNER_CAPTURES[to_square]
+    if corner is not None and board[corner[0]] == opponent and board[corner[1]] == piece and corner[1] != from_square:
+        captures += 1
+    return captures
+
+
+def run_playout(board, pieces, positions, captured, piece, max_plies, random_float, capture_tries=0):
+    """
+    This plays random moves on the playout board until a player has captured PIECES_TO_WIN pieces, the player to
+    move has no move, or max_plies moves have been made, and returns the winner: BLACK_PIECE, RED_PIECE, or 0 for a
+    draw. Without a winner the player who has captured more pieces is given the win. Everything passed in is
+    changed in place.
+    A random move is a random piece sliding a random distance along a random open ray, which takes a few random
+    numbers instead of a list of every legal move. With capture_tries above 0 up to that many random moves are tried
+    and the first one that captures is played, otherwise the last one tried.
+    :param board: bytearray of 81 board bytes
+    :param pieces: [None, list of black squares, list of red squares]
+    :param positions: list of 81, the index of each piece's square in its list in 'pieces'
+    :param captured: [None, black pieces captured, red pieces captured]
+    :param piece: the player to move, BLACK_PIECE or RED_PIECE
+    :param max_plies:
+    :param random_float: a random() function returning floats in [0, 1)
+    :param capture_tries:
+    :return:
+    """
+
+    ray_squares = RAY_SQUARES
+    corner_captures = CORNER_CAPTURES
+
+    for ply in range(max_plies):
+        opponent = 3 - piece
+        own_pieces = pieces[piece]
+        opponent_pieces = pieces[opponent]
+
+        tries = capture_tries or 1
+        from_square = to_square = -1
+        while tries:
+            tries -= 1
+            piece_count = len(own_pieces)
+            first_piece = int(random_float() * piece_count)
+            first_ray = int(random_float() * 4)
+            for piece_offset in range(piece_count):
+                square = own_pieces[(first_piece + piece_offset) % piece_count]
+                rays = ray_squares[square]
+                for ray_offset in range(4):
+                    ray = rays[(first_ray + ray_offset) & 3]
+                    open_squares = 0
+                    for ray_square in ray:
+                        if board[ray_square]:
+                            break
+                        open_squares += 1
+                    if open_squares:
+                        from_square = square
+                        to_square = ray[int(random_float() * open_squares)]
+                        break
+                if to_square >= 0:
+                    break
+            if to_square < 0:           # no piece can move
+                tries = 0
+            elif tries and count_captures(board, from_square, to_square, piece):
+                tries = 0
+            elif tries:
+                to_square = -1
+        if to_square < 0:
+            break
+
+        board[from_square] = 0
+        board[to_square] = piece
+        index = positions[from_square]
+        own_pieces[index] = to_square
+        positions[to_square] = index
+
+        for ray in ray_squares[to_square]:
+            run = 0
+            for ray_square in ray:
+                occupant = board[ray_square]
+                if occupant == opponent:
+                    run += 1
+                    continue
+                if run and occupant == piece:
+                    for captured_square in ray[:run]:
+                        board[captured_square] = 0
+                        last_square = opponent_pieces.pop()
+                        if last_square != captured_square:
+                            index = positions[captured_square]
+                            opponent_pieces[index] = last_square
+                            positions[last_square] = index
+                    captured[opponent] += run
+                break
+        corner = corner_captures[to_square]
+        if corner is not None and board[corner[0]] == opponent and board[corner[1]] == piece:
+            captured_square = corner[0]
+            board[captured_square] = 0
+            last_square = opponent_pieces.pop()
+            if last_square != captured_square:
+                index = positions[captured_square]
+                opponent_pieces[index] = last_square
+                positions[last_square] = index
+            captured[opponent] += 1
+
+        if captured[opponent] >= PIECES_TO_WIN:
+            return piece
+        piece = opponent
+
+    if captured[RED_PIECE] > captured[BLACK_PIECE]:
+        return BLACK_PIECE
+    if captured[BLACK_PIECE] > captured[RED_PIECE]:
+        return RED_PIECE
+    return 0
+
+
+class MonteCarloNode:
+    """
+    This class is one position in the search tree, reached by 'move' from its parent. 'wins' counts playout results
+    for the player who made 'move' (1 for a win, 0.5 for a draw).
+    """
+
+    __slots__ = ("move", "parent", "children", "untried_moves", "visits", "wins", "zobrist_hash", "terminal")
+
+    def __init__(self, move, parent, zobrist_hash):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried_moves = None           # filled in the first time the node is reached
+        self.visits = 0
+        self.wins = 0.0
+        self.zobrist_hash = zobrist_hash
+        self.terminal = None                # winner byte (0 for a draw) once known to be the end of the game
+
+
+class MonteCarloPlayer:
+    """
+    This class chooses moves for whichever player is active in a HasamiShogiGame (or BitboardHasamiShogiGame) by
+    UCT: walk down the tree by the upper confidence bound, add one new position, score it with a batch of playouts
+    and add the results back up the path. The game is searched in place and is left exactly as it was given.
+    """
+
+    def __init__(self, playouts=None, time_limit=1.0, batch_size=4, exploration=1.4, max_playout_plies=120,
+                 policy="random", capture_tries=4, reuse_tree=True, seed=None):
+        """
+        Give playouts, time_limit or both; the search stops at whichever runs out first.
+        :param playouts: number of playouts per move
+        :param time_limit: seconds allowed per move
+        :param batch_size: playouts run from each new leaf before walking the tree again
+        :param exploration: the UCT exploration constant
+        :param max_playout_plies: a playout stops after this many moves and is scored by the captured pieces
+        :param policy: 'random', or 'capture' to prefer capturing moves in playouts (see run_playout)
+        :param capture_tries: random moves tried per playout move by the 'capture' policy
+        :param reuse_tree: keep the part of the tree below the move played for the next move
+        :param seed: seed for the random numbers, for repeatable searches
+        """
+
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of " + ", ".join(POLICIES))
+        if playouts is None and time_limit is None:
+            raise ValueError("give a playout budget, a time limit or both")
+
+        self._playouts = playouts
+        self._time_limit = time_limit
+        self._batch_size = batch_size
+        self._exploration = exploration
+        self._max_playout_plies = max_playout_plies
+        self._capture_tries = capture_tries if policy == "capture" else 0
+        self._reuse_tree = reuse_tree
+        self._random = random.Random(seed)
+        self._root = None
+        self._board = bytearray(81)                 # playout buffers, reused by every playout
+        self._pieces = [None, [], []]
+        self._positions = [0] * 81
+        self._captured = [None, 0, 0]
+        self._search_info = {}
+
+    def get_search_info(self):
+        """
+        This returns a dictionary describing the last search: best move, playouts run, playouts carried over from
+        the previous move's tree, seconds taken, playouts per second, and the best move's share of wins
+        :return:
+        """
+
+        return dict(self._search_info)
+
+    def reset(self):
+        """
+        This forgets the kept tree, for example before starting a new game
+        :return:
+        """
+
+        self._root = None
+
+    def find_root(self, game):
+        """
+        This is a helper function for choose_move that returns the node of the kept tree for the position in 'game',
+        looking at the root and the two plies below it (the move played and the reply), or a new root node
+        :param game:
+        :return:
+        """
+
+        zobrist_hash = game.get_zobrist_hash()
+        root = self._root
+        if self._reuse_tree and root is not None:
+            candidates = [root]
+            for child in root.children:
+                candidates.append(child)
+                candidates.extend(child.children)
+            for node in candidates:
+                if node.zobrist_hash == zobrist_hash:
+                    node.parent = None
+                    node.move = None
+                    return node
+        return MonteCarloNode(None, None, zobrist_hash)
+
+    def choose_move(self, game, playouts=None, time_limit=None):
+        """
+        This searches the position in 'game' and returns the most visited (moved_from, moved_to) pair of square
+        numbers for the active player, or None if there are no legal moves
+        :param game:
+        :param playouts: playouts for this move, overrides the player's budget
+        :param time_limit: seconds for this move, overrides the player's time limit
+        :return:
+        """
+
+        if playouts is None:
+            playouts = self._playouts
+        if time_limit is None:
+            time_limit = self._time_limit
+
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit is not None else float("inf")
+        root = self.find_root(game)
+        reused_playouts = root.visits
+        self._root = root
+
+        root_moves = game.generate_legal_moves()
+        if len(root_moves) <= 1:
+            best_move = root_moves[0] if root_moves else None
+            self._search_info = {"best_move": best_move, "playouts": 0, "reused_playouts": reused_playouts,
+                                 "seconds": time.perf_counter() - start, "playouts_per_second": 0.0,
+                                 "win_rate": None}
+            return best_move
+
+        run_playouts = 0
+        while (playouts is None or run_playouts < playouts) and time.perf_counter() < deadline:
+            run_playouts += self.search_once(game, root)
+
+        best = max(root.children, key=lambda child: child.visits)
+        elapsed = time.perf_counter() - start
+        self._search_info = {"best_move": best.move, "playouts": run_playouts, "reused_playouts": reused_playouts,
+                             "seconds": elapsed, "playouts_per_second": run_playouts / elapsed if elapsed > 0 else 0.0,
+                             "win_rate": best.wins / best.visits}
+        return best.move
+
+    def search_once(self, game, root):
+        """
+        This is a helper function for choose_move that runs one walk down the tree from 'root': select, expand one
+        node, score it with a batch of playouts (or its known result if the game is over there) and add the results
+        to every node on the path. Returns the number of playouts run.
+        :param game:
+        :param root:
+        :return:
+        """
+
+        node = root
+        moves_made = 0
+        log = math.log
+        sqrt = math.sqrt
+        exploration = self._exploration
+
+        while True:
+            if node.untried_moves is None:
+                self.open_node(game, node)
+            if node.terminal is not None:
+                break
+            if node.untried_moves:
+                move = node.untried_moves.pop()
+                game.make_move_idx(move[0], move[1])
+                moves_made += 1
+                child = MonteCarloNode(move, node, game.get_zobrist_hash())
+                node.children.append(child)
+                node = child
+                self.open_node(game, node)
+                break
+            log_visits = log(node.visits)
+            best_child = None
+            best_bound = -1.0
+            for child in node.children:
+                bound = child.wins / child.visits + exploration * sqrt(log_visits / child.visits)
+                if bound > best_bound:
+                    best_bound = bound
+                    best_child = child
+            node = best_child
+            game.make_move_idx(node.move[0], node.move[1])
+            moves_made += 1
+
+        piece = BLACK_PIECE if game.get_active_player() == "BLACK" else RED_PIECE
+        if node.terminal is not None:
+            batch = 1
+            results = [0, 0, 0]
+            results[node.terminal] = 1
+        else:
+            batch = self._batch_size
+            results = self.run_playouts(game, piece, batch)
+
+        for undo in range(moves_made):
+            game.unmake_move()
+
+        mover = 3 - piece                  # the player who made the move into 'node'
+        while node is not None:
+            node.visits += batch
+            node.wins += results[mover] + 0.5 * results[0]
+            mover = 3 - mover
+            node = node.parent
+        return batch
+
+    def open_node(self, game, node):
+        """
+        This is a helper function for search_once that fills in the moves of a node reached for the first time, in
+        random order, and marks it terminal if the game is over there or the player to move has no moves
+        :param game: the game at the node's position
+        :param node:
+        :return:
+        """
+
+        node.untried_moves = game.generate_legal_moves()
+        self._random.shuffle(node.untried_moves)
+        game_state = game.get_game_state()
+        if game_state == "RED_WON":
+            node.terminal = RED_PIECE
+        elif game_state == "BLACK_WON":
+            node.terminal = BLACK_PIECE
+        elif not node.untried_moves:
+            node.terminal = 0
+
+    def run_playouts(self, game, piece, batch):
+        """
+        This runs 'batch' playouts from the position in 'game' with 'piece' to move and returns
+        [draws, black wins, red wins]. The position is copied into the playout buffers once and restored from that
+        copy before each playout.
+        :param game:
+        :param piece:
+        :param batch:
+        :return:
+        """
+
+        start_board = game.get_board().encode("ascii").translate(TEXT_TO_BOARD)
+        start_black = [square for square in range(81) if start_board[square] == BLACK_PIECE]
+        start_red = [square for square in range(81) if start_board[square] == RED_PIECE]
+        black_captured = game.get_num_captured_pieces("BLACK")
+        red_captured = game.get_num_captured_pieces("RED")
+
+        board = self._board
+        pieces = self._pieces
+        black_pieces = pieces[BLACK_PIECE]
+        red_pieces = pieces[RED_PIECE]
+        positions = self._positions
+        captured = self._captured
+        random_float = self._random.random
+        results = [0, 0, 0]
+
+        for playout in range(batch):
+            board[:] = start_board
+            black_pieces[:] = start_black
+            red_pieces[:] = start_red
+            for index, square in enumerate(start_black):
+                positions[square] = index
+            for index, square in enumerate(start_red):
+                positions[square] = index
+            captured[BLACK_PIECE] = black_captured
+            captured[RED_PIECE] = red_captured
+            results[run_playout(board, pieces, positions, captured, piece, self._max_playout_plies, random_float,
+                                self._capture_tries)] += 1
+        return results
+
+
+def playout_speed(playouts=10000, policy="random", max_playout_plies=120, seed=0):
+    """
+    This times playouts from the starting position on their own, without the tree, and returns playouts per second
+    :param playouts:
+    :param policy: 'random' or 'capture'
+    :param max_playout_plies:
+    :param seed:
+    :return:
+    """
+
+    player = MonteCarloPlayer(playouts=playouts, max_playout_plies=max_playout_plies, policy=policy, seed=seed)
+    start = time.perf_counter()
+    player.run_playouts(HasamiShogiGame(), BLACK_PIECE, playouts)
+    return playouts / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the Monte Carlo tree search player")
+    parser.add_argument("--playouts", type=int, default=5000)
+    parser.add_argument("--policy", choices=POLICIES, default="random")
+    parser.add_argument("--moves", type=int, default=4, help="moves to play with the tree kept between them")
+    arguments = parser.parse_args()
+
+    print("%.0f playouts/s on their own" % playout_speed(arguments.playouts, arguments.policy))
+    game = HasamiShogiGame()
+    computer = MonteCarloPlayer(playouts=arguments.playouts, time_limit=None, policy=arguments.policy, seed=0)
+    for move_number in range(arguments.moves):
+        computer_move = computer.choose_move(game)
+        if computer_move is None:
+            break
+        search_info = computer.get_search_info()
+        print("%s %s-%s  %d playouts (%d reused), %.0f playouts/s, win rate %.2f" % (
+            game.get_active_player(), SQUARE_NAMES[computer_move[0]], SQUARE_NAMES[computer_move[1]],
+            search_info["playouts"], search_info["reused_playouts"], search_info["playouts_per_second"],
+            search_info["win_rate"]))
+        game.make_move_idx(computer_move[0], computer_move[1])
@@ -0,0 +1,134 @@
+# Description: Timing histograms and call counts for the phases of make_move (input validation, check_valid_move,
+#              update_game_board, check_for_captures, corner_capture_check, update_game_state). A game only uses a
+#              profiler after game.enable_profiling(); until then make_move runs the normal, untimed code, so the
+#              profiling costs nothing while it's turned off. Results can be read as a dictionary or written out in
+#              the Prometheus text format.
+
+import bisect
+import os
+import time
+
+PHASES = ("input_validation", "check_valid_move", "update_game_board", "check_for_captures", "corner_capture_check",
+          "update_game_state", "record_move", "total")
+
+# upper bounds of the histogram buckets in nanoseconds, 250 ns --> 10 ms, the last bucket is everything above
+DEFAULT_BUCKETS = (250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000, 10000000)
+
+METRIC_NAME = "hasami_shogi_make_move_phase_seconds"
+REJECTED_METRIC_NAME = "hasami_shogi_make_move_rejected_total"
+
+
+class MoveProfiler:
+    """
+    This class collects, for every phase of a move, how many times it ran, the total and longest time and a histogram
+    of its times. One profiler can be shared by several games to add their moves together.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: increasing upper bounds of the histogram buckets, in nanoseconds
+        """
+
+        self._buckets = tuple(buckets)
+        self._clock = time.perf_counter_ns
+        self.reset()
+
+    def reset(self):
+        """
+        This clears every count and histogram
+        :return:
+        """
+
+        # phase --> [calls, total nanoseconds, longest nanoseconds, bucket counts (one more than the bounds)]
+        self._phases = {phase: [0, 0, 0, [0] * (len(self._buckets) + 1)] for phase in PHASES}
+        self._rejected = {phase: 0 for phase in PHASES}
+
+    def get_clock(self):
+        """
+        This returns the clock the game reads around each phase, time.perf_counter_ns
+        :return:
+        """
+
+        return self._clock
+
+    def record(self, phase, nanoseconds):
+        """
+        This adds one timing of 'phase' (one of PHASES)
+        :param phase:
+        :param nanoseconds:
+        :return:
+        """
+
+        phase_stats = self._phases[phase]
+        phase_stats[0] += 1
+        phase_stats[1] += nanoseconds
+        if nanoseconds > phase_stats[2]:
+            phase_stats[2] = nanoseconds
+        phase_stats[3][bisect.bisect_left(self._buckets, nanoseconds)] += 1
+
+    def record_rejected(self, phase):
+        """
+        This counts a move that 'phase' turned down, make_move returned False
+        :param phase:
+        :return:
+        """
+
+        self._rejected[phase] += 1
+
+    def get_stats(self):
+        """
+        This returns a dictionary of phase --> {'calls', 'rejected', 'total_seconds', 'mean_seconds', 'max_seconds',
+        'buckets'}, where buckets is a list of (upper bound in seconds, number of timings in that bucket) ending with
+        (float('inf'), ...). Phases that never ran are left out.
+        :return:
+        """
+
+        bounds = [bound / 1e9 for bound in self._buckets] + [float("inf")]
+        stats = {}
+        for phase in PHASES:
+            calls, total, longest, bucket_counts = self._phases[phase]
+            if calls == 0 and self._rejected[phase] == 0:
+                continue
+            stats[phase] = {"calls": calls, "rejected": self._rejected[phase], "total_seconds": total / 1e9,
+                            "mean_seconds": total / calls / 1e9 if calls else 0.0, "max_seconds": longest / 1e9,
+                            "buckets": list(zip(bounds, bucket_counts))}
+        return stats
+
+    def to_prometheus(self):
+        """
+        This returns the histograms and rejected move counts in the Prometheus text exposition format, one
+        histogram per phase labelled phase="...", with cumulative buckets as Prometheus expects
+        :return:
+        """
+
+        lines = ["# HELP %s Time spent in each phase of make_move." % METRIC_NAME,
+                 "# TYPE %s histogram" % METRIC_NAME]
+        for phase in PHASES:
+            calls, total, longest, bucket_counts = self._phases[phase]
+            cumulative = 0
+            for bound, count in zip(self._buckets, bucket_counts):
+                cumulative += count
+                lines.append('%s_bucket{phase="%s",le="%s"} %d' % (METRIC_NAME, phase, repr(bound / 1e9), cumulative))
+            lines.append('%s_bucket{phase="%s",le="+Inf"} %d' % (METRIC_NAME, phase, calls))
+            lines.append('%s_sum{phase="%s"} %s' % (METRIC_NAME, phase, repr(total / 1e9)))
+            lines.append('%s_count{phase="%s"} %d' % (METRIC_NAME, phase, calls))
+
+        lines.append("# HELP %s Moves make_move returned False for, by the phase that turned them down." %
+                     REJECTED_METRIC_NAME)
+        lines.append("# TYPE %s counter" % REJECTED_METRIC_NAME)
+        for phase in PHASES:
+            lines.append('%s{phase="%s"} %d' % (REJECTED_METRIC_NAME, phase, self._rejected[phase]))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        This writes to_prometheus() to a file, for example one read by the node exporter textfile collector. The
+        file is written next to 'path' first and then renamed, so a reader never sees half of it.
+        :param path:
+        :return:
+        """
+
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        os.replace(temporary_path, path)
@@ -0,0 +1,215 @@
+# Description: An opening book built from game records (see GameRecord.py), for answering early moves without
+#              searching. Every game is replayed and, for the first moves of each game, the Zobrist hash of the
+#              position is mapped to the move played and how the game went for the player who played it. Moves that
+#              reach the same position by a different order are counted together, since the hash only depends on
+#              the position. A book built with symmetric=True is keyed by the canonical position instead (see
+#              Symmetry.py), so mirror images of a position share their entries, and moves are mapped back to the
+#              game when looked up.
+#              Run 'python OpeningBook.py build book.hsob games.hsgr' to build a book, then
+#              'python OpeningBook.py show book.hsob' to print the book moves of the starting position.
+#
+#              File layout: the 5 byte magic b"HSOB\x01", the number of entries (4 bytes), 1 if the book is keyed
+#              by canonical positions (1 byte) and the entries sorted by hash, each: hash 8 bytes, square moved from
+#              1 byte, square moved to 1 byte, games, wins and losses 4 bytes each, all little endian. A lookup is a
+#              binary search over the memory mapped entries.
+
+import argparse
+import mmap
+import struct
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from GameRecord import read_game_records, GameRecordError
+from HasamiShogiGame import SQUARE_NAMES
+from Symmetry import canonical_hash, transform_move, untransform_move, IDENTITY
+
+MAGIC = b"HSOB\x01"
+BOOK_HEADER = struct.Struct("<IB")
+BOOK_ENTRY = struct.Struct("<QBBIII")
+WINNERS = {"RED_WON": "RED", "BLACK_WON": "BLACK"}
+
+
+def position_key(game, symmetric):
+    """
+    This is a helper function that returns (book hash, symmetry) for the position in 'game': its Zobrist hash, or
+    for a symmetric book the hash of its canonical position and the symmetry that maps the game onto it
+    :param game:
+    :param symmetric:
+    :return:
+    """
+
+    if symmetric:
+        return canonical_hash(game)
+    return game.get_zobrist_hash(), IDENTITY
+
+
+def build_opening_book(record_paths, path, max_ply=16, min_games=2, game_class=BitboardHasamiShogiGame,
+                       symmetric=False):
+    """
+    This replays every game in the game record files and writes an opening book to 'path'. Returns the number of
+    entries written.
+    :param record_paths: list of game record files
+    :param path: book file to write
+    :param max_ply: only the first max_ply moves of each game go into the book
+    :param min_games: moves played fewer times than this from a position are left out
+    :param game_class: HasamiShogiGame or BitboardHasamiShogiGame, one instance replays every game
+    :param symmetric: key positions by their canonical form, so mirror images are counted together
+    :return:
+    """
+
+    move_stats = {}                     # (hash, moved_from, moved_to) --> [games, wins, losses]
+    game = game_class()
+    for record_path in record_paths:
+        for result, red_captured, black_captured, moves in read_game_records(record_path):
+            game.reset()
+            winner = WINNERS.get(result)
+            for ply, (from_square, to_square) in enumerate(moves[:max_ply]):
+                zobrist_hash, symmetry = position_key(game, symmetric)
+                key = (zobrist_hash,) + transform_move((from_square, to_square), symmetry)
+                mover = game.get_active_player()
+                if not game.make_move_idx(from_square, to_square):
+                    raise GameRecordError("illegal move %d in game record" % ply)
+                stats = move_stats.get(key)
+                if stats is None:
+                    stats = move_stats[key] = [0, 0, 0]
+                stats[0] += 1
+                if winner == mover:
+                    stats[1] += 1
+                elif winner is not None:
+                    stats[2] += 1
+
+    entries = sorted((key[0], -stats[0], key[1], key[2], stats) for key, stats in move_stats.items()
+                     if stats[0] >= min_games)
+    with open(path, "wb") as book_file:
+        book_file.write(MAGIC)
+        book_file.write(BOOK_HEADER.pack(len(entries), symmetric))
+        for zobrist_hash, negative_games, from_square, to_square, stats in entries:
+            book_file.write(BOOK_ENTRY.pack(zobrist_hash, from_square, to_square, stats[0], stats[1], stats[2]))
+    return len(entries)
+
+
+class OpeningBook:
+    """
+    This class looks moves up in a book file made by build_opening_book. The file is memory mapped and searched in
+    place. It can be used as a context manager.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: book file
+        """
+
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = len(MAGIC) + BOOK_HEADER.size
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(str(path) + " is not an opening book file")
+        self._entries, self._symmetric = BOOK_HEADER.unpack_from(self._map, len(MAGIC))
+        if len(self._map) != header_end + self._entries * BOOK_ENTRY.size:
+            self.close()
+            raise ValueError(str(path) + " is truncated")
+        self._offset = header_end
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._entries
+
+    def close(self):
+        """
+        This releases the memory map and closes the file
+        :return:
+        """
+
+        self._map.close()
+        self._file.close()
+
+    def get_moves(self, game):
+        """
+        This returns the book moves for the position in 'game', most played first, as a list of dictionaries with
+        move ((moved_from, moved_to) square numbers), games, wins, losses and score (the share of points won, a draw
+        or unfinished game counting half). Moves that aren't legal in the game, which only a hash collision could
+        give, are left out. The list is empty when the position isn't in the book.
+        :param game:
+        :return:
+        """
+
+        zobrist_hash, symmetry = position_key(game, self._symmetric)
+        book_map = self._map
+        offset = self._offset
+        entry_size = BOOK_ENTRY.size
+
+        low = 0
+        high = self._entries
+        while low < high:                   # first entry with a hash >= zobrist_hash
+            middle = (low + high) // 2
+            if struct.unpack_from("<Q", book_map, offset + middle * entry_size)[0] < zobrist_hash:
+                low = middle + 1
+            else:
+                high = middle
+
+        book_moves = []
+        legal_moves = None
+        while low < self._entries:
+            entry_hash, from_square, to_square, games, wins, losses = BOOK_ENTRY.unpack_from(
+                book_map, offset + low * entry_size)
+            if entry_hash != zobrist_hash:
+                break
+            low += 1
+            from_square, to_square = untransform_move((from_square, to_square), symmetry)
+            if legal_moves is None:
+                legal_moves = set(game.generate_legal_moves())
+            if (from_square, to_square) not in legal_moves:
+                continue
+            book_moves.append({"move": (from_square, to_square), "games": games, "wins": wins, "losses": losses,
+                               "score": (games + wins - losses) / (2 * games)})
+        return book_moves
+
+    def choose_move(self, game, min_games=1, rng=None):
+        """
+        This returns a book move for 'game', or None when there is no book move played at least min_games times.
+        Without rng the move with the best score is returned (most played breaks ties); with a random.Random the
+        move is picked at random, weighted by how often it was played, for variety.
+        :param game:
+        :param min_games:
+        :param rng:
+        :return:
+        """
+
+        book_moves = [book_move for book_move in self.get_moves(game) if book_move["games"] >= min_games]
+        if not book_moves:
+            return None
+        if rng is None:
+            return max(book_moves, key=lambda book_move: (book_move["score"], book_move["games"]))["move"]
+        return rng.choices([book_move["move"] for book_move in book_moves],
+                           [book_move["games"] for book_move in book_moves])[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or show a Hasami Shogi opening book")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="build a book from game record files")
+    build_parser.add_argument("path")
+    build_parser.add_argument("records", nargs="+")
+    build_parser.add_argument("--max-ply", type=int, default=16)
+    build_parser.add_argument("--min-games", type=int, default=2)
+    build_parser.add_argument("--symmetric", action="store_true", help="count mirror image positions together")
+    show_parser = subparsers.add_parser("show", help="print the book moves of the starting position")
+    show_parser.add_argument("path")
+    arguments = parser.parse_args()
+
+    if arguments.command == "build":
+        entry_count = build_opening_book(arguments.records, arguments.path, arguments.max_ply, arguments.min_games,
+                                         symmetric=arguments.symmetric)
+        print(entry_count, "book entries written")
+    else:
+        with OpeningBook(arguments.path) as book:
+            print(len(book), "book entries")
+            for start_move in book.get_moves(BitboardHasamiShogiGame()):
+                print("%s-%s  games %d  wins %d  losses %d  score %.3f" % (
+                    SQUARE_NAMES[start_move["move"][0]], SQUARE_NAMES[start_move["move"][1]], start_move["games"],
+                    start_move["wins"], start_move["losses"], start_move["score"]))
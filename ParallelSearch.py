@@ -0,0 +1,266 @@
+# Description: A parallel search for the Hasami Shogi Game that uses one worker process per core, since the GIL keeps
+#              threads from running the search loop at the same time. Every worker runs an AlphaBetaPlayer on its own
+#              copy of the position, all sharing one SharedTranspositionTable, in one of two modes:
+#              'lazy' - Lazy SMP: every worker searches every root move, each starting from a different root move,
+#                       and they help each other only through the shared table. The first worker to finish stops
+#                       the rest and the deepest result is played.
+#              'root' - the root moves are dealt out between the workers, each searches its share and the best
+#                       scoring move of all of them is played. Workers can stop at different depths, so the scores
+#                       are compared at the deepest iteration every worker finished.
+#              The speedup has only been measured on a 1 core machine, where the workers share the core and 2 of
+#              them run at 0.87x ('lazy') and 0.65x ('root') of one; scaling on several cores is unverified.
+#              Run 'python ParallelSearch.py --benchmark --depth 4' to print the speedup for 1, 2, 4, ... cores.
+
+import argparse
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+
+from AlphaBetaPlayer import AlphaBetaPlayer, material_evaluation
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from Perft import PERFT_POSITIONS, load_position
+from TranspositionTable import SharedTranspositionTable
+
+MODES = ("lazy", "root")
+
+
+def run_search_worker(connection, table_name, table_size, evaluate, stop_event):
+    """
+    This is the main loop of a worker process. It receives searches as
+    (game class, game snapshot, root moves, all root moves, time limit, max depth) tuples, answers each with the
+    search info of its AlphaBetaPlayer, and stops when it receives None.
+    :param connection: this worker's end of a multiprocessing Pipe
+    :param table_name: name of the shared transposition table
+    :param table_size: number of slots in the shared transposition table
+    :param evaluate: evaluation function for the AlphaBetaPlayer
+    :param stop_event: multiprocessing Event that stops the search early
+    :return:
+    """
+
+    table = SharedTranspositionTable.attach(table_name, table_size)
+    player = AlphaBetaPlayer(evaluate=evaluate, transposition_table=table, stop_event=stop_event)
+    games = {}                          # game class --> a game reused for every search
+    try:
+        while True:
+            task = connection.recv()
+            if task is None:
+                break
+            game_class, snapshot, root_moves, all_root_moves, time_limit, max_depth = task
+            game = games.get(game_class)
+            if game is None:
+                game = games[game_class] = game_class()
+            game.restore(snapshot)
+            player.choose_move(game, time_limit, max_depth, root_moves, all_root_moves)
+            connection.send(player.get_search_info())
+    finally:
+        table.close()
+
+
+class ParallelSearchPlayer:
+    """
+    This class chooses moves like AlphaBetaPlayer but searches on several worker processes at once. The workers are
+    started when the player is created and kept for every move; call close(), or use the player as a context
+    manager, to stop them.
+    """
+
+    def __init__(self, workers=None, mode="lazy", time_limit=1.0, max_depth=32, evaluate=material_evaluation,
+                 table_bytes=64 * 1024 * 1024):
+        """
+        :param workers: number of worker processes, defaults to the number of cores
+        :param mode: 'lazy' or 'root', see the top of this file
+        :param time_limit: seconds allowed per move
+        :param max_depth: deepest iteration to search to
+        :param evaluate: evaluation function, it must be picklable (a module level function or an Evaluator)
+        :param table_bytes: size of the shared transposition table, in bytes
+        """
+
+        if mode not in MODES:
+            raise ValueError("mode must be one of " + ", ".join(MODES))
+
+        self._workers = workers or os.cpu_count() or 1
+        self._mode = mode
+        self._time_limit = time_limit
+        self._max_depth = max_depth
+        self._table = SharedTranspositionTable(table_bytes)
+        self._stop_event = multiprocessing.Event()
+        self._connections = []
+        self._processes = []
+        self._search_info = {}
+
+        for worker_number in range(self._workers):
+            parent_connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_search_worker, daemon=True,
+                                              args=(worker_connection, self._table.get_name(),
+                                                    self._table.get_size(), evaluate, self._stop_event))
+            process.start()
+            worker_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        This stops the worker processes and removes the shared transposition table
+        :return:
+        """
+
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._processes = []
+        self._table.close()
+
+    def get_transposition_table(self):
+        """
+        This returns the SharedTranspositionTable the workers use
+        :return:
+        """
+
+        return self._table
+
+    def get_search_info(self):
+        """
+        This returns a dictionary describing the last search, like AlphaBetaPlayer.get_search_info: best move, score,
+        depth reached (in 'root' mode the depth every worker finished, which the scores were compared at), nodes
+        searched by all workers together, seconds taken, nodes per second, and the number of workers used
+        :return:
+        """
+
+        return dict(self._search_info)
+
+    def choose_move(self, game, time_limit=None, max_depth=None):
+        """
+        This searches the position in 'game' on the workers and returns the best (moved_from, moved_to) pair of
+        square numbers found for the active player, or None if there are no legal moves. 'game' is not changed.
+        :param game:
+        :param time_limit: seconds for this move, overrides the player's time limit
+        :param max_depth: deepest iteration for this move, overrides the player's max depth
+        :return:
+        """
+
+        if time_limit is None:
+            time_limit = self._time_limit
+        if max_depth is None:
+            max_depth = self._max_depth
+
+        start = time.perf_counter()
+        root_moves = game.generate_legal_moves()
+        if len(root_moves) <= 1:
+            best_move = root_moves[0] if root_moves else None
+            self._search_info = {"best_move": best_move, "score": 0, "depth": 0, "nodes": 0,
+                                 "seconds": time.perf_counter() - start, "nodes_per_second": 0.0, "workers": 0}
+            return best_move
+
+        if self._mode == "lazy":
+            worker_moves = [root_moves[worker_number % len(root_moves):] +
+                            root_moves[:worker_number % len(root_moves)] for worker_number in range(self._workers)]
+        else:
+            worker_moves = [root_moves[worker_number::self._workers]
+                            for worker_number in range(min(self._workers, len(root_moves)))]
+
+        game_class = game.get_unprofiled_class()
+        snapshot = game.snapshot()
+        self._table.new_search()
+        self._stop_event.clear()
+        connections = self._connections[:len(worker_moves)]
+        all_root_moves = self._mode == "lazy"         # lazy workers get every move, only the order differs
+        for connection, moves in zip(connections, worker_moves):
+            connection.send((game_class, snapshot, moves, all_root_moves, time_limit, max_depth))
+
+        results = []
+        waiting = list(connections)
+        while waiting:
+            for connection in multiprocessing.connection.wait(waiting):
+                results.append(connection.recv())
+                waiting.remove(connection)
+                if self._mode == "lazy":
+                    self._stop_event.set()          # one worker is done, the others stop at their next clock check
+
+        if self._mode == "lazy":
+            best = max(results, key=lambda result: result["depth"])    # max keeps the first finished of equal depth
+            best_move, best_score, depth = best["best_move"], best["score"], best["depth"]
+        else:
+            depth = min(result["depth"] for result in results)
+            if depth == 0:                      # a worker answered from the book or finished no iteration
+                best = max(results, key=lambda result: result["depth"])
+                best_move, best_score, depth = best["best_move"], best["score"], best["depth"]
+            else:
+                best_score, best_move = max((result["iterations"][depth - 1] for result in results),
+                                            key=lambda iteration: iteration[0])
+
+        elapsed = time.perf_counter() - start
+        nodes = sum(result["nodes"] for result in results)
+        self._search_info = {"best_move": best_move, "score": best_score, "depth": depth, "nodes": nodes,
+                             "seconds": elapsed, "nodes_per_second": nodes / elapsed, "workers": len(results)}
+        return best_move
+
+
+def benchmark_speedup(worker_counts, depth=4, mode="lazy", positions=None, game_class=BitboardHasamiShogiGame):
+    """
+    This searches every position to a fixed depth with each number of workers and returns a list of
+    (workers, seconds, speedup over the first worker count, nodes per second). The transposition table is emptied
+    before each position so every run starts cold.
+    :param worker_counts: list of worker counts to time, for example [1, 2, 4, 8]
+    :param depth: search depth
+    :param mode: 'lazy' or 'root'
+    :param positions: names of PERFT_POSITIONS to search, all of them if not given
+    :param game_class: HasamiShogiGame or BitboardHasamiShogiGame
+    :return:
+    """
+
+    if positions is None:
+        positions = list(PERFT_POSITIONS)
+    games = [load_position(name, game_class) for name in positions]
+
+    timings = []
+    for workers in worker_counts:
+        with ParallelSearchPlayer(workers, mode, time_limit=float("inf"), max_depth=depth) as player:
+            seconds = 0.0
+            nodes = 0
+            for game in games:
+                player.get_transposition_table().clear()
+                player.choose_move(game)
+                search_info = player.get_search_info()
+                seconds += search_info["seconds"]
+                nodes += search_info["nodes"]
+        timings.append((workers, seconds, timings[0][1] / seconds if timings else 1.0, nodes / seconds))
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search Hasami Shogi positions on several cores")
+    parser.add_argument("--benchmark", action="store_true", help="time a fixed depth search on 1, 2, 4, ... cores")
+    parser.add_argument("--workers", type=int, default=None, help="most workers to try, defaults to the cores")
+    parser.add_argument("--mode", choices=MODES, default="lazy")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--time-limit", type=float, default=5.0)
+    arguments = parser.parse_args()
+
+    max_workers = arguments.workers or os.cpu_count() or 1
+    if arguments.benchmark:
+        counts = [1]
+        while counts[-1] * 2 <= max_workers:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != max_workers:
+            counts.append(max_workers)
+        for worker_count, total_seconds, speedup, nodes_per_second in benchmark_speedup(counts, arguments.depth,
+                                                                                        arguments.mode):
+            print("%3d workers  %8.2f s  speedup %5.2f  %10.0f nodes/s" % (worker_count, total_seconds, speedup,
+                                                                          nodes_per_second))
+    else:
+        with ParallelSearchPlayer(max_workers, arguments.mode, arguments.time_limit) as search_player:
+            chosen_move = search_player.choose_move(BitboardHasamiShogiGame())
+            print("Best move", chosen_move, search_player.get_search_info())
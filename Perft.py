@@ -0,0 +1,138 @@
+# Description: Perft (performance test) for the Hasami Shogi move engine. perft counts every move sequence of a given
+#              length from a position, using generate_legal_moves, make_move_idx and unmake_move, so it exercises move
+#              generation, sliding paths, captures and game state updates. The known good counts below are the
+#              yardstick any faster engine has to reproduce, and the nodes per second measure its speed.
+#              Run 'python Perft.py' to check every stored count and print nodes per second for both backends.
+
+import argparse
+import time
+
+from HasamiShogiGame import HasamiShogiGame, SQUARE_NAMES
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+
+START_BOARD = "R" * 9 + "." * 63 + "B" * 9
+
+# name --> (board, player to move, {depth: number of leaf nodes})
+PERFT_POSITIONS = {
+    "start": (START_BOARD, "BLACK", {1: 63, 2: 3717, 3: 254219, 4: 16599273}),
+    "opening": ("RR.R.R..R...........R...R....B...B.BB.....B...........................R....BBR.B.", "BLACK",
+                {1: 65, 2: 4634, 3: 310790}),
+    "midgame": ("......RR..........R.B......R........R....R.....B................B....B.B.B.....RB", "BLACK",
+                {1: 62, 2: 3988, 3: 257184}),
+    "endgame": ("...B..................R...R....................RB.......R..R...........RRR.......", "RED",
+                {1: 86, 2: 2022, 3: 177491}),
+    "corners": ("R.......R" + "B.......B" + "." * 18 + ".......B." + "....R...." + "." * 18 + "....R....", "BLACK",
+                {1: 44, 2: 1859, 3: 76452}),
+}
+
+
+def perft(game, depth):
+    """
+    This returns the number of leaf nodes 'depth' moves below the current position of 'game'. The game is searched
+    in place with make_move_idx and unmake_move and is left as it was. At the last ply the moves are only counted
+    (count_legal_moves), not made. A finished game has no moves, so it adds nothing below it.
+    :param game:
+    :param depth:
+    :return:
+    """
+
+    if depth <= 0:
+        return 1
+    if depth == 1:
+        return game.count_legal_moves()
+
+    nodes = 0
+    for from_square, to_square in game.generate_legal_moves():
+        game.make_move_idx(from_square, to_square)
+        nodes += perft(game, depth - 1)
+        game.unmake_move()
+    return nodes
+
+
+def perft_divide(game, depth):
+    """
+    This returns a dictionary of each legal move in algebraic notation ('i1-h1') --> its perft count at depth - 1,
+    for finding which move two engines disagree on
+    :param game:
+    :param depth:
+    :return:
+    """
+
+    divided = {}
+    for from_square, to_square in game.generate_legal_moves():
+        game.make_move_idx(from_square, to_square)
+        divided[SQUARE_NAMES[from_square] + "-" + SQUARE_NAMES[to_square]] = perft(game, depth - 1)
+        game.unmake_move()
+    return divided
+
+
+def load_position(name, game_class=HasamiShogiGame):
+    """
+    This returns a new game of 'game_class' set up at the stored perft position 'name'
+    :param name:
+    :param game_class:
+    :return:
+    """
+
+    board, active_player, counts = PERFT_POSITIONS[name]
+    game = game_class()
+    game.set_position(board, active_player)
+    return game
+
+
+def timed_perft(game, depth):
+    """
+    This runs perft and returns (nodes, seconds, nodes per second)
+    :param game:
+    :param depth:
+    :return:
+    """
+
+    start = time.perf_counter()
+    nodes = perft(game, depth)
+    seconds = time.perf_counter() - start
+    return nodes, seconds, nodes / seconds if seconds > 0 else 0.0
+
+
+def verify(game_class=HasamiShogiGame, max_depth=None):
+    """
+    This runs perft on every stored position and depth (up to max_depth) and returns a list of
+    (name, depth, expected, counted) for every count that doesn't match. An empty list means the engine agrees.
+    :param game_class:
+    :param max_depth:
+    :return:
+    """
+
+    mismatches = []
+    for name, (board, active_player, counts) in PERFT_POSITIONS.items():
+        game = load_position(name, game_class)
+        for depth, expected in sorted(counts.items()):
+            if max_depth is not None and depth > max_depth:
+                continue
+            counted = perft(game, depth)
+            if counted != expected:
+                mismatches.append((name, depth, expected, counted))
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the Hasami Shogi move engine with perft")
+    parser.add_argument("--depth", type=int, default=None, help="only check stored counts up to this depth")
+    parser.add_argument("--position", choices=sorted(PERFT_POSITIONS), default=None,
+                        help="time perft from this position instead of checking the stored counts")
+    arguments = parser.parse_args()
+
+    for board_class in (HasamiShogiGame, BitboardHasamiShogiGame):
+        if arguments.position is not None:
+            position_depth = arguments.depth or 3
+            leaf_nodes, perft_seconds, nodes_per_second = timed_perft(load_position(arguments.position, board_class),
+                                                                      position_depth)
+            print("%s %s depth %d: %d nodes in %.2f s, %.0f nodes/s" % (
+                board_class.__name__, arguments.position, position_depth, leaf_nodes, perft_seconds,
+                nodes_per_second))
+            continue
+
+        start_time = time.perf_counter()
+        failed = verify(board_class, arguments.depth)
+        print("%s: %s (%.2f s)" % (board_class.__name__, "FAILED %s" % failed if failed else "all counts match",
+                                   time.perf_counter() - start_time))
@@ -0,0 +1,198 @@
+# Description: Plays many Hasami Shogi games against itself in parallel. Independent games are spread over a process
+#              pool and each finished game is streamed back to the parent as soon as it is done. Players are either
+#              seeded random movers or the AlphaBetaPlayer at a fixed depth. The search itself is deterministic, so
+#              an 'alphabeta' side plays its first few moves at random from the game's seed, giving every game its
+#              own opening.
+#              Run 'python SelfPlayRunner.py --games 1000' to print the games per second.
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from AlphaBetaPlayer import AlphaBetaPlayer
+from TranspositionTable import TranspositionTable
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from GameRecord import GameRecordWriter
+
+POLICIES = ("random", "alphabeta")
+WORKER_PLAYERS = {}                 # search depth --> (AlphaBetaPlayer, its TranspositionTable), one per process
+
+
+def get_worker_player(depth):
+    """
+    This is a helper function that returns the AlphaBetaPlayer searching to 'depth' for this process, made the first
+    time it is asked for, so games without an 'alphabeta' side never build one and its transposition table
+    :param depth:
+    :return:
+    """
+
+    entry = WORKER_PLAYERS.get(depth)
+    if entry is None:
+        table = TranspositionTable(16 * 1024 * 1024)
+        entry = WORKER_PLAYERS[depth] = (AlphaBetaPlayer(time_limit=float("inf"), max_depth=depth,
+                                                         transposition_table=table), table)
+    return entry
+
+
+def choose_policy_move(policy, game, rng, player):
+    """
+    This is a helper function that picks the next move for 'policy' ('random' or 'alphabeta'), returns a
+    (moved_from, moved_to) pair of square numbers, or None when there are no legal moves
+    :param policy:
+    :param game:
+    :param rng: random.Random used by the random policy
+    :param player: the AlphaBetaPlayer for the 'alphabeta' policy, None if no side uses it
+    :return:
+    """
+
+    if policy == "random":
+        legal_moves = game.generate_legal_moves()
+        if not legal_moves:
+            return None
+        return legal_moves[rng.randrange(len(legal_moves))]
+
+    return player.choose_move(game)
+
+
+def play_self_play_game(task):
+    """
+    This plays one complete game and returns its record. It runs inside the worker processes, so it is a plain
+    module level function that takes and returns picklable values.
+    :param task: tuple (game_number, seed, black_policy, red_policy, max_moves, alphabeta_depth, opening_plies,
+                 game_class)
+    :return: dictionary with game_number, seed, moves (list of (moved_from, moved_to) square numbers), result,
+             red_captured and black_captured
+    """
+
+    game_number, seed, black_policy, red_policy, max_moves, alphabeta_depth, opening_plies, game_class = task
+    rng = random.Random(seed)
+    game = game_class()
+    player = None
+    if "alphabeta" in (black_policy, red_policy):
+        player, table = get_worker_player(alphabeta_depth)
+        table.clear()                   # the moves chosen then only depend on the game, not on earlier games
+    moves = []
+
+    while game.get_game_state() == "UNFINISHED" and len(moves) < max_moves:
+        policy = black_policy if game.get_active_player() == "BLACK" else red_policy
+        if len(moves) < opening_plies:
+            policy = "random"
+        move = choose_policy_move(policy, game, rng, player)
+        if move is None:
+            break
+        game.make_move_idx(move[0], move[1])
+        moves.append(move)
+
+    return {"game_number": game_number, "seed": seed, "moves": moves, "result": game.get_game_state(),
+            "red_captured": game.get_num_captured_pieces("RED"),
+            "black_captured": game.get_num_captured_pieces("BLACK")}
+
+
+class SelfPlayRunner:
+    """
+    This class runs self-play games on a pool of worker processes, one game per task, and yields finished games
+    in the order they finish
+    """
+
+    def __init__(self, workers=None, black_policy="random", red_policy="random", max_moves=300, alphabeta_depth=2,
+                 seed=0, game_class=BitboardHasamiShogiGame, opening_plies=4):
+        """
+        :param workers: number of worker processes, defaults to the number of cores
+        :param black_policy: 'random' or 'alphabeta'
+        :param red_policy: 'random' or 'alphabeta'
+        :param max_moves: a game that isn't over after this many moves is stopped, its result stays 'UNFINISHED'
+        :param alphabeta_depth: search depth for the 'alphabeta' policy
+        :param seed: base seed, game number n is played with seed + n
+        :param game_class: HasamiShogiGame or BitboardHasamiShogiGame
+        :param opening_plies: the first moves of every game are played at random from the game's seed, whatever the
+                              policy, so 'alphabeta' games don't all repeat the same moves
+        """
+
+        if black_policy not in POLICIES or red_policy not in POLICIES:
+            raise ValueError("policies must be one of " + ", ".join(POLICIES))
+
+        self._workers = workers or os.cpu_count() or 1
+        self._black_policy = black_policy
+        self._red_policy = red_policy
+        self._max_moves = max_moves
+        self._alphabeta_depth = alphabeta_depth
+        self._seed = seed
+        self._game_class = game_class
+        self._opening_plies = opening_plies
+        self._stats = {"games": 0, "moves": 0, "seconds": 0.0, "games_per_second": 0.0}
+
+    def get_stats(self):
+        """
+        This returns a dictionary for the last run: games played, moves made, seconds taken and games per second
+        :return:
+        """
+
+        return dict(self._stats)
+
+    def run(self, num_games, chunksize=None):
+        """
+        This plays num_games games on the worker pool and yields each game record (see play_self_play_game) as soon
+        as it is finished. Games are handed out in chunks to keep the pickling overhead down.
+        :param num_games:
+        :param chunksize: games per task sent to a worker, picked from num_games and workers if not given
+        :return:
+        """
+
+        if chunksize is None:
+            chunksize = max(1, min(64, num_games // (self._workers * 8)))
+
+        tasks = ((game_number, self._seed + game_number, self._black_policy, self._red_policy, self._max_moves,
+                  self._alphabeta_depth, self._opening_plies, self._game_class) for game_number in range(num_games))
+
+        start = time.perf_counter()
+        games = 0
+        moves = 0
+        try:
+            if self._workers == 1:
+                for task in tasks:
+                    record = play_self_play_game(task)
+                    games += 1
+                    moves += len(record["moves"])
+                    yield record
+            else:
+                with multiprocessing.Pool(self._workers) as pool:
+                    for record in pool.imap_unordered(play_self_play_game, tasks, chunksize):
+                        games += 1
+                        moves += len(record["moves"])
+                        yield record
+        finally:
+            seconds = time.perf_counter() - start
+            self._stats = {"games": games, "moves": moves, "seconds": seconds,
+                           "games_per_second": games / seconds if seconds > 0 else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Hasami Shogi self-play games on a process pool")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--black", choices=POLICIES, default="random")
+    parser.add_argument("--red", choices=POLICIES, default="random")
+    parser.add_argument("--max-moves", type=int, default=300)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--opening-plies", type=int, default=4, help="random moves at the start of every game")
+    parser.add_argument("--output", help="write the games to this game record file")
+    arguments = parser.parse_args()
+
+    runner = SelfPlayRunner(arguments.workers, arguments.black, arguments.red, arguments.max_moves, arguments.depth,
+                            arguments.seed, opening_plies=arguments.opening_plies)
+    results = {}
+    writer = GameRecordWriter(arguments.output) if arguments.output else None
+    for game_record in runner.run(arguments.games):
+        results[game_record["result"]] = results.get(game_record["result"], 0) + 1
+        if writer is not None:
+            writer.write_record(game_record)
+    if writer is not None:
+        writer.close()
+
+    run_stats = runner.get_stats()
+    print("Results:", results)
+    print("%d games, %d moves in %.2f seconds, %.1f games/s" %
+          (run_stats["games"], run_stats["moves"], run_stats["seconds"], run_stats["games_per_second"]))
@@ -0,0 +1,255 @@
+# Description: Canonical forms of Hasami Shogi positions under the symmetries of the rules, so caches, opening books
+#              and tablebases keyed by position store each family of equivalent positions once. The rules treat both
+#              colors, all four sides and all four corners alike, so each of the 8 rotations and reflections of the
+#              board, with or without swapping the colors (and the player to move), gives a position with the same
+#              result. Games from the starting position only meet two of these in practice: the left-right mirror,
+#              and the colors swapped together with the board flipped top to bottom; these, with the identity and
+#              the two combined, make MIRROR_SYMMETRIES, the default.
+#              An image of a position is built from the row and column codes the games already keep (see
+#              HasamiShogiGame.get_line_codes) with one table lookup per line, and its Zobrist hash from two table
+#              lookups per row, so no board is copied. Moves found on the canonical position are mapped back with
+#              untransform_move.
+
+from HasamiShogiGame import ZOBRIST_KEYS, ZOBRIST_RED_TO_MOVE, POWERS_OF_3, PIECE_CHARACTERS
+
+LOW_DIGITS = 5                      # a row's Zobrist hash is looked up in two parts, 3^5 and 3^4 entries per row
+LOW_CODES = POWERS_OF_3[LOW_DIGITS]
+
+
+def build_symmetries():
+    """
+    This returns the 16 symmetries as (name, square map, colors swapped) tuples, the identity first. The square map
+    is a tuple mapping each square of a position to its square in the image.
+    :return:
+    """
+
+    symmetries = []
+    for swap_colors in (False, True):
+        for transpose in (False, True):
+            for flip_rows in (False, True):
+                for flip_columns in (False, True):
+                    mapping = []
+                    for square in range(81):
+                        row, column = divmod(square, 9)
+                        if transpose:
+                            row, column = column, row
+                        if flip_rows:
+                            row = 8 - row
+                        if flip_columns:
+                            column = 8 - column
+                        mapping.append(row * 9 + column)
+                    name = "+".join(part for part, used in (("swap_colors", swap_colors), ("transpose", transpose),
+                                                            ("flip_rows", flip_rows),
+                                                            ("flip_columns", flip_columns)) if used)
+                    symmetries.append((name or "identity", tuple(mapping), swap_colors))
+    return tuple(symmetries)
+
+
+def build_line_tables():
+    """
+    This returns four tables indexed by a line code: the code itself, the line read backwards, the line with the
+    colors swapped, and both
+    :return:
+    """
+
+    identity = []
+    reversed_lines = []
+    swapped_lines = []
+    reversed_swapped_lines = []
+    swap_digit = (0, 2, 1)
+    for code in range(3 ** 9):
+        digits = [(code // POWERS_OF_3[position]) % 3 for position in range(9)]
+        identity.append(code)
+        reversed_lines.append(sum(digit * POWERS_OF_3[8 - position] for position, digit in enumerate(digits)))
+        swapped_lines.append(sum(swap_digit[digit] * POWERS_OF_3[position] for position, digit in enumerate(digits)))
+        reversed_swapped_lines.append(sum(swap_digit[digit] * POWERS_OF_3[8 - position]
+                                          for position, digit in enumerate(digits)))
+    return tuple(identity), tuple(reversed_lines), tuple(swapped_lines), tuple(reversed_swapped_lines)
+
+
+def build_image_rows():
+    """
+    This works out, for every symmetry and every row of the image, which line of the original position it is made
+    of. Returns, per symmetry, a tuple of 9 (use columns, line number, line table) entries: image row i has the code
+    line_table[codes[line number]], where codes are the original's row codes, or column codes if use columns is true.
+    :return:
+    """
+
+    image_rows = []
+    for name, mapping, swap_colors in SYMMETRIES:
+        inverse = [0] * 81
+        for square, image_square in enumerate(mapping):
+            inverse[image_square] = square
+        rows = []
+        for image_row in range(9):
+            squares = [inverse[image_row * 9 + column] for column in range(9)]
+            if squares[0] // 9 == squares[1] // 9:          # a row of the original
+                use_columns = False
+                line = squares[0] // 9
+                backwards = squares[0] > squares[1]
+            else:                                           # a column of the original
+                use_columns = True
+                line = squares[0] % 9
+                backwards = squares[0] > squares[1]
+            rows.append((use_columns, line, LINE_TABLES[2 * swap_colors + backwards]))
+        image_rows.append(tuple(rows))
+    return tuple(image_rows)
+
+
+def build_row_zobrist_keys():
+    """
+    This returns (low, high): low[row][code] is the Zobrist hash of the pieces in the first LOW_DIGITS squares of a
+    row with line code 'code' (only the low digits), high[row][code] the same for the rest of the row
+    :return:
+    """
+
+    piece_keys = (None, ZOBRIST_KEYS["B"], ZOBRIST_KEYS["R"])
+    low = []
+    high = []
+    for row in range(9):
+        for table, first_column, digits in ((low, 0, LOW_DIGITS), (high, LOW_DIGITS, 9 - LOW_DIGITS)):
+            row_keys = []
+            for code in range(3 ** digits):
+                zobrist_hash = 0
+                for position in range(digits):
+                    digit = (code // POWERS_OF_3[position]) % 3
+                    if digit:
+                        zobrist_hash ^= piece_keys[digit][row * 9 + first_column + position]
+                row_keys.append(zobrist_hash)
+            table.append(tuple(row_keys))
+    return tuple(low), tuple(high)
+
+
+SYMMETRIES = build_symmetries()
+SYMMETRY_NAMES = tuple(name for name, mapping, swap_colors in SYMMETRIES)
+SQUARE_MAPS = tuple(mapping for name, mapping, swap_colors in SYMMETRIES)          # symmetry --> square --> image
+INVERSE_SQUARE_MAPS = tuple(tuple(mapping.index(square) for square in range(81)) for mapping in SQUARE_MAPS)
+SWAPS_COLORS = tuple(swap_colors for name, mapping, swap_colors in SYMMETRIES)
+IDENTITY = SYMMETRY_NAMES.index("identity")
+LEFT_RIGHT_MIRROR = SYMMETRY_NAMES.index("flip_columns")
+COLOR_FLIP_MIRROR = SYMMETRY_NAMES.index("swap_colors+flip_rows")
+MIRROR_SYMMETRIES = (IDENTITY, LEFT_RIGHT_MIRROR, COLOR_FLIP_MIRROR,
+                     SYMMETRY_NAMES.index("swap_colors+flip_rows+flip_columns"))
+ALL_SYMMETRIES = tuple(range(len(SYMMETRIES)))
+BOARD_SYMMETRIES = tuple(symmetry for symmetry in ALL_SYMMETRIES if not SWAPS_COLORS[symmetry])  # 8, identity first
+LINE_TABLES = build_line_tables()
+IMAGE_ROWS = build_image_rows()
+ROW_ZOBRIST_LOW, ROW_ZOBRIST_HIGH = build_row_zobrist_keys()
+
+
+def image_rows(row_codes, column_codes, symmetry):
+    """
+    This returns the row codes of the image of a position under 'symmetry', as a tuple
+    :param row_codes:
+    :param column_codes:
+    :param symmetry:
+    :return:
+    """
+
+    return tuple(line_table[column_codes[line] if use_columns else row_codes[line]]
+                 for use_columns, line, line_table in IMAGE_ROWS[symmetry])
+
+
+def canonical_form(game, symmetries=MIRROR_SYMMETRIES):
+    """
+    This returns (key, symmetry) for the position in 'game'. The key is (row codes of the image, red to move) for
+    the image that sorts lowest under 'symmetries', so positions that are images of each other get the same key,
+    and it fully describes the position (the captured counts follow from the pieces left). 'symmetry' is the one
+    that maps the game's position onto it, for transform_move and untransform_move.
+    :param game:
+    :param symmetries: symmetry numbers to consider, MIRROR_SYMMETRIES or ALL_SYMMETRIES
+    :return:
+    """
+
+    row_codes, column_codes = game.get_line_codes()
+    red_to_move = game.get_active_player() == "RED"
+    best_key = None
+    best_symmetry = IDENTITY
+    for symmetry in symmetries:
+        key = (image_rows(row_codes, column_codes, symmetry), red_to_move != SWAPS_COLORS[symmetry])
+        if best_key is None or key < best_key:
+            best_key = key
+            best_symmetry = symmetry
+    return best_key, best_symmetry
+
+
+def key_zobrist_hash(key):
+    """
+    This returns the Zobrist hash of the position described by a canonical_form key, the same number
+    get_zobrist_hash gives for a game set up at that position
+    :param key:
+    :return:
+    """
+
+    rows, red_to_move = key
+    zobrist_hash = ZOBRIST_RED_TO_MOVE if red_to_move else 0
+    for row, code in enumerate(rows):
+        zobrist_hash ^= ROW_ZOBRIST_LOW[row][code % LOW_CODES] ^ ROW_ZOBRIST_HIGH[row][code // LOW_CODES]
+    return zobrist_hash
+
+
+def canonical_hash(game, symmetries=MIRROR_SYMMETRIES):
+    """
+    This returns (Zobrist hash of the canonical position, symmetry), a drop-in replacement for get_zobrist_hash
+    in a cache that should hold each family of symmetric positions once
+    :param game:
+    :param symmetries: symmetry numbers to consider, MIRROR_SYMMETRIES or ALL_SYMMETRIES
+    :return:
+    """
+
+    key, symmetry = canonical_form(game, symmetries)
+    return key_zobrist_hash(key), symmetry
+
+
+def key_to_position(key):
+    """
+    This returns (board, active player) for a canonical_form key, the arguments for set_position
+    :param key:
+    :return:
+    """
+
+    rows, red_to_move = key
+    board = "".join(PIECE_CHARACTERS[(code // POWERS_OF_3[column]) % 3] for code in rows for column in range(9))
+    return board, "RED" if red_to_move else "BLACK"
+
+
+def transform_position(board, active_player, symmetry):
+    """
+    This returns (board, active player) of the image of a position under 'symmetry'
+    :param board: 81 character board, as from get_board
+    :param active_player: 'RED' or 'BLACK'
+    :param symmetry:
+    :return:
+    """
+
+    inverse = INVERSE_SQUARE_MAPS[symmetry]
+    image = [board[inverse[square]] for square in range(81)]
+    if SWAPS_COLORS[symmetry]:
+        image = [{"R": "B", "B": "R"}.get(piece, piece) for piece in image]
+        active_player = "BLACK" if active_player == "RED" else "RED"
+    return "".join(image), active_player
+
+
+def transform_move(move, symmetry):
+    """
+    This maps a (moved_from, moved_to) pair of square numbers in a position onto the same move in its image
+    :param move:
+    :param symmetry:
+    :return:
+    """
+
+    mapping = SQUARE_MAPS[symmetry]
+    return mapping[move[0]], mapping[move[1]]
+
+
+def untransform_move(move, symmetry):
+    """
+    This maps a move in the image of a position back to the same move in the position itself, for example a book
+    or cache move stored for the canonical position back to the game it was looked up for
+    :param move:
+    :param symmetry:
+    :return:
+    """
+
+    inverse = INVERSE_SQUARE_MAPS[symmetry]
+    return inverse[move[0]], inverse[move[1]]
@@ -0,0 +1,332 @@
+# Description: A bounded transposition table for the Hasami Shogi Game, keyed by the Zobrist hash kept by
+#              HasamiShogiGame.get_zobrist_hash(). It caches search results (depth, value, bound, best move) for
+#              positions that have already been seen. SharedTranspositionTable keeps the same results in a
+#              multiprocessing.shared_memory block, so the worker processes of a parallel search share one table.
+
+from array import array
+from multiprocessing import shared_memory
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+REPLACE_ALWAYS = "always"
+REPLACE_DEPTH_PREFERRED = "depth"
+
+# Rough size of one filled slot: the 64 bit key object, the value, one pointer in each of the five slot lists and the
+# slot number kept for clear(). Depths, bounds, generations and moves are small ints or shared tuples, so they add
+# little.
+BYTES_PER_ENTRY = 116
+
+# A shared slot is two 64 bit words: the key XORed with the data word, and the data word holding
+# value + VALUE_OFFSET (bits 0-31), depth (32-39), bound (40-41), moved from (42-48), moved to (49-55) and
+# generation (56-63). A slot whose data word is 0 is empty. Word 0 of the block holds the current generation.
+SHARED_BYTES_PER_ENTRY = 16
+VALUE_OFFSET = 1 << 31
+NO_SQUARE = 127
+
+
+class TranspositionTable:
+    """
+    This class is a fixed size hash table of search results. The slot for a position is its Zobrist hash masked to
+    the table size, so the table never grows past the memory limit it was created with. When two positions want the
+    same slot the replacement policy decides which one is kept:
+    'always' - the newest store always wins
+    'depth'  - an entry is only replaced by a search at least as deep, by the same position, or by any store once the
+               entry is left over from an older search (see new_search)
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, replacement=REPLACE_DEPTH_PREFERRED):
+        """
+        This creates an empty table that uses about max_bytes of memory when full. The number of slots is the
+        largest power of two that fits.
+        :param max_bytes: memory limit for the table, in bytes
+        :param replacement: 'always' or 'depth'
+        """
+
+        if replacement not in (REPLACE_ALWAYS, REPLACE_DEPTH_PREFERRED):
+            raise ValueError("replacement must be 'always' or 'depth'")
+
+        size = 1
+        while size * 2 * BYTES_PER_ENTRY <= max_bytes:
+            size *= 2
+
+        self._size = size
+        self._mask = size - 1
+        self._replacement = replacement
+        self._generation = 0
+        self._keys = [None] * size
+        self._depths = [0] * size
+        self._values = [0] * size
+        self._bounds = [EXACT] * size
+        self._moves = [None] * size
+        self._generations = [0] * size
+        self._filled_slots = array("L")         # every slot with a key, so clear() only touches those
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        """
+        This returns the number of filled slots
+        :return:
+        """
+
+        return len(self._filled_slots)
+
+    def get_size(self):
+        """
+        This returns the number of slots in the table
+        :return:
+        """
+
+        return self._size
+
+    def new_search(self):
+        """
+        This marks the start of a new search. With the 'depth' policy, entries stored before this call can be
+        replaced by any new store, so deep results from old searches don't fill the table forever.
+        :return:
+        """
+
+        self._generation += 1
+
+    def store(self, key, depth, value, bound=EXACT, best_move=None):
+        """
+        This stores a search result for the position with Zobrist hash 'key', if the replacement policy allows it.
+        Returns True if it was stored.
+        :param key: Zobrist hash of the position
+        :param depth: depth the position was searched to
+        :param value: score of the position
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param best_move: best (moved_from, moved_to) found, or None
+        :return:
+        """
+
+        slot = key & self._mask
+        stored_key = self._keys[slot]
+
+        if stored_key is None:
+            self._filled_slots.append(slot)
+        elif (self._replacement == REPLACE_DEPTH_PREFERRED and stored_key != key and
+              depth < self._depths[slot] and self._generations[slot] == self._generation):
+            return False
+
+        if stored_key == key and best_move is None:      # keep the old best move rather than losing it
+            best_move = self._moves[slot]
+
+        self._keys[slot] = key
+        self._depths[slot] = depth
+        self._values[slot] = value
+        self._bounds[slot] = bound
+        self._moves[slot] = best_move
+        self._generations[slot] = self._generation
+        return True
+
+    def probe(self, key):
+        """
+        This looks up the position with Zobrist hash 'key'. Returns (depth, value, bound, best_move) or None if the
+        position isn't in the table.
+        :param key:
+        :return:
+        """
+
+        slot = key & self._mask
+        if self._keys[slot] != key:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        return self._depths[slot], self._values[slot], self._bounds[slot], self._moves[slot]
+
+    def clear(self):
+        """
+        This empties the table and resets the statistics. Only the filled slots are reset, in place: a slot's other
+        fields are never read while its key is None, so a table that is cleared before every game costs no more to
+        clear than the entries that game stored.
+        :return:
+        """
+
+        keys = self._keys
+        moves = self._moves
+        for slot in self._filled_slots:
+            keys[slot] = None
+            moves[slot] = None
+        del self._filled_slots[:]
+        self._hits = 0
+        self._misses = 0
+
+    def get_stats(self):
+        """
+        This returns a dictionary of table statistics: size, filled slots, hits and misses
+        :return:
+        """
+
+        return {"size": self._size, "filled": len(self._filled_slots), "hits": self._hits, "misses": self._misses}
+
+
+class SharedTranspositionTable:
+    """
+    This class is a TranspositionTable (same store / probe / new_search interface, always with the 'depth'
+    replacement policy) kept in shared memory, for the worker processes of a parallel search. Workers read and write
+    it without locks: each slot stores its key XORed with its data, so a slot torn by two processes writing at once
+    no longer matches its key and is simply a miss. The process that creates the table owns the shared memory block
+    and removes it on close(); the workers open it with attach(). It can be used as a context manager.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, name=None, size=None):
+        """
+        This creates an empty table of the largest power of two slots that fits in max_bytes, or with 'name' and
+        'size', opens the table another process created (see attach)
+        :param max_bytes: memory limit for the table, in bytes
+        :param name: name of an existing shared memory block
+        :param size: number of slots in the existing block
+        """
+
+        if name is None:
+            size = 1
+            while size * 2 * SHARED_BYTES_PER_ENTRY <= max_bytes:
+                size *= 2
+            self._memory = shared_memory.SharedMemory(create=True, size=8 + size * SHARED_BYTES_PER_ENTRY)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self._owner = name is None
+        self._size = size
+        self._mask = size - 1
+        self._words = self._memory.buf.cast("Q")
+        self._hits = 0
+        self._misses = 0
+
+    @classmethod
+    def attach(cls, name, size):
+        """
+        This opens, in another process, the table created under 'name' with 'size' slots (see get_name, get_size)
+        :param name:
+        :param size:
+        :return:
+        """
+
+        return cls(name=name, size=size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """
+        This returns the number of filled slots, by looking at every slot
+        :return:
+        """
+
+        words = self._words
+        return sum(1 for slot in range(self._size) if words[2 + 2 * slot])
+
+    def get_name(self):
+        """
+        This returns the name of the shared memory block, for attach
+        :return:
+        """
+
+        return self._memory.name
+
+    def get_size(self):
+        """
+        This returns the number of slots in the table
+        :return:
+        """
+
+        return self._size
+
+    def close(self):
+        """
+        This stops using the shared memory block, and removes it if this process created it
+        :return:
+        """
+
+        self._words.release()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+    def new_search(self):
+        """
+        This marks the start of a new search, see TranspositionTable.new_search. Only the creating process moves the
+        generation on, so every worker of one parallel search stores with the same generation.
+        :return:
+        """
+
+        if self._owner:
+            self._words[0] = (self._words[0] + 1) & 0xFF
+
+    def store(self, key, depth, value, bound=EXACT, best_move=None):
+        """
+        This stores a search result, see TranspositionTable.store
+        :param key: Zobrist hash of the position
+        :param depth: depth the position was searched to
+        :param value: score of the position
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param best_move: best (moved_from, moved_to) found, or None
+        :return:
+        """
+
+        words = self._words
+        index = 1 + 2 * (key & self._mask)
+        generation = words[0]
+        stored_data = words[index + 1]
+        stored_key = words[index] ^ stored_data
+
+        if stored_data and stored_key != key and depth < (stored_data >> 32) & 0xFF and stored_data >> 56 == generation:
+            return False
+
+        if best_move is None:
+            if stored_data and stored_key == key:             # keep the old best move rather than losing it
+                move_bits = stored_data & (0x3FFF << 42)
+            else:
+                move_bits = NO_SQUARE << 42 | NO_SQUARE << 49
+        else:
+            move_bits = best_move[0] << 42 | best_move[1] << 49
+
+        data = (value + VALUE_OFFSET) | min(depth, 255) << 32 | bound << 40 | move_bits | generation << 56
+        words[index] = key ^ data
+        words[index + 1] = data
+        return True
+
+    def probe(self, key):
+        """
+        This looks up a position, see TranspositionTable.probe. Returns (depth, value, bound, best_move) or None.
+        :param key:
+        :return:
+        """
+
+        words = self._words
+        index = 1 + 2 * (key & self._mask)
+        data = words[index + 1]
+        if not data or words[index] ^ data != key:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        from_square = (data >> 42) & 0x7F
+        best_move = None if from_square == NO_SQUARE else (from_square, (data >> 49) & 0x7F)
+        return (data >> 32) & 0xFF, (data & 0xFFFFFFFF) - VALUE_OFFSET, (data >> 40) & 0x3, best_move
+
+    def clear(self):
+        """
+        This empties the table and resets this process's statistics
+        :return:
+        """
+
+        memory = self._memory.buf
+        memory[8:] = bytes(len(memory) - 8)
+        self._hits = 0
+        self._misses = 0
+
+    def get_stats(self):
+        """
+        This returns a dictionary of table statistics: size, and the hits and misses of this process. Counting the
+        filled slots means reading the whole table, so they are only counted by len().
+        :return:
+        """
+
+        return {"size": self._size, "hits": self._hits, "misses": self._misses}
@@ -0,0 +1,46 @@
+# Description: Checks AlphaBetaPlayer win scores: a win is scored by its distance from the root, whether it is found
+#              by the search or read back from a transposition table filled by an earlier search.
+#              Run 'python -m pytest test_alpha_beta.py'.
+
+import pytest
+
+from AlphaBetaPlayer import AlphaBetaPlayer, WIN_SCORE
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from HasamiShogiGame import HasamiShogiGame, SQUARE_INDEX
+
+
+def endgame(game_class):
+    """
+    This returns a game where red has two pieces left, e5 and a9, and black, to move, can capture e5 with g6 --> e6
+    :param game_class:
+    :return:
+    """
+
+    board = ["."] * 81
+    for square in ("e5", "a9"):
+        board[SQUARE_INDEX[square]] = "R"
+    for square in ("e4", "g6", "i1"):
+        board[SQUARE_INDEX[square]] = "B"
+    game = game_class()
+    game.set_position("".join(board), "BLACK")
+    return game
+
+
+@pytest.mark.parametrize("game_class", (HasamiShogiGame, BitboardHasamiShogiGame))
+def test_a_win_is_scored_by_its_distance_from_the_root(game_class):
+    game = endgame(game_class)
+    player = AlphaBetaPlayer()
+    assert player.choose_move(game, max_depth=8) == (SQUARE_INDEX["g6"], SQUARE_INDEX["e6"])
+    assert player.get_search_info()["score"] == WIN_SCORE - 1
+    assert player.get_search_info()["depth"] == 1                  # a proven win ends the deepening
+
+
+@pytest.mark.parametrize("game_class", (HasamiShogiGame, BitboardHasamiShogiGame))
+@pytest.mark.parametrize("ply", (1, 4, 7))
+def test_table_entries_keep_the_win_distance_at_other_plies(game_class, ply):
+    # the root search stored the position as a win in one; reached again 'ply' plies down the win is ply + 1 away
+    game = endgame(game_class)
+    player = AlphaBetaPlayer(time_limit=60.0)
+    player.choose_move(game, max_depth=8)
+    assert player.negamax(game, 1, -WIN_SCORE - 1, WIN_SCORE + 1, ply) == WIN_SCORE - ply - 1
+    assert player.negamax(game, 2, -WIN_SCORE - 1, WIN_SCORE + 1, ply) == WIN_SCORE - ply - 1
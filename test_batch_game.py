@@ -0,0 +1,58 @@
+# Description: Checks that BatchHasamiShogiGame plays every game of a batch exactly like HasamiShogiGame, legal and
+#              illegal moves alike. Skipped when NumPy isn't installed. Run 'python -m pytest test_batch_game.py'.
+
+import random
+
+import pytest
+
+from HasamiShogiGame import HasamiShogiGame
+
+numpy = pytest.importorskip("numpy")
+BatchHasamiShogiGame = pytest.importorskip("BatchHasamiShogiGame").BatchHasamiShogiGame
+
+
+def assert_same_games(batch, games):
+    for index, game in enumerate(games):
+        assert batch.get_board(index) == game.get_board()
+        assert batch.get_game_state(index) == game.get_game_state()
+        assert batch.get_active_player(index) == game.get_active_player()
+        assert batch.get_num_captured_pieces(index, "RED") == game.get_num_captured_pieces("RED")
+        assert batch.get_num_captured_pieces(index, "BLACK") == game.get_num_captured_pieces("BLACK")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_matches_scalar_games(seed):
+    rng = random.Random(seed)
+    size = 32
+    batch = BatchHasamiShogiGame(size)
+    games = [HasamiShogiGame() for _ in range(size)]
+    for step in range(200):
+        from_squares = []
+        to_squares = []
+        for game in games:
+            legal_moves = game.generate_legal_moves()
+            if legal_moves and rng.random() < 0.8:
+                capturing_moves = [move for move in legal_moves if game.count_move_captures(*move)]
+                moved_from, moved_to = rng.choice(capturing_moves if capturing_moves and rng.random() < 0.7
+                                                  else legal_moves)
+            else:
+                moved_from, moved_to = rng.randrange(-1, 82), rng.randrange(-1, 82)
+            from_squares.append(moved_from)
+            to_squares.append(moved_to)
+
+        made = batch.make_moves(numpy.array(from_squares), numpy.array(to_squares))
+        for index, game in enumerate(games):
+            moved_from, moved_to = from_squares[index], to_squares[index]
+            expected = 0 <= moved_from < 81 and 0 <= moved_to < 81 and game.make_move_idx(moved_from, moved_to)
+            assert bool(made[index]) == expected
+        assert_same_games(batch, games)
+
+
+def test_set_game_and_reset():
+    batch = BatchHasamiShogiGame(3)
+    game = HasamiShogiGame()
+    game.set_position("R.......R" + "B.......B" + "." * 63, "RED")
+    batch.set_game(1, game)
+    assert_same_games(batch, [HasamiShogiGame(), game, HasamiShogiGame()])
+    batch.reset(numpy.array([1]))
+    assert_same_games(batch, [HasamiShogiGame()] * 3)
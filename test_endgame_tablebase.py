@@ -0,0 +1,162 @@
+# Description: Checks EndgameTablebase: the position index round trip and symmetry classes, and a table built once for
+#              the module, whose results and distances are checked one ply deep against the game engine and whose
+#              best moves are played out to a win in the stated number of plies. Building the table takes about 18
+#              seconds. Run 'python -m pytest test_endgame_tablebase.py'.
+
+import random
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from EndgameTablebase import (EndgameTablebase, generate_tablebase, pair_rank, position_index, canonical_index,
+                              index_position, PAIR_COUNT, SYMMETRIES, TABLE_SIZE, MAGIC, TABLE_HEADER)
+from HasamiShogiGame import HasamiShogiGame, SQUARE_INDEX
+
+
+def position_game(mover, opponent, game_class=BitboardHasamiShogiGame):
+    """
+    This returns a game with black, to move, on the 'mover' squares and red on the 'opponent' squares
+    :param mover:
+    :param opponent:
+    :param game_class:
+    :return:
+    """
+
+    board = ["."] * 81
+    for square in mover:
+        board[square] = "B"
+    for square in opponent:
+        board[square] = "R"
+    game = game_class()
+    game.set_position("".join(board), "BLACK")
+    return game
+
+
+def random_position(rng):
+    squares = rng.sample(range(81), 4)
+    return tuple(squares[:2]), tuple(squares[2:])
+
+
+@pytest.fixture(scope="module")
+def tablebase(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tablebase") / "endgame.hstb"
+    stats = generate_tablebase(path)
+    with EndgameTablebase(path) as table:
+        yield table, stats, path
+
+
+def test_pair_rank_numbers_every_pair_once():
+    ranks = {pair_rank(first_square, second_square) for second_square in range(81) for first_square in
+             range(second_square)}
+    assert ranks == set(range(PAIR_COUNT))
+    assert pair_rank(10, 3) == pair_rank(3, 10)
+
+
+def test_position_index_round_trip():
+    rng = random.Random(0)
+    for _ in range(2000):
+        mover, opponent = random_position(rng)
+        index = position_index(mover, opponent)
+        assert 0 <= index < TABLE_SIZE
+        stored_mover, stored_opponent = index_position(index)
+        assert position_index(stored_mover, stored_opponent) == index
+        assert canonical_index(stored_mover, stored_opponent) == index
+        assert canonical_index(mover, opponent) in (None, index)
+
+
+def test_symmetric_positions_share_an_index():
+    rng = random.Random(1)
+    assert len(SYMMETRIES) == 8
+    for _ in range(500):
+        mover, opponent = random_position(rng)
+        index = position_index(mover, opponent)
+        for mapping in SYMMETRIES:
+            assert position_index((mapping[mover[1]], mapping[mover[0]]),
+                                  (mapping[opponent[0]], mapping[opponent[1]])) == index
+
+
+def test_generated_counts(tablebase):
+    table, stats, path = tablebase
+    assert stats["positions"] == stats["wins"] + stats["losses"] + stats["draws"]
+    assert stats["wins"] > stats["losses"] > 0
+    assert stats["longest"] % 2 == 1                   # the longest result is a win
+    assert path.stat().st_size == len(MAGIC) + TABLE_HEADER.size + TABLE_SIZE
+
+
+def stored_positions(path, rng, count):
+    """
+    This returns up to 'count' randomly picked (mover, opponent, plies) entries of each kind (wins, losses, draws) of
+    the table file, read in their stored form
+    :param path:
+    :param rng:
+    :param count:
+    :return:
+    """
+
+    values = path.read_bytes()[len(MAGIC) + TABLE_HEADER.size:]
+    kinds = {"WIN": [], "LOSS": [], "DRAW": []}
+    for index, plies in enumerate(values):
+        kinds["DRAW" if plies == 0 else "WIN" if plies % 2 else "LOSS"].append(index)
+
+    entries = []
+    for indexes in kinds.values():
+        picked = 0
+        while indexes and picked < count:
+            index = indexes.pop(rng.randrange(len(indexes)))
+            mover, opponent = index_position(index)
+            if len(set(mover + opponent)) == 4 and canonical_index(mover, opponent) == index:
+                entries.append((mover, opponent, values[index]))
+                picked += 1
+    return entries
+
+
+def test_win_in_one(tablebase):
+    table = tablebase[0]
+    mover = (SQUARE_INDEX["e4"], SQUARE_INDEX["g6"])
+    opponent = (SQUARE_INDEX["e5"], SQUARE_INDEX["a9"])
+    assert table.probe_position(mover, opponent) == ("WIN", 1)          # g6 --> e6 takes e5
+    assert table.probe(position_game(mover, opponent)) == ("WIN", 1)
+    assert table.best_move(position_game(mover, opponent)) == (SQUARE_INDEX["g6"], SQUARE_INDEX["e6"])
+
+
+@pytest.mark.parametrize("game_class", (HasamiShogiGame, BitboardHasamiShogiGame))
+def test_results_agree_with_the_moves_one_ply_on(tablebase, game_class):
+    # a win in n has a move to a loss in n - 1 (n = 1: a capture) and none quicker, a loss in n has only moves to
+    # wins, the slowest in n - 1, and a draw has no capture, no move to a loss and a move to a draw
+    table, stats, path = tablebase
+    for mover, opponent, plies in stored_positions(path, random.Random(2), 150):
+        game = position_game(mover, opponent, game_class)
+        assert table.probe(game) == (("DRAW", 0) if plies == 0 else ("WIN" if plies % 2 else "LOSS", plies))
+        replies = []
+        for move in game.generate_legal_moves():
+            game.make_move_idx(*move)
+            replies.append(("CAPTURE", 0) if game.get_game_state() != "UNFINISHED" else table.probe(game))
+            game.unmake_move()
+        if plies == 1:
+            assert ("CAPTURE", 0) in replies
+            continue
+        assert ("CAPTURE", 0) not in replies
+        losses = [reply_plies for result, reply_plies in replies if result == "LOSS"]
+        wins = [reply_plies for result, reply_plies in replies if result == "WIN"]
+        if plies % 2:
+            assert min(losses) == plies - 1
+        elif plies:
+            assert len(wins) == len(replies) and max(wins) == plies - 1
+        else:
+            assert not losses and len(wins) < len(replies)
+
+
+def test_best_moves_win_in_the_stated_plies(tablebase):
+    table, stats, path = tablebase
+    wins = [entry for entry in stored_positions(path, random.Random(3), 40) if entry[2] % 2]
+    values = path.read_bytes()[len(MAGIC) + TABLE_HEADER.size:]
+    longest = index_position(values.index(stats["longest"]))
+    wins.append(longest + (stats["longest"],))
+    for mover, opponent, plies in wins:
+        game = position_game(mover, opponent)
+        assert table.probe(game) == ("WIN", plies)
+        played = 0
+        while game.get_game_state() == "UNFINISHED":
+            assert game.make_move_idx(*table.best_move(game))
+            played += 1
+        assert (played, game.get_game_state()) == (plies, "BLACK_WON")
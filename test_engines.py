@@ -0,0 +1,255 @@
+# Description: Checks that both game engines, HasamiShogiGame and BitboardHasamiShogiGame, answer every public method
+#              of HasamiShogiGame and agree with each other. Run 'python -m pytest test_engines.py'.
+
+import inspect
+import pickle
+import random
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from HasamiShogiGame import HasamiShogiGame, SQUARE_INDEX
+
+ENGINES = (HasamiShogiGame, BitboardHasamiShogiGame)
+INTERACTIVE_METHODS = {"play_game"}             # reads moves from input()
+FRESH_GAME_METHODS = {"copy_initial_position"}  # only meant for a game still on the starting position
+
+# method name --> arguments to call it with on a game after 'i1' --> 'h1'
+METHOD_ARGUMENTS = {
+    "check_for_captures": ("h1",),
+    "check_for_captures_at": ((7, 0),),
+    "check_valid_input": ("a2", "c2"),
+    "check_valid_move": ("a2", "c2"),
+    "check_valid_move_at": ((0, 1), (2, 1)),
+    "convert_board_notation": ("b3",),
+    "corner_capture_check": ("h1",),
+    "corner_capture_check_at": ((7, 0),),
+    "count_move_captures": (1, 19),
+    "enable_profiling": (),
+    "forget_position": (0,),
+    "game_board_rows": None,                    # filled in with the game's own game_board_columns
+    "get_num_captured_pieces": ("RED",),
+    "get_piece_squares": ("BLACK",),
+    "get_square_occupant": ("h1",),
+    "make_move": ("a2", "c2"),
+    "make_move_idx": (1, 19),
+    "profiled_make_move": ("a2", "c2"),
+    "profiled_make_move_idx": (1, 19),
+    "remove_piece": (0, 8),
+    "restore": None,                            # filled in with the game's own snapshot
+    "set_position": ("R" * 9 + "." * 63 + "B" * 9, "RED"),
+    "update_game_board": ("a2", "c2"),
+    "update_game_board_at": ((0, 1), (2, 1)),
+    "update_line_codes": (0, 0, 0),
+}
+
+
+def public_methods():
+    return sorted(name for name, method in inspect.getmembers(HasamiShogiGame, inspect.isfunction)
+                  if not name.startswith("_") and name not in INTERACTIVE_METHODS)
+
+
+def opened_game(game_class):
+    game = game_class()
+    game.make_move("i1", "h1")
+    return game
+
+
+@pytest.mark.parametrize("method_name", public_methods())
+def test_public_method_runs_on_both_engines(method_name):
+    results = []
+    for game_class in ENGINES:
+        game = game_class() if method_name in FRESH_GAME_METHODS else opened_game(game_class)
+        arguments = METHOD_ARGUMENTS.get(method_name, ())
+        if method_name == "restore":
+            arguments = (game.snapshot(),)
+        if method_name == "profiled_make_move" or method_name == "profiled_make_move_idx":
+            game.enable_profiling()
+        if method_name == "game_board_rows":
+            arguments = (game.game_board_columns(),)
+        result = getattr(game, method_name)(*arguments)
+        results.append((result, game.get_board(), game.get_active_player(), game.get_zobrist_hash(),
+                        game.get_num_captured_pieces("RED"), game.get_num_captured_pieces("BLACK")))
+
+    if method_name not in ("clone", "snapshot", "enable_profiling", "get_profiler", "get_unprofiled_class",
+                           "get_occupancy_counts", "game_board_columns", "print_board"):
+        assert results[0] == results[1]
+    else:
+        assert results[0][1:] == results[1][1:]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_helper_methods_match_make_move(seed):
+    # the make_move phases called one by one give the same position as make_move on both engines
+    rng = random.Random(seed)
+    games = [game_class() for game_class in ENGINES]
+    stepped = [game_class() for game_class in ENGINES]
+    for ply in range(120):
+        legal_moves = games[0].generate_legal_moves()
+        if not legal_moves:
+            break
+        assert legal_moves == games[1].generate_legal_moves()
+        from_square, to_square = rng.choice(legal_moves)
+        for game in games:
+            assert game.make_move_idx(from_square, to_square)
+        assert games[0].get_last_move_captures() == games[1].get_last_move_captures()
+        for game in stepped:
+            from_tuple, to_tuple = divmod(from_square, 9), divmod(to_square, 9)
+            assert game.check_valid_move_at(from_tuple, to_tuple) == [True]
+            game.update_game_board_at(from_tuple, to_tuple)
+            game.check_for_captures_at(to_tuple)
+            game.corner_capture_check_at(to_tuple)
+            game.update_game_state()
+            game.player_turn()
+        for game, stepped_game in zip(games, stepped):
+            assert stepped_game.get_board() == game.get_board()
+            assert stepped_game.get_zobrist_hash() == game.get_zobrist_hash()
+            assert stepped_game.get_game_state() == game.get_game_state()
+            assert stepped_game.get_num_captured_pieces("RED") == game.get_num_captured_pieces("RED")
+        if games[0].get_game_state() != "UNFINISHED":
+            break
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+def test_check_valid_move_reasons(game_class):
+    game = game_class()
+    assert game.check_valid_move("a1", "a1") is False
+    assert game.check_valid_move("a1", "b2") == [False, "not valid direction"]
+    assert game.check_valid_move("a1", "a3") == [False, "occupied space, row"]
+    assert game.check_valid_move("a1", "i1") == [False, "occupied space, column"]
+    assert game.check_valid_move("a1", "h1") == [True]
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+def test_repetition_count_follows_make_and_unmake(game_class):
+    game = game_class()
+    shuffle = [(72, 63), (0, 9), (63, 72), (9, 0)]
+    for ply in range(12):
+        assert game.get_repetition_count() == ply // 4
+        game.make_move_idx(*shuffle[ply % 4])
+    for ply in range(12, 0, -1):
+        assert game.get_repetition_count() == ply // 4
+        clone = game.clone()
+        assert clone.get_repetition_count() == ply // 4
+        game.unmake_move()
+    assert game.get_repetition_count() == 0
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+@pytest.mark.parametrize("from_square, to_square", [(72, 72), (72, -1), (-9, 72), (72, 81), (81, 72), (72, 64)])
+def test_bad_squares_are_turned_down_with_and_without_profiling(game_class, from_square, to_square):
+    game = game_class()
+    assert game.make_move_idx(from_square, to_square) is False
+    game.enable_profiling()
+    assert game.profiled_make_move_idx(from_square, to_square) is False
+    assert game.make_move_idx(from_square, to_square) is False
+    assert game.get_board() == game_class().get_board()
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+def test_clear_history_keeps_the_position(game_class):
+    game = game_class()
+    shuffle = [(72, 63), (0, 9), (63, 72), (9, 0)]
+    for ply in range(8):
+        game.make_move_idx(*shuffle[ply % 4])
+    board, zobrist_hash = game.get_board(), game.get_zobrist_hash()
+    game.clear_history()
+    assert (game.get_board(), game.get_zobrist_hash()) == (board, zobrist_hash)
+    assert game.get_repetition_count() == 0
+    assert game.get_last_move_captures() == ()
+    assert game.unmake_move() is False
+    for ply in range(4):
+        assert game.make_move_idx(*shuffle[ply])
+    assert game.get_repetition_count() == 1
+    assert game.unmake_move()
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+def test_last_move_captures_are_lowest_first(game_class):
+    # black i4 --> e4 closes e1 B, e2 R, e3 R on the left and d4 R, c4 B above, so the runs are found out of order
+    board = ["."] * 81
+    for square, piece in (("e1", "B"), ("e2", "R"), ("e3", "R"), ("d4", "R"), ("c4", "B"), ("i4", "B"), ("a9", "R")):
+        board[SQUARE_INDEX[square]] = piece
+    game = game_class()
+    game.set_position("".join(board), "BLACK")
+    assert game.make_move("i4", "e4")
+    assert game.get_last_move_captures() == (SQUARE_INDEX["d4"], SQUARE_INDEX["e2"], SQUARE_INDEX["e3"])
+
+
+def test_bitboard_game_board_rows_turns_the_columns_given_into_rows():
+    game = opened_game(BitboardHasamiShogiGame)
+    columns = game.game_board_columns()
+    columns[0][0] = "B"
+    rows = game.game_board_rows(columns)
+    assert rows[0][0] == "B" and rows[1:] == game.game_board_rows()[1:]
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+def test_profiled_moves_on_a_finished_game_are_turned_down_in_one_phase(game_class):
+    game = game_class()
+    game.set_position("R" + "." * 71 + "B" * 9, "BLACK")
+    assert game.get_game_state() == "BLACK_WON"
+    profiler = game.enable_profiling()
+    assert game.make_move("i1", "h1") is False
+    assert game.make_move_idx(72, 63) is False
+    stats = profiler.get_stats()
+    assert stats["check_valid_move"]["rejected"] == 2
+    assert "input_validation" not in stats or stats["input_validation"]["rejected"] == 0
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+def test_profiled_games_can_be_pickled(game_class):
+    # process pools pickle the games they are handed, profiled or not
+    game = game_class()
+    game.enable_profiling()
+    game.make_move("i1", "h1")
+    copy = pickle.loads(pickle.dumps(game))
+    assert type(copy) is type(game) and copy.get_unprofiled_class() is game_class
+    assert copy.get_board() == game.get_board() and copy.get_zobrist_hash() == game.get_zobrist_hash()
+    assert copy.make_move("a2", "c2")
+    assert copy.get_profiler().get_stats()["total"]["calls"] == 2
+    copy.disable_profiling()
+    assert type(copy) is game_class
+
+
+def check_piece_squares_and_counts(game):
+    """
+    This asserts that get_piece_squares and get_occupancy_counts agree with a scan of the board string
+    :param game:
+    :return:
+    """
+
+    board = game.get_board()
+    assert game.get_piece_squares("BLACK") == [square for square in range(81) if board[square] == "B"]
+    assert game.get_piece_squares("RED") == [square for square in range(81) if board[square] == "R"]
+    row_counts, column_counts = game.get_occupancy_counts()
+    assert list(row_counts) == [9 - board[row * 9:row * 9 + 9].count(".") for row in range(9)]
+    assert list(column_counts) == [9 - board[column::9].count(".") for column in range(9)]
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+@pytest.mark.parametrize("seed", range(10))
+def test_piece_squares_and_counts_follow_every_ply(game_class, seed):
+    # random moves mixed with take backs, clones and positions set from a board string
+    rng = random.Random(seed)
+    game = game_class()
+    captures = 0
+    for ply in range(400):
+        step = rng.random()
+        if step < 0.15:
+            game.unmake_move()                      # False, and no change, with nothing to take back
+        elif step < 0.2:
+            game = game.clone()
+        elif step < 0.25:
+            board, active_player = game.get_board(), game.get_active_player()
+            game = game_class()
+            game.set_position(board, active_player)
+        else:
+            legal_moves = game.generate_legal_moves()
+            if game.get_game_state() != "UNFINISHED" or not legal_moves:
+                game = game_class()
+            else:
+                game.make_move_idx(*rng.choice(legal_moves))
+                captures += len(game.get_last_move_captures())
+        check_piece_squares_and_counts(game)
+    assert captures > 0
@@ -0,0 +1,131 @@
+# Description: Checks the Evaluator features, read from the line codes, against counts made square by square on the
+#              board. Run 'python -m pytest test_evaluation.py'.
+
+import random
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from Evaluation import Evaluator
+from HasamiShogiGame import HasamiShogiGame
+
+CORNER_NEIGHBOURS = {0: (1, 9), 8: (7, 17), 72: (63, 73), 80: (71, 79)}
+OPPONENT = {"B": "R", "R": "B"}
+LINES = [[row * 9 + column for column in range(9)] for row in range(9)] + \
+        [[row * 9 + column for row in range(9)] for column in range(9)]
+
+
+def board_features(game):
+    """
+    This counts every feature on the board string, black minus red, as the slow reference for get_features
+    :param game:
+    :return:
+    """
+
+    board = game.get_board()
+
+    def mobility(piece):
+        moves = 0
+        for square in range(81):
+            if board[square] != piece:
+                continue
+            for row_step, column_step in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+                row, column = square // 9 + row_step, square % 9 + column_step
+                while 0 <= row < 9 and 0 <= column < 9 and board[row * 9 + column] == ".":
+                    moves += 1
+                    row, column = row + row_step, column + column_step
+        return moves
+
+    def edge(piece):
+        return sum(1 for square in range(81) if board[square] == piece and square not in CORNER_NEIGHBOURS and
+                   (square // 9 in (0, 8) or square % 9 in (0, 8)))
+
+    def corner(piece):
+        return sum(board[square] == piece for square in CORNER_NEIGHBOURS)
+
+    def corner_exposure(piece):
+        return sum(1 for square, neighbours in CORNER_NEIGHBOURS.items() if board[square] == piece and
+                   any(board[neighbour] == OPPONENT[piece] for neighbour in neighbours))
+
+    def threatened(piece):
+        pieces = 0
+        for line in LINES:
+            cells = [board[square] for square in line]
+            start = 0
+            while start < 9:
+                end = start
+                while end < 9 and cells[end] == cells[start]:
+                    end += 1
+                if cells[start] == piece and start > 0 and end < 9 and \
+                        {cells[start - 1], cells[end]} == {OPPONENT[piece], "."}:
+                    pieces += end - start
+                start = end
+        return pieces
+
+    features = {"material": game.get_num_captured_pieces("RED") - game.get_num_captured_pieces("BLACK")}
+    for name, count in (("mobility", mobility), ("edge", edge), ("corner", corner),
+                        ("corner_exposure", corner_exposure), ("threatened", threatened)):
+        features[name] = count("B") - count("R")
+    return features
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_features_match_the_board(seed):
+    evaluator = Evaluator()
+    rng = random.Random(seed)
+    games = [HasamiShogiGame(), BitboardHasamiShogiGame()]
+    while games[0].get_game_state() == "UNFINISHED":
+        features = evaluator.get_features(games[0])
+        assert features == evaluator.get_features(games[1]) == board_features(games[0])
+        assert evaluator(games[0]) == evaluator(games[1])
+        legal_moves = games[0].generate_legal_moves()
+        if not legal_moves:
+            break
+        move = rng.choice(legal_moves)
+        for game in games:
+            game.make_move_idx(*move)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bitboard_line_codes_follow_make_and_unmake(seed):
+    rng = random.Random(seed)
+    games = [HasamiShogiGame(), BitboardHasamiShogiGame()]
+    line_codes = []
+    while games[0].get_game_state() == "UNFINISHED" and len(line_codes) < 150:
+        line_codes.append(tuple(map(tuple, games[0].get_line_codes())))
+        assert tuple(map(tuple, games[1].get_line_codes())) == line_codes[-1]
+        move = rng.choice(games[0].generate_legal_moves())
+        for game in games:
+            game.make_move_idx(*move)
+    while line_codes:
+        games[1].unmake_move()
+        assert tuple(map(tuple, games[1].get_line_codes())) == line_codes.pop()
+
+
+def test_both_engines_keep_their_line_codes():
+    # the evaluator reads the line codes on every call, so neither game may rebuild them from the board when asked;
+    # the evaluate timings of the two engines are printed by Benchmarks.py
+    rng = random.Random(0)
+    games = [HasamiShogiGame(), BitboardHasamiShogiGame()]
+    for ply in range(30):
+        move = rng.choice(games[0].generate_legal_moves())
+        for game in games:
+            game.make_move_idx(*move)
+    for game in games:
+        row_codes, column_codes = game.get_line_codes()
+        assert Evaluator().evaluate(game) == Evaluator().evaluate(game)
+        assert game.get_line_codes()[0] is row_codes and game.get_line_codes()[1] is column_codes
+
+
+def test_corner_pieces_are_not_edge_pieces():
+    game = HasamiShogiGame()
+    game.set_position("B.......R" + "." * 63 + ".RRRR....", "BLACK")
+    features = Evaluator().get_features(game)
+    assert features["corner"] == 0                      # one corner each
+    assert features["edge"] == -4                       # red's four bottom edge pieces, no corners
+    assert Evaluator({"corner": 0, "mobility": 0, "material": 0, "threatened": 0}).evaluate(game) == 8
+
+
+def test_unknown_weights_are_rejected():
+    with pytest.raises(ValueError):
+        Evaluator({"centre": 1})
@@ -0,0 +1,88 @@
+# Description: Checks GameArchive replay and its NumPy export against games written with GameRecordWriter, and that
+#              an empty file, a corrupt result byte or an off-board square is refused. The to_numpy test is skipped
+#              when NumPy isn't installed. Run 'python -m pytest test_game_archive.py'.
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from GameArchive import GameArchive, PIECE_CODES
+from GameRecord import GameRecordWriter, GameRecordError, MAGIC, RESULTS, read_game_records
+from HasamiShogiGame import HasamiShogiGame
+from SelfPlayRunner import SelfPlayRunner
+
+GAME_COUNT = 40
+
+
+@pytest.fixture(scope="module")
+def archive_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("archive") / "self_play.hsgr"
+    with GameRecordWriter(path) as writer:
+        for record in SelfPlayRunner(workers=1, red_policy="alphabeta", alphabeta_depth=1, seed=10).run(GAME_COUNT):
+            writer.write_record(record)
+    return path
+
+
+@pytest.mark.parametrize("game_class", (HasamiShogiGame, BitboardHasamiShogiGame))
+def test_iter_positions_replays_the_headers(archive_path, game_class):
+    with GameArchive(archive_path, game_class) as archive:
+        assert len(archive) == GAME_COUNT
+        last_positions = {}
+        for game_number, ply, game in archive.iter_positions():
+            last_positions[game_number] = (ply, game.get_game_state(), game.get_num_captured_pieces("RED"),
+                                           game.get_num_captured_pieces("BLACK"))
+        for game_number in range(GAME_COUNT):
+            result, red_captured, black_captured, move_count = archive.get_game_header(game_number)
+            assert last_positions[game_number] == (move_count, result, red_captured, black_captured)
+
+
+@pytest.mark.parametrize("game_class", (HasamiShogiGame, BitboardHasamiShogiGame))
+def test_to_numpy_matches_iter_positions(archive_path, game_class):
+    numpy = pytest.importorskip("numpy")
+    with GameArchive(archive_path, game_class) as archive:
+        boards = []
+        red_to_move = []
+        for game_number, ply, game in archive.iter_positions():
+            boards.append([PIECE_CODES[piece] for piece in game.get_board()])
+            red_to_move.append(game.get_active_player() == "RED")
+
+        positions, red_to_move_array = archive.to_numpy()
+        assert positions.shape == (len(boards), 81) and positions.dtype == numpy.int8
+        assert red_to_move_array.shape == (len(boards),) and red_to_move_array.dtype == numpy.bool_
+        assert numpy.array_equal(positions, numpy.array(boards, dtype=numpy.int8))
+        assert numpy.array_equal(red_to_move_array, numpy.array(red_to_move))
+
+        first = sum(archive.get_game_header(game_number)[3] for game_number in range(10))
+        part_positions, part_red_to_move = archive.to_numpy(10, 20)
+        assert numpy.array_equal(part_positions, positions[first:first + len(part_positions)])
+        assert numpy.array_equal(part_red_to_move, red_to_move_array[first:first + len(part_positions)])
+
+
+def test_corrupt_result_byte_is_a_record_error(archive_path, tmp_path):
+    data = bytearray(archive_path.read_bytes())
+    data[len(MAGIC)] = len(RESULTS)                     # result code of the first game, one past the last result
+    corrupt_path = tmp_path / "corrupt.hsgr"
+    corrupt_path.write_bytes(bytes(data))
+    with pytest.raises(GameRecordError):
+        list(read_game_records(corrupt_path))
+    with pytest.raises(GameRecordError):
+        GameArchive(corrupt_path)
+
+
+@pytest.mark.parametrize("move", ((81, 0), (0, 81), (-1, 9), (72, 256)))
+def test_off_board_square_is_refused_before_writing(tmp_path, move):
+    path = tmp_path / "off_board.hsgr"
+    with GameRecordWriter(path) as writer:
+        writer.write_game([(72, 63)], "UNFINISHED", 0, 0)
+        with pytest.raises(ValueError):
+            writer.write_game([(0, 9), move], "UNFINISHED", 0, 0)
+    assert [moves for result, red_captured, black_captured, moves in read_game_records(path)] == [[(72, 63)]]
+
+
+def test_empty_or_foreign_file_is_a_record_error(tmp_path):
+    for name, data in (("empty.hsgr", b""), ("foreign.hsgr", b"HSOB\x01" + bytes(20))):
+        path = tmp_path / name
+        path.write_bytes(data)
+        with pytest.raises(GameRecordError):
+            GameArchive(path)
+        with pytest.raises(GameRecordError):
+            list(read_game_records(path))
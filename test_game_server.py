@@ -0,0 +1,86 @@
+# Description: Checks GameServer through GameClient on a local server bound to a free port: games played with NEW and
+#              MOVE, the ERR replies, idle game eviction and the refusal of over-long lines.
+#              Run 'python -m pytest test_game_server.py'.
+
+import asyncio
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from GameServer import GameServer, GameRegistry, GameClient, MAX_LINE_BYTES
+
+
+def run_with_server(session, registry=None, eviction_interval=30.0):
+    """
+    This starts a server on a free local port, runs the coroutine function 'session' with a connected GameClient and
+    the server, then closes both, and returns what 'session' returned
+    :param session:
+    :param registry:
+    :param eviction_interval:
+    :return:
+    """
+
+    async def main():
+        server = GameServer(registry, eviction_interval)
+        host, port = await server.start(port=0)
+        client = await GameClient.connect(host, port)
+        try:
+            return await session(client, server)
+        finally:
+            await client.close()
+            await server.stop()
+
+    return asyncio.run(asyncio.wait_for(main(), 30))
+
+
+def test_new_and_move_follow_the_game():
+    async def session(client, server):
+        game_id = (await client.request("NEW")).split()[1]
+        game = BitboardHasamiShogiGame()
+        for moved_from, moved_to in (("i1", "h1"), ("a2", "c2"), ("h1", "h2")):
+            assert game.make_move(moved_from, moved_to)
+            assert await client.request("MOVE %s %s %s" % (game_id, moved_from, moved_to)) == \
+                "OK %s %s" % (game.get_game_state(), game.get_active_player())
+        assert await client.request("BOARD " + game_id) == \
+            "OK %s %s %s" % (game.get_board(), game.get_game_state(), game.get_active_player())
+        assert len((await client.request("MOVES " + game_id)).split()) == 1 + game.count_legal_moves()
+        assert await client.request("CLOSE " + game_id) == "OK"
+        assert await client.request("BOARD " + game_id) == "ERR unknown game"
+        assert await client.request("PING") == "OK PONG"
+        assert await client.request("QUIT") == "OK BYE"
+
+    run_with_server(session)
+
+
+def test_bad_commands_get_err_replies():
+    async def session(client, server):
+        game_id = (await client.request("NEW")).split()[1]
+        assert await client.request("MOVE %s a1 a2" % game_id) == "ERR illegal move"      # red piece, black to move
+        assert await client.request("MOVE %s i1 j1" % game_id) == "ERR illegal move"
+        assert await client.request("MOVE %s i1" % game_id) == "ERR wrong number of arguments"
+        assert await client.request("MOVE 999 i1 h1") == "ERR unknown game"
+        assert await client.request("BOARD first") == "ERR unknown game"
+        assert await client.request("JUMP %s" % game_id) == "ERR unknown command"
+        assert await client.request("") == "ERR empty command"
+        assert await client.request("NEW") == "ERR server full"
+        assert await client.request("PING") == "OK PONG"              # the connection is still open
+
+    run_with_server(session, GameRegistry(max_games=1))
+
+
+def test_idle_games_are_evicted():
+    async def session(client, server):
+        game_id = (await client.request("NEW")).split()[1]
+        assert await client.request("MOVE %s i1 h1" % game_id) == "OK UNFINISHED RED"
+        await asyncio.sleep(0.3)
+        assert await client.request("MOVE %s a2 c2" % game_id) == "ERR unknown game"
+        return server.get_registry().get_stats()
+
+    assert run_with_server(session, GameRegistry(idle_seconds=0.05), eviction_interval=0.02) == \
+        {"live_games": 0, "evicted_games": 1}
+
+
+def test_too_long_line_closes_the_connection():
+    async def session(client, server):
+        assert await client.request("PING " + "x" * MAX_LINE_BYTES) == "ERR line too long"
+        assert await client.request("PING") == ""                     # the server has hung up
+
+    run_with_server(session)
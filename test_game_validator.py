@@ -0,0 +1,80 @@
+# Description: Checks GameValidator against games replayed one move at a time with HasamiShogiGame.make_move, and the
+#              reasons it gives for illegal moves. Run 'python -m pytest test_game_validator.py'.
+
+import random
+
+import pytest
+
+from GameValidator import validate_game, validate_games
+from HasamiShogiGame import HasamiShogiGame, SQUARE_NAMES
+
+
+def random_games(count, seed):
+    """
+    This returns 'count' random games as move lists, about half of them with one move replaced by a random pair of
+    squares, some written in algebraic notation
+    :param count:
+    :param seed:
+    :return:
+    """
+
+    rng = random.Random(seed)
+    games = []
+    for game_number in range(count):
+        game = HasamiShogiGame()
+        moves = []
+        for ply in range(rng.randrange(1, 80)):
+            legal_moves = game.generate_legal_moves()
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            game.make_move_idx(*move)
+            moves.append(move)
+        if rng.random() < 0.5:
+            moves[rng.randrange(len(moves))] = (rng.randrange(81), rng.randrange(81))
+        if rng.random() < 0.3:
+            moves = [(SQUARE_NAMES[moved_from], SQUARE_NAMES[moved_to]) for moved_from, moved_to in moves]
+        games.append(moves)
+    return games
+
+
+def first_illegal_move(moves):
+    game = HasamiShogiGame()
+    for index, (moved_from, moved_to) in enumerate(moves):
+        if not isinstance(moved_from, str):
+            moved_from, moved_to = SQUARE_NAMES[moved_from], SQUARE_NAMES[moved_to]
+        if not game.make_move(moved_from, moved_to):
+            return index
+    return None
+
+
+def test_validate_games_matches_make_move():
+    games = random_games(120, 2)
+    results = list(validate_games(games))
+    assert [result["game_number"] for result in results] == list(range(len(games)))
+    for moves, result in zip(games, results):
+        assert result["illegal_move_index"] == first_illegal_move(moves)
+        assert result["valid"] == (result["illegal_move_index"] is None)
+    assert list(validate_games(games, game_class=HasamiShogiGame)) == results
+    assert list(validate_games(games, workers=2, chunksize=7)) == results
+
+
+@pytest.mark.parametrize("moves, index, reason", [
+    ([("i1", "h1"), ("a1", "b1")], None, None),
+    ([("i1", "h1"), ("a1", "a1")], 1, "same square"),
+    ([("a1", "b1")], 0, "not the active player's piece"),
+    ([("e5", "e6")], 0, "no piece to move"),
+    ([("i1", "h2")], 0, "not valid direction"),
+    ([("i1", "a1")], 0, "occupied space, column"),
+    ([("i1", "h1"), ("a1", "b1"), ("i3", "i1")], 2, "occupied space, row"),
+    ([("i1", "h1"), ("a1", "z9")], 1, "invalid square"),
+    ([("i1", "h1"), (72, 81)], 1, "invalid square"),
+    ([(72, 63), (True, 10)], 1, "invalid square"),
+    ([(72, 63), (1, False)], 1, "invalid square"),
+    ([("i1", "h1"), (0,)], 1, "not a (moved_from, moved_to) pair"),
+])
+def test_illegal_move_reasons(moves, index, reason):
+    result = validate_game(moves)
+    assert result["illegal_move_index"] == index
+    assert result["reason"] == reason
+    assert result["moves_played"] == (len(moves) if index is None else index)
@@ -0,0 +1,58 @@
+# Description: Checks the fast playouts of MonteCarloPlayer against HasamiShogiGame move by move, and that the player
+#              leaves the game it searches unchanged. Run 'python -m pytest test_monte_carlo.py'.
+
+import random
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from HasamiShogiGame import HasamiShogiGame, TEXT_TO_BOARD, BLACK_PIECE, RED_PIECE
+from MonteCarloPlayer import MonteCarloPlayer, run_playout
+
+
+@pytest.mark.parametrize("capture_tries", (0, 4))
+@pytest.mark.parametrize("seed", range(10))
+def test_playout_moves_are_legal(seed, capture_tries):
+    rng = random.Random(seed)
+    game = HasamiShogiGame()
+    board = bytearray(game.get_board().encode("ascii").translate(TEXT_TO_BOARD))
+    pieces = [None, [square for square in range(81) if board[square] == BLACK_PIECE],
+              [square for square in range(81) if board[square] == RED_PIECE]]
+    positions = [0] * 81
+    for squares in pieces[1:]:
+        for index, square in enumerate(squares):
+            positions[square] = index
+    captured = [None, 0, 0]
+    piece = BLACK_PIECE
+
+    for ply in range(300):
+        before = bytes(board)
+        run_playout(board, pieces, positions, captured, piece, 1, rng.random, capture_tries)
+        moved_from = [square for square in range(81) if before[square] == piece and board[square] != piece]
+        moved_to = [square for square in range(81) if before[square] == 0 and board[square] == piece]
+        if not moved_to:
+            break
+        assert len(moved_from) == 1 and len(moved_to) == 1
+        assert game.make_move_idx(moved_from[0], moved_to[0])
+        assert bytes(board) == game.get_board().encode("ascii").translate(TEXT_TO_BOARD)
+        assert captured[BLACK_PIECE] == game.get_num_captured_pieces("BLACK")
+        assert captured[RED_PIECE] == game.get_num_captured_pieces("RED")
+        for own_piece in (BLACK_PIECE, RED_PIECE):
+            assert sorted(pieces[own_piece]) == [square for square in range(81) if board[square] == own_piece]
+            assert all(positions[square] == index for index, square in enumerate(pieces[own_piece]))
+        piece = 3 - piece
+        if game.get_game_state() != "UNFINISHED":
+            break
+
+
+@pytest.mark.parametrize("game_class", (HasamiShogiGame, BitboardHasamiShogiGame))
+def test_player_leaves_the_game_unchanged(game_class):
+    player = MonteCarloPlayer(playouts=300, time_limit=None, seed=3, policy="capture")
+    game = game_class()
+    for ply in range(4):
+        board = game.get_board()
+        zobrist_hash = game.get_zobrist_hash()
+        move = player.choose_move(game)
+        assert game.get_board() == board and game.get_zobrist_hash() == zobrist_hash
+        assert move in game.generate_legal_moves()
+        game.make_move_idx(*move)
@@ -0,0 +1,130 @@
+# Description: Checks build_opening_book and OpeningBook against move counts made by replaying the same game records,
+#              the weighted pick of choose_move and the symmetric book. Run 'python -m pytest test_opening_book.py'.
+
+import random
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from GameRecord import GameRecordWriter
+from HasamiShogiGame import HasamiShogiGame
+from OpeningBook import OpeningBook, build_opening_book
+
+MAX_PLY = 6
+
+
+def random_games(count, seed):
+    """
+    This plays 'count' seeded random games of MAX_PLY moves from a few fixed first moves, so positions repeat
+    :param count:
+    :param seed:
+    :return: list of (moves, result)
+    """
+
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        game = HasamiShogiGame()
+        moves = [rng.choice([(72, 63), (73, 64), (76, 67)])]
+        game.make_move_idx(*moves[0])
+        while len(moves) < MAX_PLY:
+            moves.append(rng.choice(game.generate_legal_moves()[:4]))
+            game.make_move_idx(*moves[-1])
+        games.append((moves, rng.choice(["UNFINISHED", "RED_WON", "BLACK_WON"])))
+    return games
+
+
+def write_records(path, games):
+    with GameRecordWriter(path) as writer:
+        for moves, result in games:
+            writer.write_game(moves, result, 0, 0)
+    return path
+
+
+@pytest.fixture(scope="module")
+def random_book(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("book")
+    games = random_games(60, seed=3)
+    book_path = directory / "random.hsob"
+    build_opening_book([write_records(directory / "random.hsgr", games)], book_path, max_ply=MAX_PLY, min_games=1)
+    with OpeningBook(book_path) as book:
+        yield book, games
+
+
+def test_every_position_finds_its_counted_moves(random_book):
+    # each binary search over the sorted entries must land on exactly the moves counted by replaying the games
+    book, games = random_book
+    counted = {}                            # zobrist hash --> {move: [games, wins, losses]}
+    positions = {}
+    for moves, result in games:
+        game = BitboardHasamiShogiGame()
+        for move in moves:
+            mover = game.get_active_player()
+            positions[game.get_zobrist_hash()] = game.clone()
+            stats = counted.setdefault(game.get_zobrist_hash(), {}).setdefault(move, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += result == mover + "_WON"
+            stats[2] += result not in ("UNFINISHED", mover + "_WON")
+            game.make_move_idx(*move)
+
+    assert len(book) == sum(len(position_moves) for position_moves in counted.values())
+    for zobrist_hash, game in positions.items():
+        book_moves = book.get_moves(game)
+        assert {book_move["move"]: [book_move["games"], book_move["wins"], book_move["losses"]]
+                for book_move in book_moves} == counted[zobrist_hash]
+        assert [book_move["games"] for book_move in book_moves] == \
+            sorted((book_move["games"] for book_move in book_moves), reverse=True)
+    game = BitboardHasamiShogiGame()
+    game.make_move_idx(74, 65)
+    assert book.get_moves(game) == []
+
+
+def test_min_games_and_max_ply(tmp_path):
+    games = [([(72, 63), (0, 9), (63, 72)], "BLACK_WON")] * 3 + [([(73, 64), (0, 9)], "RED_WON")]
+    book_path = tmp_path / "small.hsob"
+    assert build_opening_book([write_records(tmp_path / "small.hsgr", games)], book_path, max_ply=2,
+                              min_games=2) == 2
+    with OpeningBook(book_path) as book:
+        game = BitboardHasamiShogiGame()
+        assert book.get_moves(game) == [{"move": (72, 63), "games": 3, "wins": 3, "losses": 0, "score": 1.0}]
+        game.make_move_idx(72, 63)
+        assert book.get_moves(game) == [{"move": (0, 9), "games": 3, "wins": 0, "losses": 3, "score": 0.0}]
+        game.make_move_idx(0, 9)
+        assert book.get_moves(game) == []                # past max_ply
+
+
+def test_choose_move_best_and_weighted(tmp_path):
+    games = [([(72, 63)], "RED_WON")] * 3 + [([(73, 64)], "BLACK_WON")]
+    book_path = tmp_path / "pick.hsob"
+    build_opening_book([write_records(tmp_path / "pick.hsgr", games)], book_path, min_games=1)
+    with OpeningBook(book_path) as book:
+        game = BitboardHasamiShogiGame()
+        assert book.choose_move(game) == (73, 64)         # best score, although played less
+        assert book.choose_move(game, min_games=2) == (72, 63)
+        assert book.choose_move(game, min_games=4) is None
+        rng = random.Random(5)
+        picks = [book.choose_move(game, rng=rng) for _ in range(4000)]
+        assert set(picks) == {(72, 63), (73, 64)}
+        assert 0.72 < picks.count((72, 63)) / len(picks) < 0.78
+
+
+def test_not_a_book_file(tmp_path):
+    path = tmp_path / "records.hsgr"
+    write_records(path, [([(72, 63)], "UNFINISHED")])
+    with pytest.raises(ValueError):
+        OpeningBook(path)
+
+
+def test_symmetric_book_counts_mirror_images_together(tmp_path):
+    # the second game is the first one mirrored left to right, so after one move each the positions are mirror images
+    games = [([(72, 63), (0, 9)], "UNFINISHED"), ([(80, 71), (8, 17)], "UNFINISHED")]
+    record_path = write_records(tmp_path / "mirror.hsgr", games)
+    for symmetric, games_per_reply in ((False, 1), (True, 2)):
+        book_path = tmp_path / ("symmetric.hsob" if symmetric else "plain.hsob")
+        build_opening_book([record_path], book_path, min_games=1, symmetric=symmetric)
+        with OpeningBook(book_path) as book:
+            for first_move, reply in games[0][0], games[1][0]:
+                game = BitboardHasamiShogiGame()
+                game.make_move_idx(*first_move)
+                assert [(book_move["move"], book_move["games"]) for book_move in book.get_moves(game)] == \
+                    [(reply, games_per_reply)]
@@ -0,0 +1,59 @@
+# Description: Checks ParallelSearchPlayer in both modes on two worker processes: the move chosen is legal and the
+#              game is left as it was, the search info is filled in, a root split search scores the position the same
+#              as a single process search to the same depth, and the root score is stored in the shared table as
+#              exact only when every worker searched every root move. Run 'python -m pytest test_parallel_search.py'.
+
+import pytest
+
+from AlphaBetaPlayer import AlphaBetaPlayer
+from ParallelSearch import ParallelSearchPlayer, MODES
+from Perft import PERFT_POSITIONS, load_position
+from TranspositionTable import EXACT, LOWER_BOUND
+
+WORKERS = 2
+
+
+@pytest.fixture(scope="module", params=MODES)
+def player(request):
+    with ParallelSearchPlayer(WORKERS, request.param, time_limit=float("inf"), max_depth=3) as parallel_player:
+        yield request.param, parallel_player
+
+
+@pytest.mark.parametrize("position", sorted(PERFT_POSITIONS))
+def test_choose_move_is_legal_and_leaves_the_game(player, position):
+    mode, parallel_player = player
+    game = load_position(position)
+    board, zobrist_hash, active_player = game.get_board(), game.get_zobrist_hash(), game.get_active_player()
+    move = parallel_player.choose_move(game, max_depth=2)
+    assert move in game.generate_legal_moves()
+    assert (game.get_board(), game.get_zobrist_hash(), game.get_active_player()) == (board, zobrist_hash,
+                                                                                     active_player)
+    search_info = parallel_player.get_search_info()
+    assert search_info["best_move"] == move
+    assert 1 <= search_info["depth"] <= 2
+    assert search_info["nodes"] > 0 and search_info["seconds"] > 0 and search_info["nodes_per_second"] > 0
+    assert search_info["workers"] == WORKERS
+
+
+@pytest.mark.parametrize("depth", (2, 3))
+@pytest.mark.parametrize("position", ("opening", "midgame", "corners"))
+def test_root_split_scores_like_one_process(position, depth):
+    # lazy workers stop each other, so only the root split is compared depth for depth
+    game = load_position(position)
+    single_player = AlphaBetaPlayer(time_limit=float("inf"), max_depth=depth)
+    single_player.choose_move(game)
+    with ParallelSearchPlayer(WORKERS, "root", time_limit=float("inf"), max_depth=depth) as parallel_player:
+        parallel_player.choose_move(game)
+        assert parallel_player.get_search_info()["depth"] == depth
+        assert parallel_player.get_search_info()["score"] == single_player.get_search_info()["score"]
+
+
+def test_root_bound_in_the_shared_table(player):
+    # lazy workers search every root move, only in another order, so their root score is exact
+    mode, parallel_player = player
+    game = load_position("midgame")
+    parallel_player.get_transposition_table().clear()
+    parallel_player.choose_move(game, max_depth=2)
+    entry = parallel_player.get_transposition_table().probe(game.get_zobrist_hash())
+    assert entry is not None
+    assert entry[2] == (EXACT if mode == "lazy" else LOWER_BOUND)
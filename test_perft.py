@@ -0,0 +1,45 @@
+# Description: Checks the stored perft counts on both game engines, and times perft when pytest-benchmark is installed.
+#              The depth 4 start count (16.6 million nodes) is left to 'python Perft.py'.
+#              Run 'python -m pytest test_perft.py'.
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from HasamiShogiGame import HasamiShogiGame
+from Perft import PERFT_POSITIONS, load_position, perft, perft_divide
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+ENGINES = (HasamiShogiGame, BitboardHasamiShogiGame)
+MAX_TEST_DEPTH = 3
+
+PERFT_CASES = [(name, depth, expected) for name, (board, active_player, counts) in PERFT_POSITIONS.items()
+               for depth, expected in sorted(counts.items()) if depth <= MAX_TEST_DEPTH]
+
+
+@pytest.mark.parametrize("game_class", ENGINES)
+@pytest.mark.parametrize("name, depth, expected", PERFT_CASES)
+def test_perft_counts(game_class, name, depth, expected):
+    game = load_position(name, game_class)
+    board = game.get_board()
+    zobrist_hash = game.get_zobrist_hash()
+    assert perft(game, depth) == expected
+    assert game.get_board() == board                # perft searches in place and must leave the game as it was
+    assert game.get_zobrist_hash() == zobrist_hash
+
+
+@pytest.mark.parametrize("name", sorted(PERFT_POSITIONS))
+def test_perft_divide_matches_between_engines(name):
+    divided = [perft_divide(load_position(name, game_class), 2) for game_class in ENGINES]
+    assert divided[0] == divided[1]
+    assert sum(divided[0].values()) == PERFT_POSITIONS[name][2][2]
+
+
+@pytest.mark.skipif(pytest_benchmark is None, reason="needs pytest-benchmark")
+@pytest.mark.parametrize("game_class", ENGINES)
+def test_perft_speed(benchmark, game_class):
+    game = load_position("start", game_class)
+    assert benchmark(perft, game, 3) == PERFT_POSITIONS["start"][2][3]
@@ -0,0 +1,62 @@
+# Description: Checks the symmetry canonicalization against boards transformed square by square: image line codes,
+#              hashes, moves and canonical keys. Run 'python -m pytest test_symmetry.py'.
+
+import random
+
+import pytest
+
+from BitboardHasamiShogiGame import BitboardHasamiShogiGame
+from HasamiShogiGame import HasamiShogiGame
+from Symmetry import (ALL_SYMMETRIES, MIRROR_SYMMETRIES, SYMMETRY_NAMES, canonical_form, canonical_hash,
+                      image_rows, key_to_position, key_zobrist_hash, transform_move, transform_position,
+                      untransform_move)
+
+
+def random_game(seed, game_class=HasamiShogiGame):
+    rng = random.Random(seed)
+    game = game_class()
+    for ply in range(rng.randrange(60)):
+        legal_moves = game.generate_legal_moves()
+        if not legal_moves:
+            break
+        game.make_move_idx(*rng.choice(legal_moves))
+    return game
+
+
+def set_up(board, active_player, game_class=HasamiShogiGame):
+    game = game_class()
+    game.set_position(board, active_player)
+    return game
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("symmetry", ALL_SYMMETRIES, ids=SYMMETRY_NAMES)
+def test_image_matches_transformed_board(seed, symmetry):
+    game = random_game(seed)
+    image = set_up(*transform_position(game.get_board(), game.get_active_player(), symmetry))
+    row_codes, column_codes = game.get_line_codes()
+    rows = image_rows(row_codes, column_codes, symmetry)
+    assert list(rows) == list(image.get_line_codes()[0])
+    assert key_zobrist_hash((rows, image.get_active_player() == "RED")) == image.get_zobrist_hash()
+
+    legal_moves = game.generate_legal_moves()
+    assert sorted(transform_move(move, symmetry) for move in legal_moves) == sorted(image.generate_legal_moves())
+    for move in legal_moves[:10]:
+        assert untransform_move(transform_move(move, symmetry), symmetry) == move
+        assert game.count_move_captures(*move) == image.count_move_captures(*transform_move(move, symmetry))
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("game_class", (HasamiShogiGame, BitboardHasamiShogiGame))
+def test_every_image_has_the_same_canonical_key(seed, game_class):
+    game = random_game(seed, game_class)
+    board, active_player = game.get_board(), game.get_active_player()
+    key, symmetry = canonical_form(game, ALL_SYMMETRIES)
+    assert key_to_position(key) == transform_position(board, active_player, symmetry)
+    assert canonical_hash(game, ALL_SYMMETRIES)[0] == set_up(*key_to_position(key)).get_zobrist_hash()
+
+    for image_symmetry in ALL_SYMMETRIES:
+        image = set_up(*transform_position(board, active_player, image_symmetry), game_class)
+        assert canonical_form(image, ALL_SYMMETRIES)[0] == key
+        if image_symmetry in MIRROR_SYMMETRIES:
+            assert canonical_form(image)[0] == canonical_form(game)[0]
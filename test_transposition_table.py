@@ -0,0 +1,122 @@
+# Description: Checks TranspositionTable and SharedTranspositionTable: store and probe, the replacement policy, and
+#              the shared table seen from another process. Run 'python -m pytest test_transposition_table.py'.
+
+import multiprocessing
+
+import pytest
+
+from TranspositionTable import (TranspositionTable, SharedTranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND,
+                                REPLACE_ALWAYS)
+
+TABLE_BYTES = 64 * 1024
+
+
+def store_from_worker(name, size, key):
+    """
+    This is run in a child process: it stores one entry in the shared table and reads back one the parent stored
+    :param name:
+    :param size:
+    :param key:
+    :return:
+    """
+
+    table = SharedTranspositionTable.attach(name, size)
+    try:
+        table.store(key, 5, -123, LOWER_BOUND, (3, 21))
+        if table.probe(key + 1) != (4, 77, UPPER_BOUND, (80, 71)):
+            raise SystemExit(1)
+    finally:
+        table.close()
+
+
+@pytest.fixture(params=["local", "shared"])
+def table(request):
+    if request.param == "local":
+        yield TranspositionTable(TABLE_BYTES)
+    else:
+        with SharedTranspositionTable(TABLE_BYTES) as shared_table:
+            yield shared_table
+
+
+def test_store_and_probe(table):
+    key = 0x9E3779B97F4A7C15
+    assert table.probe(key) is None
+    assert table.store(key, 3, -250, UPPER_BOUND, (72, 63))
+    assert table.probe(key) == (3, -250, UPPER_BOUND, (72, 63))
+    assert table.store(key, 4, 100000, EXACT)           # no best move keeps the stored one
+    assert table.probe(key) == (4, 100000, EXACT, (72, 63))
+    assert table.probe(key ^ 1 << 40) is None          # same slot, different position
+    assert len(table) == 1
+    table.clear()
+    assert table.probe(key) is None
+    assert len(table) == 0
+
+
+def test_depth_preferred_replacement(table):
+    size = table.get_size()
+    key = 12345
+    other_key = key + size                              # same slot
+    assert table.store(key, 6, 10, EXACT, (1, 10))
+    assert not table.store(other_key, 2, 20, EXACT)     # shallower result from the same search is turned down
+    assert table.probe(key) == (6, 10, EXACT, (1, 10))
+    assert table.store(other_key, 6, 20, EXACT)         # as deep wins
+    assert table.probe(key) is None
+    table.new_search()
+    assert table.store(key, 1, 30, EXACT)               # anything replaces an entry from an older search
+    assert table.probe(key) == (1, 30, EXACT, None)
+
+
+def test_clear_empties_every_filled_slot(table):
+    keys = [key * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF for key in range(1, 200)]
+    for key in keys:
+        table.store(key, 8, key & 0xFFFF, EXACT, (72, 63))
+    assert len(table) > 0
+    table.clear()
+    assert len(table) == 0
+    assert all(table.probe(key) is None for key in keys)
+    for key in keys:                                    # nothing deep is left behind to turn down shallow stores
+        assert table.store(key, 1, 5, LOWER_BOUND)
+        assert table.probe(key) == (1, 5, LOWER_BOUND, None)
+        table.clear()
+
+
+def test_always_replacement():
+    table = TranspositionTable(TABLE_BYTES, REPLACE_ALWAYS)
+    assert table.store(7, 9, 1)
+    assert table.store(7 + table.get_size(), 1, 2)
+    assert table.probe(7) is None
+    with pytest.raises(ValueError):
+        TranspositionTable(TABLE_BYTES, "never")
+
+
+def test_shared_table_torn_slot_is_a_miss():
+    with SharedTranspositionTable(TABLE_BYTES) as table:
+        key = 0xDEADBEEF
+        table.store(key, 2, 5, EXACT, (0, 9))
+        words = table._words
+        index = 1 + 2 * (key & (table.get_size() - 1))
+        words[index + 1] ^= 1 << 33                     # as if another process wrote the data word half way
+        assert table.probe(key) is None
+
+
+def test_shared_table_between_processes():
+    with SharedTranspositionTable(TABLE_BYTES) as table:
+        key = 0x0123456789ABCDEF
+        table.store(key + 1, 4, 77, UPPER_BOUND, (80, 71))
+        process = multiprocessing.Process(target=store_from_worker, args=(table.get_name(), table.get_size(), key))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        assert table.probe(key) == (5, -123, LOWER_BOUND, (3, 21))
+
+
+def test_only_the_owner_moves_the_generation():
+    with SharedTranspositionTable(TABLE_BYTES) as table:
+        attached = SharedTranspositionTable.attach(table.get_name(), table.get_size())
+        try:
+            attached.new_search()
+            assert table._words[0] == 0
+            table.new_search()
+            assert attached._words[0] == 1
+        finally:
+            attached.close()